@@ -0,0 +1,84 @@
+"""
+Benchmark: tempo por contingência do pp.runpp completo (com montagem das tabelas
+res_bus/res_line/...) contra o modo de extração leve (rodar_fluxo_potencia_leve),
+que lê tensões e carregamentos direto dos vetores do solver.
+
+Uso:
+    python benchmarks/bench_extracao_resultados.py --casos case30 case118 --contingencias 40
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandapower as pp
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.flows.resultados2 import preparar_rede_base
+from src.flows.extracao_resultados import criar_buffers_resultados, rodar_fluxo_potencia_leve, rodar_fluxo_potencia_tabelas
+
+
+def medir_caso(caso, n_contingencias):
+    """Mede o tempo médio por contingência nos dois modos para as primeiras linhas da rede."""
+    net_base, convergencia = preparar_rede_base.fn(caso=caso)
+    if not convergencia:
+        raise RuntimeError(f"A rede base {caso} não convergiu.")
+
+    linhas = list(net_base.line.index[:n_contingencias])
+    buffers = criar_buffers_resultados(2, len(net_base.bus), len(net_base.line))
+    tempos = {'tabelas': [], 'leve': []}
+
+    for linha in linhas:
+        # As cópias ficam fora da medição: só o fluxo de potência e a extração são cronometrados
+        net_tabelas = pp.from_json_string(pp.to_json(net_base))
+        net_tabelas.line.at[linha, 'in_service'] = False
+        net_leve = pp.from_json_string(pp.to_json(net_tabelas))
+
+        inicio = time.perf_counter()
+        rodar_fluxo_potencia_tabelas(net_tabelas, buffers['vm_pu'][0], buffers['loading_percent'][0])
+        tempos['tabelas'].append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        rodar_fluxo_potencia_leve(net_leve, net_base._options, buffers['vm_pu'][1], buffers['loading_percent'][1])
+        tempos['leve'].append(time.perf_counter() - inicio)
+
+    media_tabelas = float(np.mean(tempos['tabelas']))
+    media_leve = float(np.mean(tempos['leve']))
+    return {
+        'caso': caso,
+        'barras': len(net_base.bus),
+        'contingencias': len(linhas),
+        'ms_por_contingencia_tabelas': media_tabelas * 1e3,
+        'ms_por_contingencia_leve': media_leve * 1e3,
+        'ms_economizados': (media_tabelas - media_leve) * 1e3,
+        'reducao_percentual': (1 - media_leve / media_tabelas) * 100 if media_tabelas else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--casos', nargs='+', default=['case30', 'case118', 'case300'])
+    parser.add_argument('--contingencias', type=int, default=40, help="Número de linhas desligadas por caso")
+    parser.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    resultados = [medir_caso(caso, args.contingencias) for caso in args.casos]
+
+    print(f"\n{'caso':>16} {'barras':>7} {'tabelas (ms)':>13} {'leve (ms)':>10} {'economia':>9}")
+    for r in resultados:
+        print(f"{r['caso']:>16} {r['barras']:>7} {r['ms_por_contingencia_tabelas']:>13.2f} "
+              f"{r['ms_por_contingencia_leve']:>10.2f} {r['reducao_percentual']:>8.1f}%")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\nResultados gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Tempo de importação dos módulos de entrada dos flows (o que cada container de
+flow-run do Prefect paga ao iniciar) e verificação de que dependências pesadas
+(pandapower, pandas, SciPy, networkx) não são carregadas no import.
+
+Cada módulo é importado em um processo novo, depois do Prefect (que o worker já
+carrega de qualquer forma). Sai com código 1 se o orçamento for excedido ou se
+algum módulo pesado for importado.
+
+Uso:
+    python benchmarks/bench_importacao.py --orcamento 0.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+MODULOS = ['src.flows.resultados2', 'src.flows.orchestrator_flow']
+MODULOS_PESADOS = ['pandapower', 'pandas', 'scipy', 'networkx']
+
+CODIGO_MEDICAO = """
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+import prefect
+carregados_antes = set(sys.modules)
+inicio = time.perf_counter()
+import {modulo}
+duracao = time.perf_counter() - inicio
+pesados = [m for m in {pesados!r} if m in sys.modules and m not in carregados_antes]
+print(json.dumps({{'duracao_s': duracao, 'pesados': pesados}}))
+"""
+
+
+def medir_importacao(modulo, repeticoes):
+    """Menor tempo de importação do módulo (s) em `repeticoes` processos e os módulos pesados carregados."""
+    medicoes = []
+    for _ in range(repeticoes):
+        codigo = CODIGO_MEDICAO.format(raiz=project_root, modulo=modulo, pesados=MODULOS_PESADOS)
+        saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True, cwd=project_root)
+        medicoes.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+    return {'modulo': modulo, 'duracao_s': min(m['duracao_s'] for m in medicoes), 'pesados': medicoes[0]['pesados']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orcamento', type=float, default=0.5, help="Tempo máximo de importação por módulo (s)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    resultados = [medir_importacao(modulo, args.repeticoes) for modulo in MODULOS]
+    falhas = 0
+    for r in resultados:
+        ok = r['duracao_s'] <= args.orcamento and not r['pesados']
+        falhas += not ok
+        pesados = f" (carregou {', '.join(r['pesados'])})" if r['pesados'] else ""
+        print(f"{'✅' if ok else '❌'} {r['modulo']}: {r['duracao_s'] * 1e3:.0f} ms{pesados}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+    if falhas:
+        print(f"\n{falhas} módulo(s) acima do orçamento de {args.orcamento * 1e3:.0f} ms ou com dependências pesadas.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
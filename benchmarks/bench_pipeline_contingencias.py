@@ -0,0 +1,318 @@
+"""
+Benchmark das etapas do pipeline de contingências de src/flows/resultados2.py:
+preparação da rede base, geração de cenários, cópia da rede, teste de ilhamento,
+fluxo de potência (cenário e contingências), persistência e análise de impacto.
+
+Cada caso é executado duas vezes com a mesma semente: a primeira mede o tempo de
+cada etapa e a segunda o pico de memória (tracemalloc), para que o custo do
+tracemalloc não contamine os tempos. O banco é substituído por um SQLite
+temporário (DATABASE_URL), então a persistência mede a montagem dos DataFrames e
+o to_sql, sem a latência de rede do PostgreSQL.
+
+O JSON de saída traz, por caso, tempo total, número de chamadas, tempo médio e
+pico de memória de cada etapa, além das curvas de escala (tempo x barras) e do
+expoente ajustado em escala log-log.
+
+Uso:
+    python benchmarks/bench_pipeline_contingencias.py --casos case30 case118 case300 --saida bench.json
+    python benchmarks/bench_pipeline_contingencias.py --solver incremental --extracao-leve --comparar bench.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandapower as pp
+from pytz import timezone
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.flows.resultados2 import (
+    preparar_rede_base, gerar_dados_cenario, aplicar_dados_ao_net, rodar_fluxo_potencia,
+    copiar_rede, verificar_ilhamento, salvar_resultados_globais_postgres,
+    salvar_tensao_nao_criticos_postgres, analisar_impacto_tensao_postgres,
+)
+from src.flows.solver_contingencia import SolverContingencias
+from src.flows.fluxo_lote import montar_matriz_cenarios, preparar_injecoes, fluxo_potencia_lote
+from src.flows.extracao_resultados import criar_buffers_resultados, rodar_fluxo_potencia_leve
+
+ETAPAS = ['preparacao_rede_base', 'geracao_cenarios', 'copia_rede', 'ilhamento', 'fluxo_cenario',
+          'fluxo_contingencia', 'persistencia', 'analise_impacto']
+
+
+class Medidor:
+    """Acumula tempo, número de chamadas e pico de memória por etapa."""
+
+    def __init__(self, medir_memoria=False):
+        self.medir_memoria = medir_memoria
+        self.etapas = {}
+
+    @contextlib.contextmanager
+    def etapa(self, nome):
+        registro = self.etapas.setdefault(nome, {'tempo_total_s': 0.0, 'chamadas': 0, 'pico_memoria_mb': 0.0})
+        if self.medir_memoria:
+            tracemalloc.reset_peak()
+            memoria_inicial, _ = tracemalloc.get_traced_memory()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            registro['tempo_total_s'] += time.perf_counter() - inicio
+            registro['chamadas'] += 1
+            if self.medir_memoria:
+                _, pico = tracemalloc.get_traced_memory()
+                registro['pico_memoria_mb'] = max(registro['pico_memoria_mb'], (pico - memoria_inicial) / 2**20)
+
+
+def executar_pipeline(caso, medidor, n_cenarios, n_contingencias, solver, extracao_leve, usar_cache,
+                      vmax=1.093, vmin=0.94, line_loading_max=120, semente=42):
+    """
+    Executa o pipeline do simulacao_contingencia_flow (sem o Prefect) registrando cada
+    etapa no `medidor`. Retorna um resumo da rede e das contingências simuladas.
+    """
+    random.seed(semente)
+
+    with medidor.etapa('preparacao_rede_base'):
+        net_base, convergencia = preparar_rede_base.fn(caso=caso, usar_cache=usar_cache)
+    if not convergencia:
+        raise RuntimeError(f"A rede base {caso} não convergiu.")
+
+    indices_barras = list(net_base.bus.index)
+    linhas = list(net_base.line.index[:n_contingencias] if n_contingencias else net_base.line.index)
+    buffers = criar_buffers_resultados(1, len(indices_barras), len(net_base.line))
+
+    with medidor.etapa('geracao_cenarios'):
+        dados_cenarios = [gerar_dados_cenario.fn(net_base, cenario_id) for cenario_id in range(n_cenarios)]
+
+    if solver == 'incremental':
+        with medidor.etapa('fluxo_cenario'):
+            matriz = montar_matriz_cenarios(dados_cenarios)
+            solver_base = SolverContingencias(net_base)
+            vm_cenarios, convergencia_cenarios, V_cenarios = fluxo_potencia_lote(net_base, matriz, solver=solver_base)
+
+    resultados, tensao_nao_criticos = [], []
+    for cenario_id, dados in enumerate(dados_cenarios):
+        if solver == 'incremental':
+            if not convergencia_cenarios.iloc[cenario_id]:
+                continue
+            with medidor.etapa('fluxo_cenario'):
+                _, dados_ybus, _ = preparar_injecoes(solver_base, net_base, matriz.iloc[[cenario_id]])
+                solver_cenario = solver_base.para_cenario(V_cenarios[cenario_id], dados_ybus[0])
+            net_cenario = net_base
+            tensao_antes = vm_cenarios.iloc[cenario_id].to_dict()
+        else:
+            with medidor.etapa('copia_rede'):
+                net_cenario = aplicar_dados_ao_net.fn(net_base, dados)
+            with medidor.etapa('fluxo_cenario'):
+                net_cenario, convergencia = rodar_fluxo_potencia.fn(net_cenario)
+            if not convergencia:
+                continue
+            tensao_antes = net_cenario.res_bus.vm_pu.to_dict()
+
+        for linha in linhas:
+            with medidor.etapa('copia_rede'):
+                net_contingencia = copiar_rede(net_cenario)
+                net_contingencia.line.at[linha, 'in_service'] = False
+            with medidor.etapa('ilhamento'):
+                ilhamento = verificar_ilhamento(net_contingencia)
+
+            status, convergencia_pos = ('ilhamento', False) if ilhamento else ('normal', False)
+            if not ilhamento:
+                with medidor.etapa('fluxo_contingencia'):
+                    if extracao_leve:
+                        vm_pu, loading = buffers['vm_pu'][0], buffers['loading_percent'][0]
+                        if solver == 'incremental':
+                            convergencia_pos = solver_cenario.resolver_desligamento_em(linha, vm_pu, loading)
+                        else:
+                            convergencia_pos = rodar_fluxo_potencia_leve(net_contingencia, net_cenario._options, vm_pu, loading)
+                    elif solver == 'incremental':
+                        vm_pu, loading, convergencia_pos = solver_cenario.resolver_desligamento(linha)
+                    else:
+                        net_contingencia, convergencia_pos = rodar_fluxo_potencia.fn(net_contingencia)
+                        vm_pu, loading = net_contingencia.res_bus.vm_pu, net_contingencia.res_line.loading_percent
+
+                if not convergencia_pos:
+                    status = 'crítica (não convergiu)'
+                elif (np.nanmin(vm_pu) < vmin or np.nanmax(vm_pu) > vmax
+                      or (len(loading) and np.nanmax(loading) > line_loading_max)):
+                    status = 'crítica'
+                else:
+                    tensao_nao_criticos.append({
+                        'cenario': cenario_id,
+                        'linha_desligada': linha,
+                        'from_bus': net_base.line.at[linha, 'from_bus'],
+                        'to_bus': net_base.line.at[linha, 'to_bus'],
+                        'tensao_antes': tensao_antes,
+                        'tensao_depois': dict(zip(indices_barras, np.asarray(vm_pu, dtype=float))),
+                    })
+
+            resultados.append({'cenario': cenario_id, 'linha_desligada': linha, 'status': status,
+                               'ilhamento': ilhamento, 'num_componentes_conectados': None,
+                               'convergencia': convergencia_pos})
+
+    execution_timestamp = datetime.now(timezone('America/Sao_Paulo'))
+    with medidor.etapa('persistencia'):
+        salvar_resultados_globais_postgres.fn(resultados, execution_timestamp)
+        salvar_tensao_nao_criticos_postgres.fn(tensao_nao_criticos, execution_timestamp, indices_barras=indices_barras)
+
+    with medidor.etapa('analise_impacto'):
+        analisar_impacto_tensao_postgres.fn(num_barras=None)
+
+    return {
+        'barras': len(indices_barras),
+        'linhas': len(net_base.line),
+        'contingencias': len(resultados),
+        'nao_criticas': len(tensao_nao_criticos),
+    }
+
+
+@contextlib.contextmanager
+def banco_temporario():
+    """Aponta get_db_url() para um SQLite temporário enquanto o bloco executa."""
+    url_anterior = os.environ.get('DATABASE_URL')
+    with tempfile.TemporaryDirectory() as diretorio:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(diretorio, 'bench.db')}"
+        try:
+            yield
+        finally:
+            if url_anterior is None:
+                os.environ.pop('DATABASE_URL', None)
+            else:
+                os.environ['DATABASE_URL'] = url_anterior
+
+
+def medir_caso(caso, args):
+    """Executa o pipeline de um caso (tempo e, opcionalmente, memória) e consolida as etapas."""
+    parametros = dict(n_cenarios=args.cenarios, n_contingencias=args.contingencias, solver=args.solver,
+                      extracao_leve=args.extracao_leve, usar_cache=not args.sem_cache)
+
+    with banco_temporario(), open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        medidor_tempo = Medidor()
+        resumo = executar_pipeline(caso, medidor_tempo, **parametros)
+
+    etapas = {nome: dict(registro, tempo_medio_ms=registro['tempo_total_s'] / registro['chamadas'] * 1e3, pico_memoria_mb=None)
+              for nome, registro in medidor_tempo.etapas.items()}
+
+    if args.memoria:
+        medidor_memoria = Medidor(medir_memoria=True)
+        tracemalloc.start()
+        try:
+            with banco_temporario(), open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+                executar_pipeline(caso, medidor_memoria, **parametros)
+        finally:
+            tracemalloc.stop()
+        for nome, registro in medidor_memoria.etapas.items():
+            etapas[nome]['pico_memoria_mb'] = registro['pico_memoria_mb']
+
+    return dict(caso=caso, **resumo, tempo_total_s=sum(e['tempo_total_s'] for e in etapas.values()),
+                etapas={nome: etapas[nome] for nome in ETAPAS if nome in etapas})
+
+
+def curvas_escala(resultados):
+    """Tempo total de cada etapa em função do número de barras e o expoente ajustado (tempo ~ barras^k)."""
+    curvas = {}
+    for nome in ETAPAS:
+        pontos = [(r['barras'], r['etapas'][nome]['tempo_total_s']) for r in resultados if nome in r['etapas']]
+        pontos.sort()
+        expoente = None
+        if len({barras for barras, _ in pontos}) >= 2 and all(tempo > 0 for _, tempo in pontos):
+            expoente = float(np.polyfit(np.log([b for b, _ in pontos]), np.log([t for _, t in pontos]), 1)[0])
+        curvas[nome] = {'pontos': pontos, 'expoente': expoente}
+    return curvas
+
+
+def comparar(atual, referencia, tolerancia):
+    """Imprime a variação de tempo por etapa em relação a um JSON anterior. Retorna as regressões."""
+    casos_referencia = {r['caso']: r for r in referencia['casos']}
+    regressoes = []
+    diferentes = {k for k in atual['parametros'] if referencia.get('parametros', {}).get(k) != atual['parametros'][k]}
+    diferentes -= {'memoria', 'tolerancia'}
+    if diferentes:
+        print(f"\n⚠️ Parâmetros diferentes da referência ({', '.join(sorted(diferentes))}): os tempos não são diretamente comparáveis.")
+    print(f"\n{'caso':>16} {'etapa':>22} {'antes (s)':>10} {'agora (s)':>10} {'variação':>9}")
+    for r in atual['casos']:
+        anterior = casos_referencia.get(r['caso'])
+        if anterior is None:
+            continue
+        for nome, etapa in r['etapas'].items():
+            if nome not in anterior['etapas']:
+                continue
+            antes, agora = anterior['etapas'][nome]['tempo_total_s'], etapa['tempo_total_s']
+            variacao = (agora / antes - 1) * 100 if antes else 0.0
+            marca = " ⚠️" if variacao > tolerancia else ""
+            print(f"{r['caso']:>16} {nome:>22} {antes:>10.3f} {agora:>10.3f} {variacao:>8.1f}%{marca}")
+            if variacao > tolerancia:
+                regressoes.append((r['caso'], nome, variacao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--casos', nargs='+', default=['case30', 'case118', 'case300'])
+    parser.add_argument('--cenarios', type=int, default=1, help="Cenários por caso")
+    parser.add_argument('--contingencias', type=int, default=None, help="Linhas desligadas por cenário (padrão: todas)")
+    parser.add_argument('--solver', choices=['pandapower', 'incremental'], default='pandapower')
+    parser.add_argument('--extracao-leve', action='store_true')
+    parser.add_argument('--sem-cache', action='store_true', help="Não usa o cache em disco da rede base")
+    parser.add_argument('--sem-memoria', dest='memoria', action='store_false', help="Pula a passada com tracemalloc")
+    parser.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparação")
+    parser.add_argument('--tolerancia', type=float, default=20.0, help="Aumento de tempo (%%) considerado regressão")
+    args = parser.parse_args()
+
+    resultados = []
+    for caso in args.casos:
+        print(f"Medindo {caso}...")
+        resultados.append(medir_caso(caso, args))
+
+    relatorio = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'pandapower': pp.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'data': datetime.now().isoformat(timespec='seconds'),
+        },
+        'parametros': {k: v for k, v in vars(args).items() if k not in ('saida', 'comparar')},
+        'casos': resultados,
+        'curvas_escala': curvas_escala(resultados),
+    }
+
+    for r in resultados:
+        print(f"\n{r['caso']} ({r['barras']} barras, {r['contingencias']} contingências): {r['tempo_total_s']:.2f} s")
+        print(f"{'etapa':>22} {'total (s)':>10} {'chamadas':>9} {'média (ms)':>11} {'pico (MB)':>10}")
+        for nome, etapa in r['etapas'].items():
+            pico = f"{etapa['pico_memoria_mb']:>10.2f}" if etapa['pico_memoria_mb'] is not None else f"{'-':>10}"
+            print(f"{nome:>22} {etapa['tempo_total_s']:>10.3f} {etapa['chamadas']:>9} {etapa['tempo_medio_ms']:>11.2f} {pico}")
+
+    if len(resultados) > 1:
+        print("\nExpoente de escala (tempo ~ barras^k):")
+        for nome, curva in relatorio['curvas_escala'].items():
+            if curva['expoente'] is not None:
+                print(f"{nome:>22} k = {curva['expoente']:.2f}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regressoes = comparar(relatorio, json.load(f), args.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} etapa(s) acima da tolerância de {args.tolerancia:.0f}%.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
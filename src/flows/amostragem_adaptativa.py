@@ -0,0 +1,117 @@
+import math
+import random
+from statistics import NormalDist
+
+
+def fator_inclinado(minimo, maximo, inclinacao, rng=random):
+    """
+    Sorteia um fator em [minimo, maximo] com densidade proporcional a exp(inclinacao * y),
+    y = (fator - minimo) / (maximo - minimo), em vez da uniforme usada por gerar_dados_cenario
+    (inclinacao > 0 favorece os valores altos). Retorna (fator, log_peso), em que
+    log_peso = log(densidade uniforme / densidade sorteada) corrige a estimativa.
+    """
+    if inclinacao == 0:
+        return rng.uniform(minimo, maximo), 0.0
+    normalizacao = math.expm1(inclinacao) / inclinacao
+    y = math.log1p(rng.random() * math.expm1(inclinacao)) / inclinacao
+    return minimo + (maximo - minimo) * y, math.log(normalizacao) - inclinacao * y
+
+
+class AmostragemAdaptativa:
+    """
+    Monte Carlo adaptativo sobre os cenários: estima, para cada linha, a probabilidade
+    de a contingência N-1 ser crítica (violação, ilhamento ou não convergência) e gera
+    novos lotes de cenários até que o intervalo de confiança de todas as linhas tenha
+    semiamplitude de no máximo `semiamplitude`, ou até `max_cenarios`.
+
+    O intervalo é o de Wilson, que não colapsa quando nenhuma (ou todas as) contingência
+    da linha foi crítica até o momento. Com amostragem por importância (cenários com
+    'peso_amostragem', ver fator_inclinado), a estimativa é a média ponderada pelos pesos
+    e o intervalo usa, por linha, o tamanho de amostra equivalente à variância ponderada
+    da estimativa (ou o tamanho efetivo (soma dos pesos)² / soma dos pesos², enquanto a
+    linha não tiver variância).
+
+    Uso:
+        amostragem = AmostragemAdaptativa(linhas, semiamplitude=0.02)
+        for lote in amostragem.lotes():
+            for cenario in lote:
+                ...
+                amostragem.registrar(cenario, linhas_criticas, peso)
+    """
+
+    def __init__(self, linhas, semiamplitude=0.02, confianca=0.95, tamanho_lote=10, min_cenarios=30, max_cenarios=1000):
+        if not 0 < confianca < 1:
+            raise ValueError(f"A confiança deve estar entre 0 e 1 (recebido {confianca}).")
+        self.linhas = list(linhas)
+        self.semiamplitude = semiamplitude
+        self.confianca = confianca
+        self.z = NormalDist().inv_cdf(0.5 + confianca / 2)
+        self.tamanho_lote = max(1, int(tamanho_lote))
+        self.min_cenarios = min_cenarios
+        self.max_cenarios = max_cenarios
+        self.n_cenarios = 0
+        self._soma_pesos = 0.0
+        self._soma_pesos2 = 0.0
+        self._pesos_criticos = {linha: 0.0 for linha in self.linhas}
+        self._pesos2_criticos = {linha: 0.0 for linha in self.linhas}
+
+    def registrar(self, cenario, linhas_criticas, peso=1.0):
+        """Registra o resultado de um cenário: as linhas cuja contingência foi crítica."""
+        self.n_cenarios += 1
+        self._soma_pesos += peso
+        self._soma_pesos2 += peso * peso
+        for linha in set(linhas_criticas):
+            if linha in self._pesos_criticos:
+                self._pesos_criticos[linha] += peso
+                self._pesos2_criticos[linha] += peso * peso
+
+    @property
+    def n_efetivo(self):
+        return self._soma_pesos ** 2 / self._soma_pesos2 if self._soma_pesos2 else 0.0
+
+    def _n_linha(self, linha, p):
+        """Tamanho de amostra equivalente da estimativa de uma linha: p(1 - p) / variância ponderada."""
+        variancia = (self._pesos2_criticos[linha] * (1 - 2 * p) + p * p * self._soma_pesos2) / self._soma_pesos ** 2
+        if 0 < p < 1 and variancia > 0:
+            return p * (1 - p) / variancia
+        return self.n_efetivo
+
+    def _intervalo(self, n, p):
+        if n == 0:
+            return 0.0, 1.0
+        z2 = self.z ** 2
+        centro = (p + z2 / (2 * n)) / (1 + z2 / n)
+        semiamplitude = self.z / (1 + z2 / n) * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n))
+        return max(0.0, centro - semiamplitude), min(1.0, centro + semiamplitude)
+
+    def probabilidades(self):
+        """Lista de dicts por linha: probabilidade de criticidade estimada e intervalo de confiança."""
+        resultado = []
+        for linha in self.linhas:
+            p = self._pesos_criticos[linha] / self._soma_pesos if self._soma_pesos else 0.0
+            inferior, superior = self._intervalo(self._n_linha(linha, p) if self._soma_pesos else 0, p)
+            resultado.append({'linha': linha, 'probabilidade': p, 'ic_inferior': inferior, 'ic_superior': superior})
+        return resultado
+
+    def maior_semiamplitude(self):
+        return max(((p['ic_superior'] - p['ic_inferior']) / 2 for p in self.probabilidades()), default=0.0)
+
+    def convergiu(self):
+        return self.n_cenarios >= self.min_cenarios and self.maior_semiamplitude() <= self.semiamplitude
+
+    def lotes(self):
+        """Gera os ids dos cenários, um range por lote, até a convergência ou max_cenarios."""
+        proximo = 0
+        while proximo < self.max_cenarios and not (proximo and self.convergiu()):
+            fim = min(proximo + self.tamanho_lote, self.max_cenarios)
+            yield range(proximo, fim)
+            proximo = fim
+
+    def resumo(self):
+        return {
+            'n_cenarios': self.n_cenarios,
+            'n_efetivo': self.n_efetivo,
+            'maior_semiamplitude': self.maior_semiamplitude(),
+            'convergiu': self.convergiu(),
+            'confianca': self.confianca,
+        }
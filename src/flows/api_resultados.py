@@ -0,0 +1,281 @@
+"""
+API REST (JSON, somente leitura) sobre os resultados das simulações, montada no servidor
+Flask do Dash (ver visualizacao_impacto.py), para outras ferramentas consultarem as
+execuções sem SQL próprio:
+
+    GET /api/execucoes                                   execuções, da mais recente para a mais antiga
+    GET /api/execucoes/<execucao>/cenarios               contagem de status por cenário
+    GET /api/execucoes/<execucao>/linhas-criticas        contingências críticas/com ilhamento (?cenario=)
+    GET /api/execucoes/<execucao>/barras-impactadas      k barras com maior |ΔV| entre os cenários
+                                                         (?k=10&linha=), do agregado linha x barra
+
+<execucao> é o id da execução (execution_timestamp no formato de id_execucao, ex.:
+20250706T024905.123456, o mesmo da partição 'run' do Parquet) ou 'ultima'. As listagens são
+paginadas com ?pagina=1&tamanho=100 e as consultas filtram pelas colunas dos índices
+criados em criar_tabelas_postgres.
+
+Cada resposta tem um ETag (id da execução + hash do corpo) e fica em um cache LRU no
+processo, invalidado quando a versão dos dados muda (NOTIFY da simulação, ver EstadoDados):
+enquanto não chega execução nova, as requisições repetidas não consultam o banco, e um
+cliente que envia If-None-Match com o ETag atual recebe 304 sem corpo.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+import pandas as pd
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import create_engine, text
+from werkzeug.exceptions import HTTPException
+
+from src.flows.exportacao_parquet import id_execucao
+
+# Respostas guardadas no cache LRU do processo (as mais antigas saem primeiro)
+TAMANHO_CACHE_RESPOSTAS = 256
+# Itens por página das listagens (padrão e máximo aceito em ?tamanho=)
+TAMANHO_PAGINA = 100
+TAMANHO_PAGINA_MAX = 1000
+# Barras retornadas em barras-impactadas (padrão e máximo aceito em ?k=)
+K_BARRAS = 10
+K_BARRAS_MAX = 100
+# Fuso em que as execuções são identificadas (o mesmo de simulacao_contingencia_flow)
+FUSO_EXECUCOES = 'America/Sao_Paulo'
+
+STATUS_CRITICA = 'crítica'
+STATUS_ILHAMENTO = 'ilhamento'
+STATUS_CENARIO_NAO_CONVERGIU = 'cenário inicial não convergiu'
+
+
+class ErroConsulta(Exception):
+    """Parâmetro inválido ou recurso inexistente: vira uma resposta JSON com `status` HTTP."""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class CacheLRU:
+    """Cache LRU com trava (o servidor do Dash atende requisições em várias threads)."""
+
+    def __init__(self, tamanho=TAMANHO_CACHE_RESPOSTAS):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            if chave not in self._itens:
+                return None
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+
+def id_execucao_banco(valor):
+    """id_execucao de um execution_timestamp lido do banco (datetime no PostgreSQL, texto no SQLite)."""
+    instante = pd.Timestamp(valor)
+    if instante.tzinfo is not None:
+        instante = instante.tz_convert(FUSO_EXECUCOES)
+    return id_execucao(instante)
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+
+def _inteiro(nome, padrao=None, minimo=None, maximo=None):
+    """Parâmetro inteiro da query string, validado (ErroConsulta 400 se inválido)."""
+    valor = request.args.get(nome)
+    if valor is None or valor == '':
+        return padrao
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ErroConsulta(f"Parâmetro '{nome}' deve ser inteiro.")
+    if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+        raise ErroConsulta(f"Parâmetro '{nome}' fora do intervalo [{minimo}, {maximo}].")
+    return valor
+
+
+def _paginacao():
+    pagina = _inteiro('pagina', 1, minimo=1)
+    tamanho = _inteiro('tamanho', TAMANHO_PAGINA, minimo=1, maximo=TAMANHO_PAGINA_MAX)
+    return pagina, tamanho
+
+
+def _pagina(linhas, pagina, tamanho):
+    """Corpo de uma listagem: a consulta pede tamanho + 1 linhas para saber se há próxima página."""
+    return {'pagina': pagina, 'tamanho': tamanho, 'proxima_pagina': pagina + 1 if len(linhas) > tamanho else None,
+            'dados': linhas[:tamanho]}
+
+
+def criar_api(url_banco, versao_dados=lambda: 0, tamanho_cache=TAMANHO_CACHE_RESPOSTAS):
+    """
+    Blueprint da API (registrar com server.register_blueprint). `versao_dados()` retorna a
+    versão atual dos dados: as respostas em cache de uma versão anterior não são reutilizadas.
+    """
+    api = Blueprint('api_resultados', __name__, url_prefix='/api')
+    cache = CacheLRU(tamanho_cache)
+    engines = []
+
+    def consultar(sql, **parametros):
+        # Engine criada na primeira consulta: importar o Dash não carrega o driver do banco
+        if not engines:
+            engines.append(create_engine(url_banco))
+        with engines[0].connect() as conexao:
+            return [dict(linha) for linha in conexao.execute(text(sql), parametros).mappings()]
+
+    def execucoes():
+        """{id da execução: execution_timestamp como está no banco} (em cache por versão dos dados)."""
+        chave = ('mapa_execucoes', versao_dados())
+        mapa = cache.obter(chave)
+        if mapa is None:
+            linhas = consultar("SELECT DISTINCT execution_timestamp FROM resultados_simulacao")
+            ordenadas = sorted(linhas, key=lambda linha: pd.Timestamp(linha['execution_timestamp']))
+            mapa = {id_execucao_banco(linha['execution_timestamp']): linha['execution_timestamp'] for linha in ordenadas}
+            cache.guardar(chave, mapa)
+        return mapa
+
+    def resolver_execucao(execucao):
+        mapa = execucoes()
+        if execucao == 'ultima':
+            if not mapa:
+                raise ErroConsulta("Nenhuma execução gravada.", 404)
+            execucao = next(reversed(mapa))
+        if execucao not in mapa:
+            raise ErroConsulta(f"Execução '{execucao}' não encontrada.", 404)
+        return execucao, mapa[execucao]
+
+    def responder(chave, gerar, execucao=None):
+        """Resposta JSON com ETag, do cache LRU ou gerada por `gerar()`; 304 se o cliente já tem o ETag."""
+        chave = (request.path, versao_dados()) + chave
+        entrada = cache.obter(chave)
+        origem = 'HIT'
+        if entrada is None:
+            corpo = json.dumps(gerar(), ensure_ascii=False, default=_valor_json)
+            etag = f"{execucao or 'execucoes'}-{hashlib.sha1(corpo.encode('utf-8')).hexdigest()[:16]}"
+            entrada = (etag, corpo)
+            cache.guardar(chave, entrada)
+            origem = 'MISS'
+        etag, corpo = entrada
+        resposta = current_app.response_class(corpo, mimetype='application/json')
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = 'no-cache' # Pode guardar, mas revalida com If-None-Match
+        resposta.headers['X-Cache'] = origem
+        return resposta.make_conditional(request)
+
+    @api.errorhandler(ErroConsulta)
+    def erro_consulta(erro):
+        return jsonify({'erro': str(erro)}), erro.status
+
+    @api.errorhandler(Exception)
+    def erro_banco(erro):
+        if isinstance(erro, HTTPException):
+            return erro
+        print(f"ERRO: na API de resultados ({request.path}): {erro}")
+        return jsonify({'erro': "Falha ao consultar o banco de dados."}), 503
+
+    @api.route('/execucoes')
+    def listar_execucoes():
+        pagina, tamanho = _paginacao()
+
+        def gerar():
+            linhas = consultar(
+                "SELECT execution_timestamp, COUNT(DISTINCT cenario) AS n_cenarios, "
+                "SUM(CASE WHEN status <> :nao_convergiu THEN 1 ELSE 0 END) AS n_contingencias, "
+                "SUM(CASE WHEN status = :critica THEN 1 ELSE 0 END) AS n_criticas, "
+                "SUM(CASE WHEN status = :ilhamento THEN 1 ELSE 0 END) AS n_ilhamentos "
+                "FROM resultados_simulacao GROUP BY execution_timestamp "
+                "ORDER BY execution_timestamp DESC LIMIT :limite OFFSET :inicio",
+                critica=STATUS_CRITICA, ilhamento=STATUS_ILHAMENTO, nao_convergiu=STATUS_CENARIO_NAO_CONVERGIU,
+                limite=tamanho + 1, inicio=(pagina - 1) * tamanho)
+            for linha in linhas:
+                linha['execucao'] = id_execucao_banco(linha['execution_timestamp'])
+            return _pagina(linhas, pagina, tamanho)
+
+        return responder((pagina, tamanho), gerar)
+
+    @api.route('/execucoes/<execucao>/cenarios')
+    def listar_cenarios(execucao):
+        execucao, instante = resolver_execucao(execucao)
+        pagina, tamanho = _paginacao()
+
+        def gerar():
+            linhas = consultar(
+                "SELECT cenario, SUM(CASE WHEN status <> :nao_convergiu THEN 1 ELSE 0 END) AS n_contingencias, "
+                "SUM(CASE WHEN status = :critica THEN 1 ELSE 0 END) AS n_criticas, "
+                "SUM(CASE WHEN status = :ilhamento THEN 1 ELSE 0 END) AS n_ilhamentos, "
+                "MAX(CASE WHEN status = :nao_convergiu THEN 1 ELSE 0 END) AS nao_convergiu "
+                "FROM resultados_simulacao WHERE execution_timestamp = :instante "
+                "GROUP BY cenario ORDER BY cenario LIMIT :limite OFFSET :inicio",
+                critica=STATUS_CRITICA, ilhamento=STATUS_ILHAMENTO, nao_convergiu=STATUS_CENARIO_NAO_CONVERGIU,
+                instante=instante, limite=tamanho + 1, inicio=(pagina - 1) * tamanho)
+            for linha in linhas:
+                linha['nao_convergiu'] = bool(linha['nao_convergiu'])
+            return dict(_pagina(linhas, pagina, tamanho), execucao=execucao)
+
+        return responder((execucao, pagina, tamanho), gerar, execucao)
+
+    @api.route('/execucoes/<execucao>/linhas-criticas')
+    def listar_linhas_criticas(execucao):
+        execucao, instante = resolver_execucao(execucao)
+        cenario = _inteiro('cenario', minimo=0)
+        pagina, tamanho = _paginacao()
+
+        def gerar():
+            filtro_cenario = "AND cenario = :cenario " if cenario is not None else ""
+            linhas = consultar(
+                "SELECT tipo_elemento, elemento_desligado, linha_desligada, linhas_desligadas, "
+                "SUM(CASE WHEN status = :critica THEN 1 ELSE 0 END) AS n_criticas, "
+                "SUM(CASE WHEN status = :ilhamento THEN 1 ELSE 0 END) AS n_ilhamentos, "
+                "COUNT(*) AS n_cenarios, MAX(excesso_violacao) AS maior_excesso_violacao "
+                "FROM resultados_simulacao WHERE execution_timestamp = :instante AND status <> :nao_convergiu "
+                f"{filtro_cenario}"
+                "GROUP BY tipo_elemento, elemento_desligado, linha_desligada, linhas_desligadas "
+                "HAVING SUM(CASE WHEN status IN (:critica, :ilhamento) THEN 1 ELSE 0 END) > 0 "
+                "ORDER BY SUM(CASE WHEN status IN (:critica, :ilhamento) THEN 1 ELSE 0 END) DESC, "
+                "tipo_elemento, elemento_desligado, linha_desligada, linhas_desligadas "
+                "LIMIT :limite OFFSET :inicio",
+                critica=STATUS_CRITICA, ilhamento=STATUS_ILHAMENTO, nao_convergiu=STATUS_CENARIO_NAO_CONVERGIU,
+                instante=instante, cenario=cenario, limite=tamanho + 1, inicio=(pagina - 1) * tamanho)
+            return dict(_pagina(linhas, pagina, tamanho), execucao=execucao, cenario=cenario)
+
+        return responder((execucao, cenario, pagina, tamanho), gerar, execucao)
+
+    @api.route('/execucoes/<execucao>/barras-impactadas')
+    def listar_barras_impactadas(execucao):
+        execucao, instante = resolver_execucao(execucao)
+        k = _inteiro('k', K_BARRAS, minimo=1, maximo=K_BARRAS_MAX)
+        linha = _inteiro('linha', minimo=0)
+
+        def gerar():
+            # Ranking no banco sobre o agregado linha x barra (índice único por execução, linha e barra):
+            # para cada barra, a linha com o maior |ΔV| entre os cenários; as k maiores
+            filtro_linha = "AND linha_desligada = :linha " if linha is not None else ""
+            barras = consultar(
+                "SELECT barra, linha_desligada, max_impacto AS impacto_max_pu, "
+                "soma_impacto / n_cenarios AS impacto_medio_pu, n_cenarios FROM ("
+                "SELECT barra, linha_desligada, max_impacto, soma_impacto, n_cenarios, "
+                "ROW_NUMBER() OVER (PARTITION BY barra ORDER BY max_impacto DESC, linha_desligada) AS ordem "
+                "FROM impacto_agregado_linha_barra WHERE execution_timestamp = :instante AND n_cenarios > 0 "
+                f"{filtro_linha}) AS por_barra "
+                "WHERE ordem = 1 ORDER BY impacto_max_pu DESC, barra LIMIT :k",
+                instante=instante, linha=linha, k=k)
+            return {'execucao': execucao, 'linha_desligada': linha, 'barras': barras}
+
+        return responder((execucao, linha, k), gerar, execucao)
+
+    return api
@@ -0,0 +1,133 @@
+import json
+import os
+from collections.abc import Mapping
+from datetime import datetime
+
+import numpy as np
+
+# Códigos da máscara de status (uma posição por cenário x contingência)
+NAO_SIMULADA, NORMAL, CRITICA, ILHAMENTO, NAO_CONVERGIU = range(5)
+CODIGOS_STATUS = {
+    'normal': NORMAL,
+    'crítica': CRITICA,
+    'ilhamento': ILHAMENTO,
+    'crítica (não convergiu)': NAO_CONVERGIU,
+}
+
+ARQUIVO_METADADOS = 'metadados.json'
+
+
+class TensoesBarras(Mapping):
+    """
+    Visão {barra: vm_pu} sobre um vetor do armazenamento, sem cópia. Substitui os
+    dicionários de tensão (res_bus.vm_pu.to_dict()) nas linhas gravadas no banco/Parquet.
+    """
+
+    def __init__(self, posicoes, vetor):
+        self._posicoes = posicoes
+        self._vetor = vetor
+
+    def __getitem__(self, barra):
+        return float(self._vetor[self._posicoes[barra]])
+
+    def __iter__(self):
+        return iter(self._posicoes)
+
+    def __len__(self):
+        return len(self._posicoes)
+
+    @property
+    def vetor(self):
+        """Vetor float32 das tensões, na ordem das barras do armazenamento."""
+        return self._vetor
+
+
+class ArmazenamentoTensoes:
+    """
+    Tensões de uma execução em arquivos float32 mapeados em memória (numpy.memmap):
+
+        tensoes_depois.f32  (cenários x contingências x barras)  tensão após cada desligamento
+        tensoes_antes.f32   (cenários x barras)                  tensão do cenário antes das contingências
+        status.u8           (cenários x contingências)           máscara com os CODIGOS_STATUS
+
+    O laço de contingências escreve direto nas visões retornadas por vetor_depois(), que
+    podem ser passadas como vetor de saída para resolver_desligamento_em e
+    rodar_fluxo_potencia_leve. A análise de impacto e a exportação leem os mesmos
+    arquivos sem carregá-los inteiros na memória.
+
+    Cada contingência é o desligamento do elemento `linhas[pos]` da tabela `tipos[pos]`
+    do pandapower (todas 'line' se `tipos` for omitido); a análise de impacto usa só as linhas.
+    """
+
+    def __init__(self, diretorio, n_cenarios, linhas, indices_barras, modo='w+', execution_timestamp=None, tipos=None):
+        self.diretorio = diretorio
+        self.execution_timestamp = execution_timestamp
+        self.linhas = [int(l) for l in linhas]
+        self.tipos = list(tipos) if tipos is not None else ['line'] * len(self.linhas)
+        self.indices_barras = [int(b) for b in indices_barras]
+        self.n_cenarios = int(n_cenarios)
+        self.posicoes_barras = {barra: pos for pos, barra in enumerate(self.indices_barras)}
+        self.posicoes_linhas = {linha: pos for pos, (linha, tipo) in enumerate(zip(self.linhas, self.tipos)) if tipo == 'line'}
+        self._contingencias_linha = np.array([tipo == 'line' for tipo in self.tipos], dtype=bool)
+
+        if modo == 'w+':
+            os.makedirs(diretorio, exist_ok=True)
+            with open(os.path.join(diretorio, ARQUIVO_METADADOS), 'w', encoding='utf-8') as f:
+                json.dump({'n_cenarios': self.n_cenarios, 'linhas': self.linhas, 'tipos': self.tipos,
+                           'indices_barras': self.indices_barras, 'codigos_status': CODIGOS_STATUS,
+                           'execution_timestamp': execution_timestamp.isoformat() if execution_timestamp else None}, f)
+
+        forma = (self.n_cenarios, len(self.linhas), len(self.indices_barras))
+        self.depois = np.memmap(os.path.join(diretorio, 'tensoes_depois.f32'), dtype=np.float32, mode=modo, shape=forma)
+        self.antes = np.memmap(os.path.join(diretorio, 'tensoes_antes.f32'), dtype=np.float32, mode=modo,
+                               shape=(self.n_cenarios, len(self.indices_barras)))
+        self.status = np.memmap(os.path.join(diretorio, 'status.u8'), dtype=np.uint8, mode=modo, shape=forma[:2])
+        if modo == 'w+':
+            self.depois[:] = np.nan
+            self.antes[:] = np.nan
+
+    @classmethod
+    def abrir(cls, diretorio, modo='r'):
+        """Abre um armazenamento existente (somente leitura por padrão)."""
+        with open(os.path.join(diretorio, ARQUIVO_METADADOS), encoding='utf-8') as f:
+            metadados = json.load(f)
+        execution_timestamp = metadados.get('execution_timestamp')
+        return cls(diretorio, metadados['n_cenarios'], metadados['linhas'], metadados['indices_barras'], modo=modo,
+                   execution_timestamp=datetime.fromisoformat(execution_timestamp) if execution_timestamp else None,
+                   tipos=metadados.get('tipos'))
+
+    def vetor_depois(self, cenario, pos_linha):
+        """Visão (barras,) onde o fluxo pós-contingência grava as tensões."""
+        return self.depois[cenario, pos_linha]
+
+    def gravar_antes(self, cenario, vm_pu):
+        """Grava as tensões do cenário antes das contingências (na ordem de indices_barras)."""
+        self.antes[cenario] = np.asarray(vm_pu, dtype=np.float32)
+
+    def marcar(self, cenario, pos_linha, status):
+        """Registra o status da contingência na máscara."""
+        self.status[cenario, pos_linha] = CODIGOS_STATUS[status]
+
+    def tensoes_antes(self, cenario):
+        return TensoesBarras(self.posicoes_barras, self.antes[cenario])
+
+    def tensoes_depois(self, cenario, pos_linha):
+        return TensoesBarras(self.posicoes_barras, self.depois[cenario, pos_linha])
+
+    def mascara(self, *status):
+        """Máscara booleana (cenários x contingências) das entradas com algum dos status (padrão: normal)."""
+        codigos = [CODIGOS_STATUS[s] for s in status] or [NORMAL]
+        return np.isin(self.status, codigos)
+
+    def impacto(self, cenario):
+        """
+        |V_depois - V_antes| das contingências de linha não críticas de um cenário.
+        Retorna (posicoes_linhas, diferencas float32 contingências x barras).
+        """
+        posicoes = np.nonzero((self.status[cenario] == NORMAL) & self._contingencias_linha)[0]
+        return posicoes, np.abs(self.depois[cenario, posicoes] - self.antes[cenario][None, :])
+
+    def flush(self):
+        for arquivo in (self.depois, self.antes, self.status):
+            if arquivo.mode != 'r':
+                arquivo.flush()
@@ -0,0 +1,94 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+
+import pandapower as pp
+
+# Versão do formato gravado em disco. Incrementar quando a estrutura do arquivo mudar.
+VERSAO_FORMATO_CACHE = 1
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def get_cache_dir():
+    """Retorna o diretório do cache da rede base, adaptando para o ambiente."""
+    return os.getenv('CACHE_REDE_DIR', os.path.join(project_root, '.cache', 'rede_base'))
+
+
+def _hash_codigo(funcao):
+    """
+    Retorna o hash do código-fonte de uma função (ou de um módulo inteiro) de preparação.
+    Qualquer alteração na lógica de preparação gera uma nova chave de cache.
+    """
+    funcao = getattr(funcao, 'fn', funcao)  # Tasks do Prefect expõem a função original em .fn
+    try:
+        codigo = inspect.getsource(funcao)
+    except (OSError, TypeError):
+        codigo = getattr(funcao, '__qualname__', funcao.__name__)
+    return hashlib.sha256(codigo.encode('utf-8')).hexdigest()
+
+
+def chave_cache_rede(caso, parametros, funcoes_preparacao=()):
+    """
+    Calcula a chave (endereçada por conteúdo) da rede base preparada.
+
+    A chave combina o nome do caso, os parâmetros de preparação, o código-fonte
+    das funções que preparam/resolvem a rede e a versão do pandapower.
+    """
+    conteudo = {
+        'caso': caso,
+        'parametros': parametros,
+        'codigo': [_hash_codigo(f) for f in funcoes_preparacao],
+        'pandapower': pp.__version__,
+        'formato': VERSAO_FORMATO_CACHE,
+    }
+    serializado = json.dumps(conteudo, sort_keys=True, default=str)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def _caminho_cache(chave, diretorio=None):
+    return os.path.join(diretorio or get_cache_dir(), f"{chave}.pkl")
+
+
+def carregar_rede_cache(chave, diretorio=None):
+    """
+    Carrega do disco a rede base e o status de convergência associados à chave.
+    Retorna None se a chave não existir ou se o arquivo estiver corrompido.
+    """
+    caminho = _caminho_cache(chave, diretorio)
+    if not os.path.exists(caminho):
+        return None
+
+    try:
+        with open(caminho, 'rb') as f:
+            conteudo = pickle.load(f)
+    except Exception as e:
+        print(f"⚠️ Cache da rede base ilegível ({caminho}), será recriado: {e}")
+        return None
+
+    if conteudo.get('chave') != chave:
+        return None
+    return conteudo['net'], conteudo['convergencia']
+
+
+def salvar_rede_cache(chave, net, convergencia, diretorio=None):
+    """
+    Grava no disco a rede base preparada (com os resultados do fluxo de potência).
+    A escrita é atômica: o arquivo final só aparece depois de completamente gravado.
+    """
+    diretorio = diretorio or get_cache_dir()
+    os.makedirs(diretorio, exist_ok=True)
+    conteudo = {'chave': chave, 'net': net, 'convergencia': convergencia}
+
+    fd, caminho_tmp = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(conteudo, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(caminho_tmp, _caminho_cache(chave, diretorio))
+    except Exception as e:
+        print(f"⚠️ Não foi possível gravar o cache da rede base: {e}")
+        if os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
@@ -0,0 +1,101 @@
+import numpy as np
+
+# Tipos de violação, na ordem de prioridade usada quando há mais de uma na mesma contingência
+SUBTENSAO, SOBRETENSAO, SOBRECARGA = 'subtensao', 'sobretensao', 'sobrecarga'
+TIPOS_VIOLACAO = (SUBTENSAO, SOBRETENSAO, SOBRECARGA)
+# Colunas tipadas de resultados_simulacao que descrevem a violação de cada contingência
+COLUNAS_VIOLACAO = ('tipo_violacao', 'elemento_violacao', 'valor_violacao', 'limite_violacao', 'excesso_violacao')
+
+
+def _extremo(matriz, maximo):
+    """Valor e posição do mínimo/máximo de cada linha da matriz, ignorando NaN (linha toda NaN: ±inf)."""
+    preenchida = np.where(np.isnan(matriz), -np.inf if maximo else np.inf, matriz)
+    if preenchida.shape[1] == 0:
+        return np.full(len(matriz), -np.inf if maximo else np.inf), np.zeros(len(matriz), dtype=np.int64)
+    posicoes = preenchida.argmax(axis=1) if maximo else preenchida.argmin(axis=1)
+    return np.take_along_axis(preenchida, posicoes[:, None], axis=1)[:, 0], posicoes
+
+
+def classificar_contingencias(vm_pu, loading_percent, vmin, vmax, line_loading_max, barras=None, linhas=None, validas=None):
+    """
+    Classifica de uma só vez todas as contingências de um cenário pelos limites de
+    tensão e carregamento. `vm_pu` (contingências x barras) e `loading_percent`
+    (contingências x linhas) são as matrizes pós-contingência; `barras` e `linhas`,
+    os índices do pandapower de cada coluna (posições, se omitidos). Só as linhas de
+    `validas` (contingências convergidas e sem ilhamento) são classificadas.
+
+    Retorna um dict de vetores (um valor por contingência): 'critica' e as
+    COLUNAS_VIOLACAO: tipo (TIPOS_VIOLACAO, None sem violação), barra ou linha onde
+    ocorre (-1 sem violação), valor medido (pu ou %), limite e excesso sobre o limite.
+    Com mais de uma violação vale a primeira de TIPOS_VIOLACAO, medida no pior elemento.
+    """
+    vm = np.asarray(vm_pu, dtype=float)
+    loading = np.asarray(loading_percent, dtype=float)
+    n = len(vm)
+    validas = np.ones(n, dtype=bool) if validas is None else np.asarray(validas, dtype=bool)
+    barras = np.arange(vm.shape[1]) if barras is None else np.asarray(barras)
+    linhas = np.arange(loading.shape[1]) if linhas is None else np.asarray(linhas)
+
+    vm_min, pos_min = _extremo(vm, maximo=False)
+    vm_max, pos_max = _extremo(vm, maximo=True)
+    loading_max, pos_loading = _extremo(loading, maximo=True)
+
+    subtensao = validas & (vm_min < vmin)
+    sobretensao = validas & ~subtensao & (vm_max > vmax)
+    sobrecarga = validas & ~subtensao & ~sobretensao & (loading_max > line_loading_max)
+
+    resultado = {
+        'critica': subtensao | sobretensao | sobrecarga,
+        'tipo_violacao': np.full(n, None, dtype=object),
+        'elemento_violacao': np.full(n, -1, dtype=np.int64),
+        'valor_violacao': np.full(n, np.nan),
+        'limite_violacao': np.full(n, np.nan),
+        'excesso_violacao': np.full(n, np.nan),
+    }
+    for tipo, mascara, valores, posicoes, elementos, limite, sinal in (
+            (SUBTENSAO, subtensao, vm_min, pos_min, barras, vmin, -1.0),
+            (SOBRETENSAO, sobretensao, vm_max, pos_max, barras, vmax, 1.0),
+            (SOBRECARGA, sobrecarga, loading_max, pos_loading, linhas, line_loading_max, 1.0)):
+        resultado['tipo_violacao'][mascara] = tipo
+        resultado['elemento_violacao'][mascara] = elementos[posicoes[mascara]]
+        resultado['valor_violacao'][mascara] = valores[mascara]
+        resultado['limite_violacao'][mascara] = limite
+        resultado['excesso_violacao'][mascara] = sinal * (valores[mascara] - limite)
+    return resultado
+
+
+def detalhe_violacao(tipo, valor, limite):
+    """Descrição da violação gravada na coluna 'detalhe' (None sem violação)."""
+    if tipo == SUBTENSAO:
+        return f"Tensão mínima ({valor:.4f} pu) abaixo do limite ({limite:.4f} pu)"
+    if tipo == SOBRETENSAO:
+        return f"Tensão máxima ({valor:.4f} pu) acima do limite ({limite:.4f} pu)"
+    if tipo == SOBRECARGA:
+        return f"Carregamento de linha ({valor:.2f} %) excedido ({limite:.2f} %)"
+    return None
+
+
+def violacao(classificacao, pos):
+    """Colunas de violação da contingência `pos` como valores Python (None sem violação), para as linhas do banco."""
+    if classificacao['tipo_violacao'][pos] is None:
+        return dict.fromkeys(COLUNAS_VIOLACAO)
+    return {
+        'tipo_violacao': classificacao['tipo_violacao'][pos],
+        'elemento_violacao': int(classificacao['elemento_violacao'][pos]),
+        'valor_violacao': float(classificacao['valor_violacao'][pos]),
+        'limite_violacao': float(classificacao['limite_violacao'][pos]),
+        'excesso_violacao': float(classificacao['excesso_violacao'][pos]),
+    }
+
+
+def classificar_contingencia(vm_pu, loading_percent, vmin, vmax, line_loading_max, barras=None, linhas=None):
+    """
+    Classifica uma contingência convergida (ver classificar_contingencias).
+    Retorna (status, detalhe, colunas de violação): ('normal', None, ...) ou ('crítica', descrição, ...).
+    """
+    classificacao = classificar_contingencias(np.asarray(vm_pu, dtype=float)[None, :],
+                                              np.asarray(loading_percent, dtype=float)[None, :],
+                                              vmin, vmax, line_loading_max, barras, linhas)
+    colunas = violacao(classificacao, 0)
+    status = 'crítica' if classificacao['critica'][0] else 'normal'
+    return status, detalhe_violacao(colunas['tipo_violacao'], colunas['valor_violacao'], colunas['limite_violacao']), colunas
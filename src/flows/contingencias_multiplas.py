@@ -0,0 +1,219 @@
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+# Combinações avaliadas por bloco na estimativa de severidade (memória: bloco x linhas x ordem)
+TAMANHO_BLOCO_SEVERIDADE = 2048
+# |det(I - H_KK)| abaixo deste valor indica que o desligamento separa a rede (modelo DC)
+TOLERANCIA_SINGULAR = 1e-8
+
+
+class IndiceIlhamento:
+    """
+    Índice topológico dos desligamentos de linhas que ilham a rede (algum componente
+    conectado sem barra slack, como em verificar_ilhamento), montado uma única vez a
+    partir da topologia da rede base.
+
+    Guarda apenas os conjuntos mínimos: as linhas que ilham sozinhas (pontes do grafo)
+    e os pares em que nenhuma das linhas ilha sozinha (pontes do grafo sem a primeira
+    linha). Qualquer combinação que contenha um conjunto mínimo também ilha e é
+    descartada sem fluxo de potência. Conjuntos de ordem maior entram com registrar().
+    Com `ordem_maxima` = 1, só as linhas que ilham sozinhas são indexadas.
+    """
+
+    def __init__(self, net, ordem_maxima=2):
+        from pandapower.topology import create_nxgraph
+
+        self.grafo = create_nxgraph(net, respect_switches=True)
+        self.barras_slack = set(net.gen[net.gen['slack']].bus.values)
+        self.arestas = {int(chave[1]): (u, v, chave) for u, v, chave in self.grafo.edges(keys=True) if chave[0] == 'line'}
+        self.minimos = set()
+        self._minimos_por_linha = defaultdict(list)
+
+        for linha in self._pontes():
+            if self.ilha([linha]):
+                self.registrar([linha])
+        if ordem_maxima < 2:
+            return
+        for linha in self.arestas:
+            if self.ilha_sozinha(linha):
+                continue
+            with self._sem_linhas([linha]):
+                pontes = self._pontes()
+            for outra in pontes:
+                if not self.ilha_sozinha(outra) and frozenset((linha, outra)) not in self.minimos and self.ilha([linha, outra]):
+                    self.registrar([linha, outra])
+
+    def _pontes(self):
+        """Linhas que são pontes (arestas de corte) do grafo atual."""
+        import networkx as nx
+        pontes = []
+        for u, v in nx.bridges(self.grafo):
+            chave = next(iter(self.grafo[u][v]))
+            if chave[0] == 'line':
+                pontes.append(int(chave[1]))
+        return pontes
+
+    @contextmanager
+    def _sem_linhas(self, linhas):
+        """Contexto em que as linhas ficam fora do grafo (restauradas na saída)."""
+        removidas = [(u, v, chave, self.grafo.get_edge_data(u, v, chave))
+                     for u, v, chave in (self.arestas[l] for l in linhas if l in self.arestas)]
+        for u, v, chave, _ in removidas:
+            self.grafo.remove_edge(u, v, chave)
+        try:
+            yield
+        finally:
+            for u, v, chave, dados in removidas:
+                self.grafo.add_edge(u, v, key=chave, **dados)
+
+    def ilha(self, linhas):
+        """Verifica no grafo se o desligamento simultâneo das linhas deixa algum componente sem slack."""
+        import networkx as nx
+        with self._sem_linhas(linhas):
+            return any(not (componente & self.barras_slack) for componente in nx.connected_components(self.grafo))
+
+    def num_componentes(self, linhas):
+        """Número de componentes conectados do grafo com as linhas desligadas."""
+        import networkx as nx
+        with self._sem_linhas(linhas):
+            return nx.number_connected_components(self.grafo)
+
+    def registrar(self, linhas):
+        conjunto = frozenset(int(l) for l in linhas)
+        if conjunto not in self.minimos:
+            self.minimos.add(conjunto)
+            for linha in conjunto:
+                self._minimos_por_linha[linha].append(conjunto)
+
+    def ilha_sozinha(self, linha):
+        return frozenset((linha,)) in self.minimos
+
+    def contem_ilhamento(self, linhas):
+        """True se a combinação contém algum conjunto mínimo de ilhamento já conhecido."""
+        conjunto = set(linhas)
+        return any(minimo <= conjunto for linha in conjunto for minimo in self._minimos_por_linha[linha])
+
+    def minimos_de_ordem(self, ordem):
+        return sorted(tuple(sorted(m)) for m in self.minimos if len(m) == ordem)
+
+
+class SensibilidadeLinear:
+    """
+    Fatores de distribuição do modelo DC (PTDF do pandapower) para estimar, sem fluxo
+    de potência AC, o fluxo nas linhas após o desligamento simultâneo de um conjunto K
+    de linhas. Cada desligamento é representado por uma transferência t entre as
+    barras da própria linha, com (I - H_KK) t = f_K, e o fluxo pós-contingência é
+    f + H[:, K] t. A severidade estimada é o maior carregamento (%) resultante.
+    """
+
+    def __init__(self, net):
+        from pandapower.pypower.makePTDF import makePTDF
+        from pandapower.pypower.idx_brch import F_BUS, T_BUS
+        from src.flows.solver_contingencia import posicoes_linhas_ppci
+
+        interno = net._ppc['internal']
+        pos_linhas = posicoes_linhas_ppci(net)
+        self.ativas = pos_linhas >= 0
+        self.linhas = [int(l) for l in net.line.index[self.ativas]]
+        self.posicoes = {linha: pos for pos, linha in enumerate(self.linhas)}
+
+        ptdf = makePTDF(interno['baseMVA'], interno['bus'], interno['branch'])[pos_linhas[self.ativas]]
+        ramos = interno['branch'][pos_linhas[self.ativas]]
+        # H[l, k]: variação do fluxo na linha l por MW transferido da barra 'from' para a 'to' da linha k
+        self.H = ptdf[:, ramos[:, F_BUS].real.astype(np.int64)] - ptdf[:, ramos[:, T_BUS].real.astype(np.int64)]
+
+        linhas = net.line[self.ativas]
+        vn_from = net.bus.loc[linhas['from_bus'].values, 'vn_kv'].values
+        self.capacidade_mva = np.sqrt(3) * vn_from * (linhas['max_i_ka'] * linhas['df'] * linhas['parallel']).values
+
+    def severidade(self, fluxos_mw, combinacoes):
+        """
+        Maior carregamento (%) estimado após cada combinação (linhas = posições em
+        self.linhas, uma combinação por linha da matriz). Combinações que separam a
+        rede no modelo DC recebem severidade infinita.
+        """
+        combinacoes = np.asarray(combinacoes, dtype=np.int64)
+        f = np.asarray(fluxos_mw, dtype=float)[self.ativas]
+        severidades = np.empty(len(combinacoes))
+        if not len(combinacoes):
+            return severidades
+
+        ordem = combinacoes.shape[1]
+        identidade = np.eye(ordem)
+        for inicio in range(0, len(combinacoes), TAMANHO_BLOCO_SEVERIDADE):
+            K = combinacoes[inicio:inicio + TAMANHO_BLOCO_SEVERIDADE]
+            A = identidade - self.H[K[:, :, None], K[:, None, :]]
+            singular = np.abs(np.linalg.det(A)) < TOLERANCIA_SINGULAR
+            A[singular] = identidade
+            t = np.linalg.solve(A, f[K][:, :, None])[:, :, 0]
+            pos = f[None, :] + np.einsum('lpk,pk->pl', self.H[:, K], t)
+            pos[np.arange(len(K))[:, None], K] = 0.0
+            severidade = np.nanmax(np.abs(pos) / self.capacidade_mva[None, :], axis=1) * 100
+            severidade[singular] = np.inf
+            severidades[inicio:inicio + len(K)] = severidade
+        return severidades
+
+
+def enumerar_contingencias(indice, sensibilidade, fluxos_mw, ordem, max_combinacoes=None, estatisticas=None):
+    """
+    Gera as contingências múltiplas de ordem 2 até `ordem` como tuplas
+    (linhas, severidade_estimada, ilhamento), ordem por ordem.
+
+    Em cada ordem vêm primeiro os conjuntos mínimos de ilhamento (que não precisam de
+    fluxo de potência) e depois as demais combinações em ordem decrescente de
+    severidade estimada. Combinações que contêm um conjunto de ilhamento conhecido
+    são descartadas. Com `max_combinacoes`, só as mais severas de cada ordem são
+    geradas e usadas como base da ordem seguinte; sem ele, as combinações de ordem k
+    são todas as extensões das de ordem k - 1.
+
+    `estatisticas` (dict opcional) recebe, por ordem, o total de combinações possíveis
+    e quantas foram descartadas por ilhamento ou pelo limite.
+    """
+    estatisticas = {} if estatisticas is None else estatisticas
+    n_linhas = len(sensibilidade.linhas)
+    candidatas = [pos for pos, linha in enumerate(sensibilidade.linhas) if not indice.ilha_sozinha(linha)]
+    base = [(pos,) for pos in candidatas]
+
+    for k in range(2, ordem + 1):
+        estatisticas[f'combinacoes_possiveis_n{k}'] = math.comb(n_linhas, k)
+        for minimo in indice.minimos_de_ordem(k):
+            yield minimo, np.inf, True
+
+        combinacoes = []
+        podadas = 0
+        for prefixo in base:
+            for pos in candidatas:
+                if pos <= prefixo[-1]:
+                    continue
+                combinacao = prefixo + (pos,)
+                if k > 2 and indice.contem_ilhamento([sensibilidade.linhas[p] for p in combinacao]):
+                    podadas += 1
+                    continue
+                combinacoes.append(combinacao)
+        if k == 2:
+            pares_ilhamento = {frozenset(m) for m in indice.minimos_de_ordem(2)}
+            total = len(combinacoes)
+            combinacoes = [c for c in combinacoes
+                           if frozenset(sensibilidade.linhas[p] for p in c) not in pares_ilhamento]
+            podadas += total - len(combinacoes)
+        estatisticas[f'podadas_ilhamento_n{k}'] = estatisticas.get(f'podadas_ilhamento_n{k}', 0) + podadas
+
+        severidades = sensibilidade.severidade(fluxos_mw, np.array(combinacoes, dtype=np.int64).reshape(-1, k))
+        ordenadas = np.argsort(-severidades, kind='stable')
+        base = []
+        for posicao in ordenadas:
+            combinacao = combinacoes[posicao]
+            linhas = tuple(sensibilidade.linhas[p] for p in combinacao)
+            if np.isinf(severidades[posicao]) and indice.ilha(linhas):
+                # Separação da rede não coberta pelo índice (ordem > 2): passa a fazer parte dele
+                indice.registrar(linhas)
+                yield linhas, np.inf, True
+                continue
+            if max_combinacoes is not None and len(base) >= max_combinacoes:
+                estatisticas[f'descartadas_limite_n{k}'] = len(ordenadas) - len(base)
+                break
+            base.append(combinacao)
+            yield linhas, float(severidades[posicao]), False
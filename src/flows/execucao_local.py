@@ -0,0 +1,191 @@
+"""
+Execução da simulação de contingências e da análise de impacto pela linha de comando,
+com os parâmetros de simulacao_contingencia_flow lidos de um arquivo JSON (ex.: params.json).
+
+O armazenamento define onde os resultados ficam:
+    sqlite    banco SQLite em <saida>/resultados.sqlite, com as mesmas tabelas do PostgreSQL
+    parquet   resultados, tensões e impacto em Parquet em <saida> (src/flows/exportacao_parquet.py);
+              métricas e sensibilidades vão para o catálogo SQLite em <saida>/resultados.sqlite
+    postgres  o banco de get_db_url() e o Prefect configurado no ambiente (como no deploy)
+
+Com sqlite e parquet não é preciso servidor do Prefect nem PostgreSQL: os flows rodam
+com a API efêmera do Prefect (no próprio processo, com o estado em <saida>/prefect).
+
+Com --workers N, os cenários são divididos em N faixas contíguas simuladas em processos
+separados (primeiro_cenario / n_cenarios), todas com o mesmo execution_timestamp, e a
+análise de impacto roda uma única vez no final.
+
+Uso:
+    python -m src.flows.execucao_local --params params.json --armazenamento sqlite --saida resultados_locais --workers 4
+"""
+# O Prefect e o resultados2 só são importados depois de configurar o ambiente (DATABASE_URL,
+# PREFECT_HOME), que os dois leem no carregamento: nada pesado no topo deste módulo.
+import argparse
+import inspect
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+ARMAZENAMENTOS = ('sqlite', 'parquet', 'postgres')
+ARQUIVO_SQLITE = 'resultados.sqlite'
+# Espera máxima por uma escrita concorrente no SQLite (segundos): os workers gravam no mesmo arquivo
+TIMEOUT_SQLITE_S = 60
+
+
+def ler_parametros(caminho):
+    """Parâmetros do flow no arquivo JSON ({} sem arquivo). 'utf-8-sig': arquivos gravados pelo PowerShell têm BOM."""
+    if not caminho:
+        return {}
+    with open(caminho, encoding='utf-8-sig') as arquivo:
+        return json.load(arquivo)
+
+
+def configurar_ambiente(armazenamento, saida, nome_processo='principal'):
+    """
+    Aponta DATABASE_URL para o SQLite da saída e o Prefect para a API efêmera, com um
+    PREFECT_HOME por processo (o banco de estado do Prefect não é compartilhado entre
+    workers). Com postgres, o ambiente fica como está.
+    """
+    if armazenamento == 'postgres':
+        return
+    caminho_sqlite = os.path.abspath(os.path.join(saida, ARQUIVO_SQLITE))
+    os.environ['DATABASE_URL'] = f"sqlite:///{caminho_sqlite}?timeout={TIMEOUT_SQLITE_S}"
+    os.environ.pop('PREFECT_API_URL', None)
+    os.environ['PREFECT_HOME'] = os.path.abspath(os.path.join(saida, 'prefect', nome_processo))
+    os.makedirs(os.environ['PREFECT_HOME'], exist_ok=True)
+
+
+def parametros_flow(parametros, armazenamento, saida):
+    """Parâmetros do arquivo completados com o que o armazenamento exige."""
+    parametros = dict(parametros)
+    if armazenamento == 'parquet':
+        parametros['diretorio_parquet'] = os.path.abspath(saida)
+        parametros['gravar_resultados_banco'] = False
+    return parametros
+
+
+def faixas_cenarios(primeiro_cenario, n_cenarios, n_workers):
+    """Divide os cenários em até `n_workers` faixas contíguas (primeiro_cenario, n_cenarios)."""
+    n_workers = max(1, min(n_workers, n_cenarios))
+    tamanho, resto = divmod(n_cenarios, n_workers)
+    faixas = []
+    inicio = primeiro_cenario
+    for k in range(n_workers):
+        n = tamanho + (1 if k < resto else 0)
+        faixas.append((inicio, n))
+        inicio += n
+    return faixas
+
+
+def _simular_faixa(armazenamento, saida, nome_processo, parametros):
+    """Roda simulacao_contingencia_flow em um processo do pool. Retorna a duração (s)."""
+    configurar_ambiente(armazenamento, saida, nome_processo)
+    from src.flows.resultados2 import simulacao_contingencia_flow
+
+    inicio = time.perf_counter()
+    simulacao_contingencia_flow(**parametros)
+    return time.perf_counter() - inicio
+
+
+def _resumo_status(armazenamento, saida, execution_timestamp):
+    """Contagem de contingências por status na execução (do Parquet ou do banco)."""
+    if armazenamento == 'parquet':
+        from src.flows.exportacao_parquet import carregar_resultados_parquet, id_execucao
+        resultados = carregar_resultados_parquet(saida, id_execucao(execution_timestamp))
+        return resultados['status'].value_counts().to_dict()
+
+    from sqlalchemy import create_engine, text
+    from src.flows.resultados2 import get_db_url, _instante_banco
+    with create_engine(get_db_url()).connect() as conexao:
+        linhas = conexao.execute(text(
+            "SELECT status, COUNT(*) FROM resultados_simulacao "
+            "WHERE execution_timestamp = :execution_timestamp GROUP BY status"),
+            {'execution_timestamp': _instante_banco(execution_timestamp, conexao.dialect.name)}).fetchall()
+    return {status: n for status, n in linhas}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--params', default=None, help="Arquivo JSON com os parâmetros de simulacao_contingencia_flow")
+    parser.add_argument('--armazenamento', choices=ARMAZENAMENTOS, default='sqlite')
+    parser.add_argument('--saida', default='resultados_locais',
+                        help="Diretório do SQLite, do Parquet e do estado do Prefect (sqlite e parquet)")
+    parser.add_argument('--workers', type=int, default=1, help="Processos simulando faixas de cenários em paralelo")
+    parser.add_argument('--sem-impacto', action='store_true', help="Não roda a análise de impacto no final")
+    args = parser.parse_args(argv)
+
+    sys.stdout.reconfigure(encoding='utf-8') # Emojis no console do Windows
+    sys.stderr.reconfigure(encoding='utf-8')
+
+    parametros = ler_parametros(args.params)
+    if args.armazenamento != 'postgres':
+        os.makedirs(args.saida, exist_ok=True)
+    configurar_ambiente(args.armazenamento, args.saida)
+
+    from pytz import timezone
+    from datetime import datetime
+    from src.flows.resultados2 import (simulacao_contingencia_flow, analise_impacto_flow, preparar_rede_base,
+                                       criar_tabelas_postgres)
+
+    aceitos = inspect.signature(simulacao_contingencia_flow.fn).parameters
+    desconhecidos = sorted(set(parametros) - set(aceitos))
+    if desconhecidos:
+        parser.error(f"Parâmetros desconhecidos em {args.params}: {', '.join(desconhecidos)}")
+    if args.workers < 1:
+        parser.error("--workers deve ser pelo menos 1.")
+
+    parametros = parametros_flow(parametros, args.armazenamento, args.saida)
+    parametros['execution_timestamp'] = datetime.now(timezone('America/Sao_Paulo'))
+    n_cenarios = parametros.get('n_cenarios', aceitos['n_cenarios'].default)
+    faixas = faixas_cenarios(parametros.get('primeiro_cenario', 0), n_cenarios, args.workers)
+    if len(faixas) > 1:
+        if parametros.get('amostragem_adaptativa'):
+            parser.error("A amostragem adaptativa decide os cenários durante a execução: use --workers 1.")
+        if parametros.get('armazenamento_dir'):
+            parser.error("O armazenamento em memmap é gravado por um único processo: use --workers 1.")
+
+    inicio = time.perf_counter()
+    print(f"--- Simulação de contingências ({n_cenarios} cenários, {len(faixas)} processo(s), "
+          f"armazenamento {args.armazenamento}) ---")
+    if len(faixas) == 1:
+        simulacao_contingencia_flow(**parametros)
+    else:
+        # Tabelas criadas (e rede base colocada no cache) antes dos workers, que só inserem dados
+        net_base, _ = preparar_rede_base.fn(caso=parametros.get('caso', aceitos['caso'].default),
+                                            usar_cache=parametros.get('usar_cache_rede', aceitos['usar_cache_rede'].default))
+        criar_tabelas_postgres.fn(indices_barras=list(net_base.bus.index))
+
+        # 'spawn': um fork herdaria as threads e o estado do Prefect do processo principal
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(faixas), mp_context=contexto) as executor:
+            futuros = [executor.submit(_simular_faixa, args.armazenamento, args.saida, f'worker-{k}',
+                                       dict(parametros, primeiro_cenario=primeiro, n_cenarios=n))
+                       for k, (primeiro, n) in enumerate(faixas)]
+            for k, ((primeiro, n), futuro) in enumerate(zip(faixas, futuros)):
+                print(f"Worker {k}: cenários {primeiro} a {primeiro + n - 1} em {futuro.result():.1f} s")
+    duracao_simulacao = time.perf_counter() - inicio
+
+    if not args.sem_impacto:
+        print("\n--- Análise de impacto ---")
+        if args.armazenamento == 'parquet' and not parametros.get('armazenamento_dir'):
+            from src.flows.exportacao_parquet import exportar_impacto_parquet, id_execucao
+            n_analisadas = exportar_impacto_parquet(args.saida, id_execucao(parametros['execution_timestamp']))
+            print(f"Impacto de {n_analisadas} contingências gravado em {os.path.join(args.saida, 'impacto')}")
+        else:
+            analise_impacto_flow(armazenamento_dir=parametros.get('armazenamento_dir'))
+
+    status = _resumo_status(args.armazenamento, args.saida, parametros['execution_timestamp'])
+    print(f"\nSimulação em {duracao_simulacao:.1f} s, total {time.perf_counter() - inicio:.1f} s. "
+          f"Contingências por status: {', '.join(f'{s}: {n}' for s, n in sorted(status.items())) or 'nenhuma'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+
+# Colunas da tabela resultados_simulacao exportadas (além de 'run' e 'cenario', que viram partições)
+COLUNAS_RESULTADOS = ['linha_desligada', 'tipo_elemento', 'elemento_desligado', 'status', 'ilhamento',
+                      'num_componentes_conectados', 'convergencia', 'detalhe', 'linhas_desligadas', 'tipo_violacao',
+                      'elemento_violacao', 'valor_violacao', 'limite_violacao', 'excesso_violacao']
+
+
+def _pyarrow():
+    """Importa o pyarrow sob demanda (dependência usada apenas na exportação em Parquet)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("A exportação/leitura em Parquet requer o pacote pyarrow (pip install pyarrow).") from e
+    return pa, ds
+
+
+def id_execucao(execution_timestamp):
+    """
+    Identificador da execução usado como partição 'run' (ex.: 20250706T024905.123456).
+    Com microssegundos: execuções iniciadas no mesmo segundo não gravam na mesma partição.
+    """
+    return execution_timestamp.strftime('%Y%m%dT%H%M%S.%f')
+
+
+def _inteiro_ou_nulo(valor):
+    return None if valor is None or valor == 'N/A' or valor != valor else int(valor)
+
+
+def _tabela_resultados(resultados, run):
+    pa, _ = _pyarrow()
+    colunas = {
+        'run': pa.array([run] * len(resultados), pa.string()),
+        'cenario': pa.array([int(r['cenario']) for r in resultados], pa.int32()),
+        'linha_desligada': pa.array([_inteiro_ou_nulo(r.get('linha_desligada')) for r in resultados], pa.int32()),
+        'tipo_elemento': pa.array([r.get('tipo_elemento') for r in resultados], pa.string()),
+        'elemento_desligado': pa.array([_inteiro_ou_nulo(r.get('elemento_desligado')) for r in resultados], pa.int32()),
+        'status': pa.array([r.get('status') for r in resultados], pa.string()),
+        'ilhamento': pa.array([bool(r.get('ilhamento')) for r in resultados], pa.bool_()),
+        'num_componentes_conectados': pa.array([_inteiro_ou_nulo(r.get('num_componentes_conectados')) for r in resultados], pa.int32()),
+        'convergencia': pa.array([bool(r.get('convergencia')) for r in resultados], pa.bool_()),
+        'detalhe': pa.array([r.get('detalhe') for r in resultados], pa.string()),
+        'linhas_desligadas': pa.array([r.get('linhas_desligadas') for r in resultados], pa.string()),
+        'tipo_violacao': pa.array([r.get('tipo_violacao') for r in resultados], pa.string()),
+        'elemento_violacao': pa.array([_inteiro_ou_nulo(r.get('elemento_violacao')) for r in resultados], pa.int32()),
+        'valor_violacao': pa.array([r.get('valor_violacao') for r in resultados], pa.float64()),
+        'limite_violacao': pa.array([r.get('limite_violacao') for r in resultados], pa.float64()),
+        'excesso_violacao': pa.array([r.get('excesso_violacao') for r in resultados], pa.float64()),
+    }
+    return pa.table(colunas)
+
+
+def _lista_tensoes(tensoes, indices_barras):
+    """Coluna FixedSizeList<float32> (uma lista de tensões por contingência, na ordem de indices_barras)."""
+    from src.flows.armazenamento_tensoes import TensoesBarras
+
+    pa, _ = _pyarrow()
+    if tensoes and all(isinstance(t, TensoesBarras) and len(t) == len(indices_barras) for t in tensoes):
+        # Visões do armazenamento em memmap: os vetores já estão na ordem das barras
+        valores = np.stack([t.vetor for t in tensoes]).astype(np.float32, copy=False)
+    else:
+        valores = np.array([[tensao.get(i, np.nan) for i in indices_barras] for tensao in tensoes], dtype=np.float32)
+    return pa.FixedSizeListArray.from_arrays(pa.array(valores.ravel(), pa.float32()), len(indices_barras))
+
+
+def _tabela_tensoes(tensao_data, indices_barras, run):
+    pa, _ = _pyarrow()
+    tabela = pa.table({
+        'run': pa.array([run] * len(tensao_data), pa.string()),
+        'cenario': pa.array([int(r['cenario']) for r in tensao_data], pa.int32()),
+        'linha_desligada': pa.array([int(r['linha_desligada']) for r in tensao_data], pa.int32()),
+        'from_bus': pa.array([int(r['from_bus']) for r in tensao_data], pa.int32()),
+        'to_bus': pa.array([int(r['to_bus']) for r in tensao_data], pa.int32()),
+        'vm_pu_antes': _lista_tensoes([r['tensao_antes'] for r in tensao_data], indices_barras),
+        'vm_pu_depois': _lista_tensoes([r['tensao_depois'] for r in tensao_data], indices_barras),
+    })
+    return tabela.replace_schema_metadata({'indices_barras': json.dumps([int(i) for i in indices_barras])})
+
+
+def _gravar(tabela, diretorio, run, compressao):
+    _, ds = _pyarrow()
+    ds.write_dataset(
+        tabela, diretorio, format='parquet', partitioning=['run', 'cenario'], partitioning_flavor='hive',
+        basename_template=f"{run}-{{i}}.parquet", existing_data_behavior='overwrite_or_ignore',
+        file_options=ds.ParquetFileFormat().make_write_options(compression=compressao),
+    )
+
+
+def exportar_resultados_parquet(diretorio, execution_timestamp, resultados, tensao_data, indices_barras, compressao='zstd'):
+    """
+    Grava os resultados de uma execução em Parquet, particionados por execução e cenário:
+
+        <diretorio>/resultados/run=<id>/cenario=<n>/*.parquet  (status de cada contingência)
+        <diretorio>/tensoes/run=<id>/cenario=<n>/*.parquet     (tensões das contingências não críticas)
+
+    As tensões antes/depois são gravadas em float32, uma lista por contingência na ordem de
+    `indices_barras` (guardada nos metadados). Retorna o id da execução (partição 'run').
+    """
+    run = id_execucao(execution_timestamp)
+    if resultados:
+        _gravar(_tabela_resultados(resultados, run), os.path.join(diretorio, 'resultados'), run, compressao)
+    if tensao_data:
+        _gravar(_tabela_tensoes(tensao_data, indices_barras, run), os.path.join(diretorio, 'tensoes'), run, compressao)
+    return run
+
+
+def execucoes_parquet(diretorio):
+    """Ids das execuções exportadas em `diretorio`, em ordem cronológica."""
+    base = os.path.join(diretorio, 'resultados')
+    if not os.path.isdir(base):
+        return []
+    return sorted(nome.split('=', 1)[1] for nome in os.listdir(base) if nome.startswith('run='))
+
+
+def _dataset(diretorio, nome, run):
+    """
+    Dataset só com os arquivos da execução (run=<id>): o esquema, e com ele os metadados
+    (indices_barras) e o tamanho das listas de tensões, é o dessa execução, mesmo que o
+    diretório guarde execuções de redes diferentes.
+    """
+    pa, ds = _pyarrow()
+    particoes = ds.partitioning(pa.schema([('cenario', pa.int32())]), flavor='hive')
+    return ds.dataset(os.path.join(diretorio, nome, f'run={run}'), format='parquet', partitioning=particoes)
+
+
+def _filtro(cenarios):
+    _, ds = _pyarrow()
+    return None if cenarios is None else ds.field('cenario').isin([int(c) for c in cenarios])
+
+
+def carregar_resultados_parquet(diretorio, run=None, cenarios=None):
+    """Status das contingências de uma execução (a mais recente se `run` não for informado) como DataFrame."""
+    run = run or execucoes_parquet(diretorio)[-1]
+    tabela = _dataset(diretorio, 'resultados', run).to_table(filter=_filtro(cenarios))
+    # Execuções exportadas antes da inclusão de uma coluna ficam com ela nula
+    resultados = tabela.to_pandas().assign(run=run).reindex(columns=['run', 'cenario'] + COLUNAS_RESULTADOS)
+    return resultados.sort_values(['cenario', 'linha_desligada'], ignore_index=True)
+
+
+def carregar_tensoes_parquet(diretorio, run=None, cenarios=None):
+    """
+    Tensões das contingências não críticas de uma execução (a mais recente se `run` não
+    for informado). Retorna (contingencias, indices_barras, antes, depois): DataFrame com
+    cenario/linha_desligada/from_bus/to_bus e matrizes float32 (contingências x barras),
+    no mesmo formato de extrair_tensoes_barras.
+    """
+    run = run or execucoes_parquet(diretorio)[-1]
+    dataset = _dataset(diretorio, 'tensoes', run)
+    tabela = dataset.to_table(filter=_filtro(cenarios))
+    metadados = dataset.schema.metadata or {}
+    indices_barras = json.loads(metadados[b'indices_barras']) if b'indices_barras' in metadados else []
+
+    def _matriz(coluna):
+        lista = tabela.column(coluna).combine_chunks()
+        n_barras = lista.type.list_size
+        return lista.flatten().to_numpy(zero_copy_only=False).reshape(-1, n_barras)
+
+    contingencias = tabela.select(['cenario', 'linha_desligada', 'from_bus', 'to_bus']).to_pandas()
+    return contingencias, indices_barras, _matriz('vm_pu_antes'), _matriz('vm_pu_depois')
+
+
+def exportar_impacto_parquet(diretorio, run=None, cenarios_por_lote=256, compressao='zstd'):
+    """
+    Análise de impacto sobre as tensões exportadas em Parquet, sem banco: grava
+    |V_depois - V_antes| de cada contingência não crítica em
+
+        <diretorio>/impacto/run=<id>/cenario=<n>/*.parquet
+
+    com uma lista float32 por contingência na ordem de `indices_barras` (metadados),
+    lendo `cenarios_por_lote` cenários por vez. Retorna o número de contingências analisadas.
+    """
+    pa, _ = _pyarrow()
+    run = run or execucoes_parquet(diretorio)[-1]
+    if not os.path.isdir(os.path.join(diretorio, 'tensoes', f'run={run}')):
+        return 0 # Nenhuma contingência não crítica na execução
+    coluna_cenario = _dataset(diretorio, 'tensoes', run).to_table(columns=['cenario']).column('cenario')
+    cenarios = sorted(set(coluna_cenario.to_pylist()))
+    analisadas = 0
+    for inicio in range(0, len(cenarios), cenarios_por_lote):
+        contingencias, indices_barras, antes, depois = carregar_tensoes_parquet(diretorio, run, cenarios[inicio:inicio + cenarios_por_lote])
+        impacto = np.abs(depois - antes).astype(np.float32)
+        tabela = pa.table({
+            'run': pa.array([run] * len(contingencias), pa.string()),
+            'cenario': pa.array(contingencias['cenario'].to_numpy(dtype=np.int32), pa.int32()),
+            'linha_desligada': pa.array(contingencias['linha_desligada'].to_numpy(dtype=np.int32), pa.int32()),
+            'impacto': pa.FixedSizeListArray.from_arrays(pa.array(impacto.ravel(), pa.float32()), impacto.shape[1]),
+        }).replace_schema_metadata({'indices_barras': json.dumps([int(i) for i in indices_barras])})
+        _gravar(tabela, os.path.join(diretorio, 'impacto'), run, compressao)
+        analisadas += len(contingencias)
+    return analisadas
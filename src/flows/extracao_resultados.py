@@ -0,0 +1,95 @@
+import numpy as np
+import pandapower as pp
+from pandapower.pd2ppc import _pd2ppc
+from pandapower.powerflow import _run_pf_algorithm
+from pandapower.pypower.idx_bus import VM
+from pandapower.pypower.idx_brch import PF, QF, PT, QT
+
+
+def criar_buffers_resultados(n_contingencias, n_barras, n_linhas):
+    """
+    Aloca uma única vez os vetores onde o laço de contingências grava os resultados
+    (uma linha por contingência), reaproveitados em todos os cenários.
+    """
+    return {
+        'vm_pu': np.full((n_contingencias, n_barras), np.nan),
+        'loading_percent': np.full((n_contingencias, n_linhas), np.nan),
+        'convergencia': np.zeros(n_contingencias, dtype=bool),
+    }
+
+
+def limpar_buffers_resultados(buffers):
+    """Reinicia os buffers antes de um novo cenário."""
+    buffers['vm_pu'].fill(np.nan)
+    buffers['loading_percent'].fill(np.nan)
+    buffers['convergencia'].fill(False)
+
+
+def rodar_fluxo_potencia_leve(net, opcoes, vm_saida, loading_saida):
+    """
+    Executa o fluxo de potência do pandapower sem montar as tabelas de resultados
+    (res_bus, res_line, res_gen, ...). As tensões das barras (na ordem de net.bus) e os
+    carregamentos das linhas (na ordem de net.line, como em res_line.loading_percent)
+    são gravados direto em `vm_saida` e `loading_saida` a partir dos vetores do solver.
+
+    `opcoes` são as opções de uma rede já resolvida com pp.runpp (net._options),
+    normalmente a do cenário de onde a contingência foi copiada.
+    Retorna True se o fluxo convergiu.
+    """
+    vm_saida.fill(np.nan)
+    loading_saida.fill(np.nan)
+
+    net._options = dict(opcoes, init_vm_pu='flat', init_va_degree='flat')
+    net['converged'] = False
+    net._pd2ppc_lookups = {"bus": np.array([], dtype=np.int64), "ext_grid": np.array([], dtype=np.int64),
+                           "gen": np.array([], dtype=np.int64), "branch": np.array([], dtype=np.int64)}
+    _, ppci = _pd2ppc(net)
+    resultado = _run_pf_algorithm(ppci, net._options)
+    net._ppc['iterations'] = resultado.get('iterations') # Lido pela instrumentação (iteracoes_fluxo)
+    if not resultado['success']:
+        return False
+    net['converged'] = True
+
+    # Tensões: as barras em serviço ocupam as primeiras posições da ppci
+    barras = resultado['bus']
+    pos_barras = net._pd2ppc_lookups['bus'][net.bus.index.values]
+    validas = pos_barras < barras.shape[0]
+    vm_saida[validas] = barras[pos_barras[validas], VM].real
+
+    # Carregamentos: corrente nas duas extremidades a partir das potências dos ramos (MW/MVAr)
+    loading_saida.fill(0.0) # Linhas fora de serviço ficam com carregamento zero, como no pandapower
+    if 'line' in net._pd2ppc_lookups['branch'] and len(net.line):
+        inicio, _ = net._pd2ppc_lookups['branch']['line']
+        ramo_em_servico = np.asarray(resultado['internal']['branch_is'], dtype=bool)
+        pos_ppci_ramos = np.cumsum(ramo_em_servico) - 1
+        pos_ppc_linhas = inicio + np.arange(len(net.line))
+        em_servico = ramo_em_servico[pos_ppc_linhas]
+        ramos = resultado['branch'][pos_ppci_ramos[pos_ppc_linhas[em_servico]]]
+
+        linhas = net.line[em_servico]
+        vn_from = net.bus.loc[linhas['from_bus'].values, 'vn_kv'].values
+        vn_to = net.bus.loc[linhas['to_bus'].values, 'vn_kv'].values
+        vm_from = barras[net._pd2ppc_lookups['bus'][linhas['from_bus'].values], VM].real
+        vm_to = barras[net._pd2ppc_lookups['bus'][linhas['to_bus'].values], VM].real
+        i_from_ka = np.abs(ramos[:, PF] + 1j * ramos[:, QF]) / (np.sqrt(3) * vm_from * vn_from)
+        i_to_ka = np.abs(ramos[:, PT] + 1j * ramos[:, QT]) / (np.sqrt(3) * vm_to * vn_to)
+        i_max_ka = (linhas['max_i_ka'] * linhas['df'] * linhas['parallel']).values
+        loading_saida[em_servico] = np.maximum(i_from_ka, i_to_ka) / i_max_ka * 100
+
+    return True
+
+
+def rodar_fluxo_potencia_tabelas(net, vm_saida, loading_saida):
+    """
+    Referência para comparação: pp.runpp completo, lendo os resultados das tabelas
+    res_bus/res_line para os mesmos buffers. Retorna True se o fluxo convergiu.
+    """
+    try:
+        pp.runpp(net, numba=False, init='flat')
+    except pp.LoadflowNotConverged:
+        vm_saida.fill(np.nan)
+        loading_saida.fill(np.nan)
+        return False
+    vm_saida[:] = net.res_bus.vm_pu.reindex(net.bus.index).values
+    loading_saida[:] = net.res_line.loading_percent.reindex(net.line.index).values
+    return True
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from src.flows.solver_contingencia import SolverContingencias
+
+
+def montar_matriz_cenarios(lista_dados):
+    """
+    Empilha os dicionários gerados por gerar_dados_cenario em uma matriz de cenários
+    (um cenário por linha, uma injeção/parâmetro por coluna), indexada pelo id do cenário.
+    """
+    matriz = pd.DataFrame(list(lista_dados))
+    if 'cenario' in matriz.columns:
+        matriz = matriz.set_index('cenario')
+    return matriz
+
+
+def _incidencia(posicoes_barras, n_barras):
+    """Matriz esparsa (barras x elementos) que soma por barra interna os valores dos elementos."""
+    validos = posicoes_barras >= 0
+    colunas = np.nonzero(validos)[0]
+    return csr_matrix((np.ones(len(colunas)), (posicoes_barras[validos], colunas)),
+                      shape=(n_barras, len(posicoes_barras)))
+
+
+def _variacao(matriz, prefixo, indices, valores_base):
+    """Diferença (cenários x elementos) entre as colunas `prefixo{idx}` da matriz e os valores da rede base."""
+    colunas = [f'{prefixo}{idx}' for idx in indices]
+    if not len(colunas) or not set(colunas).issubset(matriz.columns):
+        return np.zeros((len(matriz), len(colunas)))
+    return matriz[colunas].to_numpy(dtype=float) - np.asarray(valores_base, dtype=float)[None, :]
+
+
+def preparar_injecoes(solver, net_base, matriz):
+    """
+    Converte a matriz de cenários nas grandezas do Newton-Raphson sobre as barras internas:
+    (Sbus, dados_ybus, V0), com uma linha por cenário.
+
+    Cargas e gerações alteram Sbus, os shunts alteram a diagonal da Ybus e as
+    tensões de referência dos geradores definem |V| das barras PV e slack.
+    """
+    n_cenarios = len(matriz)
+    n_barras = solver.Ybus.shape[0]
+    base_mva = net_base._ppc['baseMVA']
+    lookup = net_base._pd2ppc_lookups['bus']
+
+    def posicoes(tabela):
+        pos = lookup[tabela['bus'].values]
+        return np.where((pos < n_barras) & tabela['in_service'].values, pos, -1)
+
+    # Cargas e geradores: variação das injeções em relação à rede base (potência constante)
+    load, gen = net_base.load, net_base.gen
+    delta_p_carga = _variacao(matriz, 'carga_p_mw_', load.index, load['p_mw']) * load['scaling'].values
+    delta_q_carga = _variacao(matriz, 'carga_q_mvar_', load.index, load['q_mvar']) * load['scaling'].values
+    delta_p_gen = _variacao(matriz, 'gen_p_mw_', gen.index, gen['p_mw']) * gen['scaling'].values
+    delta_s = (_incidencia(posicoes(load), n_barras) @ (-delta_p_carga - 1j * delta_q_carga).T
+               + _incidencia(posicoes(gen), n_barras) @ delta_p_gen.T).T / base_mva
+    Sbus = solver.Sbus[None, :] + delta_s
+
+    # Shunts: a contribuição na diagonal da Ybus é linear em q_mvar (como no pandapower)
+    dados_ybus = np.repeat(solver.Ybus.data[None, :], n_cenarios, axis=0)
+    shunt = net_base.shunt
+    if not shunt.empty:
+        vn_shunt = shunt['vn_kv'].fillna(net_base.bus.loc[shunt['bus'].values, 'vn_kv'].set_axis(shunt.index))
+        v_ratio = (net_base.bus.loc[shunt['bus'].values, 'vn_kv'].values / vn_shunt.values) ** 2
+        delta_q_shunt = _variacao(matriz, 'shunt_q_mvar_', shunt.index, shunt['q_mvar']) * (shunt['step'].values * v_ratio)
+        delta_diag = (_incidencia(posicoes(shunt), n_barras) @ (-1j * delta_q_shunt).T).T / base_mva
+        dados_ybus[:, solver._pos_diag] += delta_diag
+
+    # Tensão inicial: ângulos do caso base e |V| dos geradores conforme o cenário
+    V0 = np.repeat(solver.V0[None, :], n_cenarios, axis=0)
+    colunas_vm = [f'gen_vm_pu_{idx}' for idx in gen.index]
+    if len(colunas_vm) and set(colunas_vm).issubset(matriz.columns):
+        pos_gen = posicoes(gen)
+        validos = pos_gen >= 0
+        vm = np.abs(V0)
+        vm[:, pos_gen[validos]] = matriz[colunas_vm].to_numpy(dtype=float)[:, validos]
+        V0 = vm * np.exp(1j * np.angle(V0))
+
+    return Sbus, dados_ybus, V0
+
+
+def fluxo_potencia_lote(net_base, matriz, solver=None, fallback=None, tamanho_lote=256):
+    """
+    Resolve o fluxo de potência de vários cenários com a mesma topologia de uma vez,
+    com Newton-Raphson vetorizado sobre a Ybus compartilhada da rede base.
+
+    `net_base` deve estar resolvida (pp.runpp) e `matriz` é a matriz de cenários
+    (montar_matriz_cenarios). Os cenários são processados em lotes de `tamanho_lote`.
+    Se `fallback` for informado, ele é chamado como fallback(cenario_id) para cada
+    cenário que não convergir e deve retornar (vm_pu por barra, convergencia), por
+    exemplo resolvendo o cenário com pp.runpp.
+
+    Retorna (vm_pu, convergencia, V): DataFrame (cenários x barras) com as tensões,
+    Series booleana de convergência e a matriz complexa das tensões nas barras
+    internas (NaN para os cenários resolvidos pelo fallback ou não convergidos).
+    """
+    solver = solver or SolverContingencias(net_base)
+    n_cenarios = len(matriz)
+    V = np.full((n_cenarios, solver.Ybus.shape[0]), np.nan, dtype=complex)
+    convergencia = np.zeros(n_cenarios, dtype=bool)
+
+    for inicio in range(0, n_cenarios, tamanho_lote):
+        fim = min(inicio + tamanho_lote, n_cenarios)
+        Sbus, dados_ybus, V0 = preparar_injecoes(solver, net_base, matriz.iloc[inicio:fim])
+        V_lote, convergiu_lote = solver.newton_raphson_lote(dados_ybus, V0, Sbus)
+        V[inicio:fim][convergiu_lote] = V_lote[convergiu_lote]
+        convergencia[inicio:fim] = convergiu_lote
+
+    vm = np.full((n_cenarios, len(solver.pos_barras)), np.nan)
+    validas = solver.pos_barras >= 0
+    vm[:, validas] = np.abs(V[:, solver.pos_barras[validas]])
+    vm_pu = pd.DataFrame(vm, index=matriz.index, columns=solver.indices_barras)
+
+    if fallback is not None:
+        for pos in np.nonzero(~convergencia)[0]:
+            vm_fallback, convergiu = fallback(matriz.index[pos])
+            convergencia[pos] = convergiu
+            if convergiu:
+                vm_pu.iloc[pos] = pd.Series(vm_fallback).reindex(vm_pu.columns).values
+
+    return vm_pu, pd.Series(convergencia, index=matriz.index, name='convergencia'), V
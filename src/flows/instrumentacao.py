@@ -0,0 +1,136 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Número máximo de cenários detalhados no artefato do Prefect (a tabela no banco tem todos)
+MAX_CENARIOS_ARTEFATO = 50
+
+
+class Instrumentacao:
+    """
+    Temporizadores e contadores das etapas da simulação, agregados por cenário e
+    pela execução inteira. Medições sem cenário (cenario=None) pertencem à execução,
+    como a preparação da rede base e a gravação no banco.
+
+    O tempo de uma etapa é o próprio (exclusivo): o de etapas abertas dentro dela vai só
+    para elas, e a soma das etapas não passa da duração total.
+
+    Uso:
+        instrumentacao = Instrumentacao()
+        with instrumentacao.etapa('fluxo_cenario', cenario_id):
+            ...
+        instrumentacao.contar('status_critica', cenario=cenario_id)
+    """
+
+    def __init__(self):
+        self._tempos = defaultdict(float)
+        self._chamadas = defaultdict(int)
+        self._contadores = defaultdict(float)
+        self._tempo_filhas = [] # Tempo das etapas aninhadas em cada etapa aberta (pilha)
+        self._inicio = time.perf_counter()
+
+    @contextmanager
+    def etapa(self, nome, cenario=None):
+        """Cronometra o bloco e acumula na etapa `nome` do cenário o tempo fora das etapas aninhadas."""
+        inicio = time.perf_counter()
+        self._tempo_filhas.append(0.0)
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            filhas = self._tempo_filhas.pop()
+            if self._tempo_filhas:
+                self._tempo_filhas[-1] += duracao
+            self._tempos[(cenario, nome)] += duracao - filhas
+            self._chamadas[(cenario, nome)] += 1
+
+    def contar(self, nome, valor=1, cenario=None):
+        """Soma `valor` ao contador `nome` do cenário."""
+        self._contadores[(cenario, nome)] += valor
+
+    def registrar_fluxo(self, prefixo, convergiu, iteracoes=None, cenario=None):
+        """Contadores de um fluxo de potência: execuções, não convergências e iterações do Newton-Raphson."""
+        self.contar(f'{prefixo}_execucoes', cenario=cenario)
+        self.contar(f'{prefixo}_nao_convergidos', int(not convergiu), cenario=cenario)
+        if iteracoes is not None:
+            self.contar(f'{prefixo}_iteracoes', iteracoes, cenario=cenario)
+
+    @property
+    def duracao_total(self):
+        """Tempo (s) desde a criação da instrumentação."""
+        return time.perf_counter() - self._inicio
+
+    def metricas(self):
+        """
+        DataFrame com uma linha por (cenário, métrica): colunas cenario, tipo
+        ('tempo' em segundos ou 'contador'), nome, valor e chamadas.
+        """
+        import pandas as pd # Importado só ao publicar as métricas (o módulo é carregado no import do flow)
+        linhas = [{'cenario': cenario, 'tipo': 'tempo', 'nome': nome, 'valor': tempo,
+                   'chamadas': self._chamadas[(cenario, nome)]}
+                  for (cenario, nome), tempo in self._tempos.items()]
+        linhas += [{'cenario': cenario, 'tipo': 'contador', 'nome': nome, 'valor': valor, 'chamadas': None}
+                   for (cenario, nome), valor in self._contadores.items()]
+        metricas = pd.DataFrame(linhas, columns=['cenario', 'tipo', 'nome', 'valor', 'chamadas'])
+        metricas['cenario'] = metricas['cenario'].astype('Int64')
+        metricas['chamadas'] = metricas['chamadas'].astype('Int64')
+        return metricas
+
+    def resumo_execucao(self):
+        """Agrega as métricas de todos os cenários: total, chamadas, tempo médio (ms) e fração do tempo total."""
+        import pandas as pd
+        metricas = self.metricas()
+        if metricas.empty:
+            return pd.DataFrame(columns=['tipo', 'nome', 'total', 'chamadas', 'media_ms', 'percentual'])
+
+        resumo = metricas.groupby(['tipo', 'nome'], as_index=False).agg(
+            total=('valor', 'sum'), chamadas=('chamadas', lambda c: c.sum(min_count=1)))
+        tempos = resumo['tipo'] == 'tempo'
+        resumo['media_ms'] = (resumo['total'] / resumo['chamadas'].astype(float) * 1e3).where(tempos)
+        resumo['percentual'] = (resumo['total'] / self.duracao_total * 100).where(tempos)
+        return resumo.sort_values(['tipo', 'total'], ascending=[False, False], ignore_index=True)
+
+    def por_cenario(self):
+        """Tempo (s) de cada etapa por cenário: uma linha por cenário, uma coluna por etapa."""
+        metricas = self.metricas()
+        tempos = metricas[(metricas['tipo'] == 'tempo') & metricas['cenario'].notna()]
+        if tempos.empty:
+            return tempos.iloc[0:0, 0:0]
+        return tempos.pivot_table(index='cenario', columns='nome', values='valor', aggfunc='sum', fill_value=0.0)
+
+    def tabela_markdown(self, titulo="Instrumentação da execução"):
+        """Relatório em Markdown (resumo da execução e tempos por cenário) para o artefato do Prefect."""
+        resumo = self.resumo_execucao()
+        linhas = [f"# {titulo}", "", f"Duração total: {self.duracao_total:.2f} s", "",
+                  "## Etapas", "", "| Etapa | Total (s) | Chamadas | Média (ms) | % do tempo |",
+                  "|---|---:|---:|---:|---:|"]
+        for r in resumo[resumo['tipo'] == 'tempo'].itertuples():
+            linhas.append(f"| {r.nome} | {r.total:.3f} | {r.chamadas} | {r.media_ms:.2f} | {r.percentual:.1f} |")
+
+        linhas += ["", "## Contadores", "", "| Contador | Total |", "|---|---:|"]
+        for r in resumo[resumo['tipo'] == 'contador'].itertuples():
+            linhas.append(f"| {r.nome} | {r.total:g} |")
+
+        por_cenario = self.por_cenario()
+        if not por_cenario.empty:
+            etapas = list(por_cenario.columns)
+            linhas += ["", "## Tempo por cenário (s)", "",
+                       "| Cenário | " + " | ".join(etapas) + " |", "|---|" + "---:|" * len(etapas)]
+            for cenario, valores in por_cenario.head(MAX_CENARIOS_ARTEFATO).iterrows():
+                linhas.append(f"| {cenario} | " + " | ".join(f"{v:.3f}" for v in valores) + " |")
+            if len(por_cenario) > MAX_CENARIOS_ARTEFATO:
+                linhas.append(f"\n_{len(por_cenario) - MAX_CENARIOS_ARTEFATO} cenários omitidos (ver tabela metricas_execucao)._")
+        return "\n".join(linhas)
+
+
+def medir(instrumentacao, nome, cenario=None):
+    """Como Instrumentacao.etapa, mas aceita instrumentacao=None (sem medição)."""
+    if instrumentacao is None:
+        return nullcontext()
+    return instrumentacao.etapa(nome, cenario)
+
+
+def iteracoes_fluxo(net):
+    """Número de iterações do último fluxo de potência da rede (net._ppc['iterations']), se disponível."""
+    ppc = net.get('_ppc') or {}
+    return ppc.get('iterations')
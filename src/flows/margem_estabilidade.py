@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+# Maior fator de carga testado: acima dele a contingência é considerada sem limite prático
+FATOR_MAXIMO = 3.0
+# Primeiro passo da continuação a partir do ponto de operação (dobra a cada ponto viável)
+PASSO_INICIAL = 0.1
+# Largura final do intervalo da bisseção (resolução do fator crítico)
+TOLERANCIA_FATOR = 0.005
+
+# Motivos de parada: tensão abaixo de vmin, fluxo sem convergência (ponto de colapso) ou fator máximo atingido
+VMIN, DIVERGENCIA, LIMITE = 'vmin', 'divergencia', 'fator_maximo'
+
+
+def margem_carga(solver, linhas, vmin, fator_maximo=FATOR_MAXIMO, passo_inicial=PASSO_INICIAL, tolerancia=TOLERANCIA_FATOR):
+    """
+    Maior fator de carga viável com as `linhas` desligadas (lista vazia: rede intacta),
+    usando o SolverContingencias do cenário: as injeções são multiplicadas pelo fator
+    (ver resolver_fator_carga) e um ponto é viável se o fluxo converge com todas as
+    tensões acima de `vmin`.
+
+    A busca parte do ponto de operação (fator 1) com passos que dobram a cada ponto
+    viável (continuação, cada fluxo partindo da solução anterior) até o primeiro ponto
+    inviável ou `fator_maximo`; depois faz bisseção entre o último ponto viável e o
+    inviável até `tolerancia`, sempre partindo da solução viável mais próxima. Se o
+    próprio ponto de operação for inviável, a bisseção é feita entre 0 e 1.
+
+    Retorna um dict com 'linhas', 'fator_critico' (último fator viável), 'motivo'
+    (VMIN, DIVERGENCIA ou LIMITE), 'vm_min' e 'barra_vm_min' no fator crítico e
+    'n_fluxos' (fluxos de potência resolvidos).
+    """
+    dados_ybus, _ = solver.dados_ybus_sem_linhas(linhas)
+    validas = solver.pos_barras >= 0
+    barras = np.asarray(solver.indices_barras)[validas]
+    n_fluxos = 0
+
+    def avaliar(fator, V0):
+        nonlocal n_fluxos
+        n_fluxos += 1
+        V, convergiu = solver.resolver_fator_carga(dados_ybus, fator, V0)
+        if not convergiu:
+            return V, DIVERGENCIA, None
+        vm = np.abs(V[solver.pos_barras[validas]])
+        return V, (VMIN if vm.min() < vmin else None), vm
+
+    V, motivo, vm = avaliar(1.0, solver.V0)
+    if motivo is None:
+        inferior, V_inferior, vm_inferior = 1.0, V, vm
+        passo = passo_inicial
+        while True:
+            fator = min(inferior + passo, fator_maximo)
+            V, motivo, vm = avaliar(fator, V_inferior)
+            if motivo is not None:
+                superior, motivo_superior = fator, motivo
+                break
+            inferior, V_inferior, vm_inferior = fator, V, vm
+            if fator >= fator_maximo:
+                superior, motivo_superior = None, LIMITE
+                break
+            passo *= 2
+    else:
+        inferior, V_inferior, vm_inferior = 0.0, solver.V0, None
+        superior, motivo_superior = 1.0, motivo
+
+    while superior is not None and superior - inferior > tolerancia:
+        meio = (inferior + superior) / 2
+        V, motivo, vm = avaliar(meio, V_inferior)
+        if motivo is None:
+            inferior, V_inferior, vm_inferior = meio, V, vm
+        else:
+            superior, motivo_superior = meio, motivo
+
+    return {
+        'linhas': list(linhas),
+        'fator_critico': inferior,
+        'motivo': motivo_superior,
+        'vm_min': float(vm_inferior.min()) if vm_inferior is not None else None,
+        'barra_vm_min': int(barras[vm_inferior.argmin()]) if vm_inferior is not None else None,
+        'n_fluxos': n_fluxos,
+    }
+
+
+# Solver do processo do pool, enviado uma única vez na criação de cada processo
+_solver_processo = None
+
+
+def _iniciar_processo(solver):
+    global _solver_processo
+    _solver_processo = solver
+
+
+def _margem_no_processo(linhas, opcoes):
+    return margem_carga(_solver_processo, linhas, **opcoes)
+
+
+def margens_carga(solver, contingencias, vmin, n_processos=None, **opcoes):
+    """
+    margem_carga de cada contingência (lista de listas de linhas), em um pool de
+    `n_processos` processos (os núcleos disponíveis, se omitido; 1 roda no próprio
+    processo). O solver é copiado uma vez para cada processo. Retorna os resultados
+    na ordem de `contingencias`.
+    """
+    opcoes = dict(opcoes, vmin=vmin)
+    contingencias = [list(linhas) for linhas in contingencias]
+    n_processos = min(n_processos or os.cpu_count() or 1, len(contingencias))
+    if n_processos <= 1:
+        return [margem_carga(solver, linhas, **opcoes) for linhas in contingencias]
+
+    # 'spawn': um fork do processo do flow herdaria travas das threads do Prefect e pode travar os processos filhos
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=n_processos, mp_context=contexto,
+                             initializer=_iniciar_processo, initargs=(solver,)) as executor:
+        return list(executor.map(_margem_no_processo, contingencias, repeat(opcoes),
+                                 chunksize=max(1, len(contingencias) // (4 * n_processos))))
@@ -0,0 +1,114 @@
+import hashlib
+import numbers
+from collections import OrderedDict
+
+import numpy as np
+
+TAMANHO_CACHE_ESTADOS = 4096
+QUANTIZACAO_INJECOES = 1e-3 # MW, MVAr e pu
+# Entradas de gerar_dados_cenario que não alteram o estado elétrico do cenário
+CHAVES_IGNORADAS = ('cenario', 'peso_amostragem')
+
+
+def assinatura_injecoes(dados, quantizacao=QUANTIZACAO_INJECOES):
+    """
+    Hash dos dados de um cenário (gerar_dados_cenario) com os valores numéricos
+    arredondados para múltiplos de `quantizacao`: cenários com injeções iguais ou
+    quase iguais têm a mesma assinatura.
+    """
+    resumo = hashlib.blake2b(digest_size=16)
+    for chave in sorted(dados):
+        if chave in CHAVES_IGNORADAS:
+            continue
+        valor = dados[chave]
+        if isinstance(valor, (bool, np.bool_)):
+            texto = str(bool(valor))
+        elif isinstance(valor, numbers.Real):
+            texto = str(int(round(float(valor) / quantizacao)))
+        else:
+            texto = str(valor)
+        resumo.update(f"{chave}={texto};".encode())
+    return resumo.hexdigest()
+
+
+class CacheLRU:
+    """Dicionário com limite de entradas (descarta a usada há mais tempo) e contagem de acertos."""
+
+    def __init__(self, tamanho_maximo=None):
+        self.tamanho_maximo = tamanho_maximo
+        self._entradas = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def obter(self, chave):
+        """Valor guardado para a chave (marcado como usado recentemente) ou None."""
+        valor = self._entradas.get(chave)
+        if valor is None:
+            self.falhas += 1
+            return None
+        self._entradas.move_to_end(chave)
+        self.acertos += 1
+        return valor
+
+    def guardar(self, chave, valor):
+        self._entradas[chave] = valor
+        self._entradas.move_to_end(chave)
+        if self.tamanho_maximo is not None and len(self._entradas) > self.tamanho_maximo:
+            self._entradas.popitem(last=False)
+            self.descartes += 1
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @property
+    def taxa_acerto(self):
+        consultas = self.acertos + self.falhas
+        return self.acertos / consultas if consultas else 0.0
+
+
+class MemoContingencias:
+    """
+    Memoização dos resultados das contingências ao longo de uma execução:
+
+    - topologia: ilhamento e número de componentes conectados de cada conjunto de linhas
+      desligadas. Dependem só da topologia, que é a mesma em todos os cenários, então são
+      calculados uma única vez por contingência (sem limite de entradas).
+    - estados: resultado do fluxo de potência pós-contingência (convergência, tensões e
+      carregamentos), por conjunto de linhas desligadas e assinatura das injeções do
+      cenário quantizadas (assinatura_injecoes). Cenários repetidos ou quase iguais
+      reaproveitam o resultado em vez de resolver o fluxo de novo. Limitado a
+      `tamanho_cache` entradas (LRU).
+    """
+
+    def __init__(self, tamanho_cache=TAMANHO_CACHE_ESTADOS, quantizacao=QUANTIZACAO_INJECOES):
+        self.quantizacao = quantizacao
+        self.topologias = CacheLRU()
+        self.estados = CacheLRU(tamanho_cache)
+
+    def assinatura(self, dados):
+        return assinatura_injecoes(dados, self.quantizacao)
+
+    def topologia(self, linhas):
+        """(ilhamento, num_componentes) do desligamento das linhas, se já calculado."""
+        return self.topologias.obter(frozenset(linhas))
+
+    def guardar_topologia(self, linhas, ilhamento, num_componentes):
+        self.topologias.guardar(frozenset(linhas), (ilhamento, num_componentes))
+
+    def estado(self, assinatura, linhas):
+        """(convergencia, vm_pu, loading_percent) de um estado já resolvido, se houver."""
+        return self.estados.obter((assinatura, frozenset(linhas)))
+
+    def guardar_estado(self, assinatura, linhas, convergencia, vm_pu, loading_percent):
+        self.estados.guardar((assinatura, frozenset(linhas)),
+                             (bool(convergencia), np.array(vm_pu, dtype=float), np.array(loading_percent, dtype=float)))
+
+    def estatisticas(self):
+        """Acertos, falhas e taxa de acerto de cada cache (para a instrumentação e o log)."""
+        return {
+            f'memo_{nome}_{medida}': valor
+            for nome, cache in (('topologia', self.topologias), ('estados', self.estados))
+            for medida, valor in (('acertos', cache.acertos), ('falhas', cache.falhas), ('descartes', cache.descartes),
+                                  ('taxa_acerto', cache.taxa_acerto))
+        }
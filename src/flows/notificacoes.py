@@ -0,0 +1,105 @@
+import json
+import select
+import threading
+
+from sqlalchemy import text
+
+# Canal do LISTEN/NOTIFY do PostgreSQL usado para avisar que uma execução gravou dados novos
+CANAL_NOVOS_DADOS = 'novos_dados_simulacao'
+# Espera máxima do select() do ouvinte antes de verificar se deve parar (segundos)
+TIMEOUT_ESPERA_S = 5.0
+# Espera antes de reconectar após a queda da conexão do ouvinte (segundos, dobra até o máximo)
+ESPERA_RECONEXAO_S = 1.0
+ESPERA_RECONEXAO_MAX_S = 60.0
+
+
+def suporta_notificacoes(engine):
+    """LISTEN/NOTIFY só existe no PostgreSQL (o SQLite dos benchmarks não tem)."""
+    return engine.dialect.name == 'postgresql'
+
+
+def publicar_novos_dados(engine, tabela, execution_timestamp, canal=CANAL_NOVOS_DADOS):
+    """
+    Envia NOTIFY no canal com {'tabela', 'execution_timestamp'} como payload. O PostgreSQL
+    só entrega a notificação no commit, depois que os dados já estão visíveis para quem
+    recebe. Retorna False (sem erro) em bancos sem suporte.
+    """
+    if not suporta_notificacoes(engine):
+        return False
+    payload = json.dumps({'tabela': tabela, 'execution_timestamp': str(execution_timestamp)})
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_notify(:canal, :payload)"), {'canal': canal, 'payload': payload})
+    return True
+
+
+class OuvinteNotificacoes:
+    """
+    Thread em segundo plano que faz LISTEN no canal e chama `ao_notificar(payload)` a
+    cada NOTIFY recebido (payload já decodificado do JSON, ou o texto cru). A conexão é
+    refeita automaticamente se cair; `conectado` indica se o ouvinte está ativo, para
+    quem precisar de um plano B (ex.: consulta periódica) enquanto ele não estiver.
+
+    Uso:
+        ouvinte = OuvinteNotificacoes(engine, ao_notificar=estado.invalidar)
+        ouvinte.iniciar()
+    """
+
+    def __init__(self, engine, ao_notificar, canal=CANAL_NOVOS_DADOS):
+        self.engine = engine
+        self.ao_notificar = ao_notificar
+        self.canal = canal
+        self.conectado = False
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        if not suporta_notificacoes(self.engine):
+            print(f"DEBUG: Banco '{self.engine.dialect.name}' sem LISTEN/NOTIFY; ouvinte de notificações não iniciado.")
+            return False
+        self._thread = threading.Thread(target=self._executar, name=f"listen-{self.canal}", daemon=True)
+        self._thread.start()
+        return True
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=TIMEOUT_ESPERA_S + 1)
+
+    def _executar(self):
+        espera = ESPERA_RECONEXAO_S
+        while not self._parar.is_set():
+            try:
+                self._ouvir()
+                espera = ESPERA_RECONEXAO_S
+            except Exception as e:
+                self.conectado = False
+                print(f"ERRO: ouvinte de notificações do canal '{self.canal}' perdeu a conexão: {e}. "
+                      f"Nova tentativa em {espera:.0f}s.")
+                self._parar.wait(espera)
+                espera = min(espera * 2, ESPERA_RECONEXAO_MAX_S)
+
+    def _ouvir(self):
+        bruta = self.engine.raw_connection()
+        conexao = getattr(bruta, 'driver_connection', None) or bruta.connection # psycopg2
+        try:
+            conexao.autocommit = True
+            with conexao.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.canal}";')
+            self.conectado = True
+            print(f"DEBUG: Ouvindo notificações no canal '{self.canal}'.")
+            # Dados gravados enquanto o ouvinte estava desconectado não geraram notificação recebida
+            self.ao_notificar(None)
+            while not self._parar.is_set():
+                if select.select([conexao], [], [], TIMEOUT_ESPERA_S) == ([], [], []):
+                    continue
+                conexao.poll()
+                while conexao.notifies:
+                    notificacao = conexao.notifies.pop(0)
+                    try:
+                        payload = json.loads(notificacao.payload)
+                    except ValueError:
+                        payload = notificacao.payload
+                    self.ao_notificar(payload)
+        finally:
+            self.conectado = False
+            bruta.invalidate() # A conexão em LISTEN não volta para o pool
@@ -1,6 +1,7 @@
 from prefect import flow
 import os
 import sys
+from typing import Optional
 
 # Garante que o diretório raiz do projeto esteja no Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -11,7 +12,9 @@ from src.flows.resultados2 import simulacao_contingencia_flow
 
 @flow(name="simulacao-e-visualizacao-orchestrator", log_prints=True)
 def simulacao_e_visualizacao_orchestrator(
-    n_cenarios: int = 2, vmax: float = 1.093, vmin: float = 0.94, line_loading_max: float = 120
+    n_cenarios: int = 2, vmax: float = 1.093, vmin: float = 0.94, line_loading_max: float = 120,
+    caso: str = 'case30', solver: str = 'pandapower', profile: Optional[str] = None,
+    nivel_log: str = 'INFO', ordem_contingencia: int = 1
 ):
     print("Iniciando o flow orquestrador...")
 
@@ -20,11 +23,16 @@ def simulacao_e_visualizacao_orchestrator(
         n_cenarios=n_cenarios,
         vmax=vmax,
         vmin=vmin,
-        line_loading_max=line_loading_max
+        line_loading_max=line_loading_max,
+        caso=caso,
+        solver=solver,
+        profile=profile,
+        nivel_log=nivel_log,
+        ordem_contingencia=ordem_contingencia
     )
     print("Simulação concluída.")
 
-    print("O Dash (rodando em outro container) vai buscar os novos dados automaticamente no Postgres.")
+    print("O Dash (rodando em outro container) é avisado dos novos dados por NOTIFY no Postgres.")
 
 if __name__ == "__main__":
     print("Executando orchestrator_flow.py diretamente para teste...")
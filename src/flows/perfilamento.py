@@ -0,0 +1,188 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+MODOS_PERFIL = ('cprofile', 'amostragem')
+INTERVALO_AMOSTRAGEM_S = 0.005
+N_FUNCOES_RESUMO = 25
+
+
+def get_perfis_dir():
+    """Diretório dos perfis gravados (variável PERFIS_DIR ou <raiz do projeto>/perfis)."""
+    padrao = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "perfis"))
+    return os.getenv('PERFIS_DIR', padrao)
+
+
+class PerfilDeterministico:
+    """
+    cProfile da thread atual e das threads criadas depois do início (como as threads
+    em que o Prefect executa as tasks). Grava um arquivo .prof (pstats), que pode ser
+    aberto com snakeviz, gprof2dot ou flameprof.
+
+    Um cProfile só pode ser desligado de dentro da thread em que foi ligado: nas demais
+    threads, uma função de rastreamento (threading.settrace) liga o perfil na primeira
+    chamada de função e, depois de parar(), o desliga (e se remove) na chamada seguinte,
+    sem deixar o perfil coletando nas threads reaproveitadas depois do bloco. Enquanto o
+    perfil está ativo, essa verificação soma uma chamada Python a cada chamada de função
+    dessas threads (o perfil da thread atual não tem esse custo).
+    """
+    extensao = '.prof'
+
+    def __init__(self):
+        self._perfis = []
+        self._lock = threading.Lock()
+        self._ativo = False
+
+    def _iniciar_na_thread(self):
+        perfil = cProfile.Profile()
+        with self._lock:
+            self._perfis.append(perfil)
+        perfil.enable()
+        return perfil
+
+    def _rastrear(self, quadro, evento, argumento):
+        """
+        Função de rastreamento das threads novas (threading.settrace), na primeira chamada de
+        função da thread: liga o perfil e troca a função por uma que só verifica se o perfil
+        acabou (o mínimo possível por chamada, já que ela roda em todas as chamadas).
+        """
+        if not self._ativo:
+            sys.settrace(None)
+            return None
+        perfil = self._iniciar_na_thread()
+
+        def verificar_parada(quadro, evento, argumento):
+            if not self._ativo:
+                perfil.disable()
+                sys.setprofile(None)
+                sys.settrace(None)
+
+        sys.settrace(verificar_parada)
+        return None
+
+    def iniciar(self):
+        self._ativo = True
+        threading.settrace(self._rastrear)
+        self._perfil_principal = self._iniciar_na_thread()
+
+    def parar(self):
+        self._ativo = False
+        threading.settrace(None)
+        self._perfil_principal.disable()
+
+    def _estatisticas(self, saida=None):
+        estatisticas = pstats.Stats(self._perfis[0], stream=saida)
+        for perfil in self._perfis[1:]:
+            estatisticas.add(perfil)
+        return estatisticas
+
+    def salvar(self, caminho_base):
+        caminho = caminho_base + self.extensao
+        self._estatisticas().dump_stats(caminho)
+        return caminho
+
+    def resumo(self):
+        saida = io.StringIO()
+        self._estatisticas(saida).sort_stats('cumulative').print_stats(N_FUNCOES_RESUMO)
+        return saida.getvalue()
+
+
+class AmostradorPilhas(threading.Thread):
+    """
+    Perfil por amostragem: a cada `intervalo` segundos registra a pilha de chamadas
+    de todas as threads (sys._current_frames). O custo não depende do número de
+    chamadas de função, então serve para execuções longas. Grava as pilhas no
+    formato "collapsed" (.folded), aceito por flamegraph.pl, inferno e speedscope.
+    """
+    extensao = '.folded'
+
+    def __init__(self, intervalo=INTERVALO_AMOSTRAGEM_S):
+        super().__init__(name='amostrador-pilhas', daemon=True)
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self.amostras = 0
+        self._parar = threading.Event()
+
+    @staticmethod
+    def _nome_quadro(quadro):
+        codigo = quadro.f_code
+        return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+    def run(self):
+        nomes_threads = {}
+        while not self._parar.wait(self.intervalo):
+            self.amostras += 1
+            for thread_id, quadro in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                if thread_id not in nomes_threads:
+                    nomes_threads = {t.ident: t.name for t in threading.enumerate()}
+                pilha = []
+                while quadro is not None:
+                    pilha.append(self._nome_quadro(quadro))
+                    quadro = quadro.f_back
+                pilha.append(nomes_threads.get(thread_id, str(thread_id)))
+                self.pilhas[";".join(reversed(pilha))] += 1
+
+    def iniciar(self):
+        self.start()
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+    def salvar(self, caminho_base):
+        caminho = caminho_base + self.extensao
+        with open(caminho, 'w', encoding='utf-8') as f:
+            for pilha, contagem in self.pilhas.most_common():
+                f.write(f"{pilha} {contagem}\n")
+        return caminho
+
+    def resumo(self):
+        proprio, inclusivo = Counter(), Counter()
+        for pilha, contagem in self.pilhas.items():
+            quadros = pilha.split(";")[1:]
+            if not quadros:
+                continue
+            proprio[quadros[-1]] += contagem
+            for quadro in set(quadros):
+                inclusivo[quadro] += contagem
+        total = sum(self.pilhas.values()) or 1
+        linhas = [f"{self.amostras} amostras a cada {self.intervalo * 1e3:.1f} ms (todas as threads)",
+                  "", f"{'% próprio':>10} {'% inclusivo':>12}  função"]
+        for quadro, contagem in proprio.most_common(N_FUNCOES_RESUMO):
+            linhas.append(f"{contagem / total * 100:>10.1f} {inclusivo[quadro] / total * 100:>12.1f}  {quadro}")
+        return "\n".join(linhas)
+
+
+@contextmanager
+def perfilar(modo, nome):
+    """
+    Perfila o bloco no `modo` indicado ('cprofile' ou 'amostragem') e grava o arquivo
+    em get_perfis_dir() com o prefixo `nome`. Com modo None/vazio não faz nada.
+    Produz um dicionário que, ao final do bloco, recebe 'arquivo', 'resumo' e 'duracao_s'.
+    """
+    if not modo:
+        yield None
+        return
+    if modo not in MODOS_PERFIL:
+        raise ValueError(f"Modo de perfil '{modo}' desconhecido. Use um de: {', '.join(MODOS_PERFIL)}.")
+
+    perfil = PerfilDeterministico() if modo == 'cprofile' else AmostradorPilhas()
+    resultado = {'modo': modo}
+    inicio = time.perf_counter()
+    perfil.iniciar()
+    try:
+        yield resultado
+    finally:
+        perfil.parar()
+        os.makedirs(get_perfis_dir(), exist_ok=True)
+        resultado['duracao_s'] = time.perf_counter() - inicio
+        resultado['arquivo'] = perfil.salvar(os.path.join(get_perfis_dir(), nome))
+        resultado['resumo'] = perfil.resumo()
@@ -0,0 +1,87 @@
+import hashlib
+import os
+
+import pandapower as pp
+import pandapower.networks as pn
+
+# Redes de teste embutidas no pandapower disponíveis para as simulações.
+# Novas redes podem ser adicionadas com registrar_rede().
+REDES_REGISTRADAS = {
+    'case14': pn.case14,
+    'case30': pn.case30,
+    'case39': pn.case39,
+    'case57': pn.case57,
+    'case89pegase': pn.case89pegase,
+    'case118': pn.case118,
+    'case300': pn.case300,
+    'case1354pegase': pn.case1354pegase,
+    'case2869pegase': pn.case2869pegase,
+    'case9241pegase': pn.case9241pegase,
+}
+
+EXTENSOES_JSON = ('.json',)
+EXTENSOES_MATPOWER = ('.m', '.mat')
+
+
+def registrar_rede(nome, construtor):
+    """
+    Registra uma nova rede no catálogo. `construtor` é uma função sem argumentos
+    que retorna um pandapowerNet.
+    """
+    REDES_REGISTRADAS[nome] = construtor
+
+
+def redes_disponiveis():
+    """Retorna os nomes das redes registradas."""
+    return sorted(REDES_REGISTRADAS)
+
+
+def _eh_arquivo(caso):
+    return os.path.splitext(str(caso))[1].lower() in EXTENSOES_JSON + EXTENSOES_MATPOWER
+
+
+def carregar_rede(caso):
+    """
+    Carrega uma rede pelo nome registrado (ex.: 'case118') ou a partir de um
+    arquivo pandapower JSON (.json) ou MATPOWER (.m/.mat).
+    """
+    if caso in REDES_REGISTRADAS:
+        return REDES_REGISTRADAS[caso]()
+
+    if _eh_arquivo(caso):
+        if not os.path.exists(caso):
+            raise FileNotFoundError(f"Arquivo de rede não encontrado: {caso}")
+        extensao = os.path.splitext(caso)[1].lower()
+        if extensao in EXTENSOES_JSON:
+            return pp.from_json(caso)
+        from pandapower.converter.matpower import from_mpc
+        return from_mpc(caso)
+
+    raise ValueError(
+        f"Rede '{caso}' desconhecida. Use um arquivo .json/.m/.mat ou uma das redes registradas: "
+        f"{', '.join(redes_disponiveis())}"
+    )
+
+
+def identificador_rede(caso):
+    """
+    Retorna um identificador estável da rede para uso em chaves de cache.
+    Para arquivos, inclui o hash do conteúdo, de modo que editar o arquivo invalida o cache.
+    """
+    if caso in REDES_REGISTRADAS or not _eh_arquivo(caso):
+        return str(caso)
+
+    with open(caso, 'rb') as f:
+        conteudo_hash = hashlib.sha256(f.read()).hexdigest()
+    return f"{os.path.basename(caso)}:{conteudo_hash}"
+
+
+def barra_slack_padrao(net):
+    """
+    Retorna a barra usada como slack quando nenhuma é informada:
+    a barra da primeira rede externa em serviço ou, na falta dela, a primeira barra da rede.
+    """
+    ext_grid = net.ext_grid[net.ext_grid['in_service']]
+    if not ext_grid.empty:
+        return int(ext_grid['bus'].iloc[0])
+    return int(net.bus.index[0])
@@ -0,0 +1,93 @@
+import logging
+import os
+from collections import Counter
+
+NIVEL_LOG_PADRAO = os.getenv('SIMULACAO_LOG_LEVEL', 'INFO')
+MAX_DETALHES_POR_CENARIO = 20
+
+
+def _logger_padrao():
+    """Logger do Prefect dentro de um flow/task (os registros vão para a API) ou logger 'simulacao' fora dele."""
+    from prefect import get_run_logger
+    from prefect.exceptions import MissingContextError
+    try:
+        return get_run_logger()
+    except MissingContextError:
+        logger = logging.getLogger('simulacao')
+        if not logger.handlers and not logging.getLogger().handlers:
+            logging.basicConfig(format="%(asctime)s | %(levelname)-7s | %(message)s")
+        logger.setLevel(logging.DEBUG) # A filtragem por nível é feita pelo RegistroSimulacao
+        return logger
+
+
+class RegistroSimulacao:
+    """
+    Log da simulação com nível próprio (independente do nível global do Prefect),
+    resumo por cenário e detalhe por contingência limitado.
+
+    Os eventos de cada contingência (ilhamento, violações, não convergência) são
+    registrados com `detalhe()` no nível DEBUG por padrão: com o nível INFO só o
+    resumo de cada cenário é emitido. Mesmo com DEBUG, no máximo
+    `max_detalhes_por_cenario` mensagens são emitidas por cenário; as demais são
+    contadas e informadas no resumo. A informação completa de cada evento fica na
+    coluna 'detalhe' da tabela resultados_simulacao.
+    """
+
+    def __init__(self, nivel=NIVEL_LOG_PADRAO, max_detalhes_por_cenario=MAX_DETALHES_POR_CENARIO, logger=None):
+        self.nivel = logging.getLevelName(str(nivel).upper()) if not isinstance(nivel, int) else nivel
+        if not isinstance(self.nivel, int):
+            raise ValueError(f"Nível de log '{nivel}' desconhecido. Use DEBUG, INFO, WARNING ou ERROR.")
+        self.max_detalhes_por_cenario = max_detalhes_por_cenario
+        self.logger = logger or _logger_padrao()
+        self._detalhes_emitidos = Counter()
+        self._detalhes_omitidos = Counter()
+
+    def habilitado(self, nivel):
+        return nivel >= self.nivel
+
+    def _emitir(self, nivel, mensagem):
+        # O nível do registro decide o que é emitido: se o logger do Prefect descartar
+        # DEBUG (PREFECT_LOGGING_LEVEL), a mensagem sai como INFO.
+        if nivel < logging.INFO and not self.logger.isEnabledFor(nivel):
+            nivel = logging.INFO
+        self.logger.log(nivel, mensagem)
+
+    def log(self, nivel, mensagem):
+        if self.habilitado(nivel):
+            self._emitir(nivel, mensagem)
+
+    def debug(self, mensagem):
+        self.log(logging.DEBUG, mensagem)
+
+    def info(self, mensagem):
+        self.log(logging.INFO, mensagem)
+
+    def warning(self, mensagem):
+        self.log(logging.WARNING, mensagem)
+
+    def error(self, mensagem):
+        self.log(logging.ERROR, mensagem)
+
+    def detalhe(self, cenario, mensagem, nivel=logging.DEBUG):
+        """Mensagem de uma contingência, sujeita ao limite de mensagens por cenário."""
+        if not self.habilitado(nivel):
+            return
+        if self._detalhes_emitidos[cenario] >= self.max_detalhes_por_cenario:
+            self._detalhes_omitidos[cenario] += 1
+            return
+        self._detalhes_emitidos[cenario] += 1
+        self._emitir(nivel, mensagem)
+
+    def resumo_cenario(self, cenario, contagem_status, linhas_criticas, max_linhas=20):
+        """Uma linha por cenário com a contagem de cada status e as primeiras linhas críticas."""
+        contagem = ", ".join(f"{status}: {n}" for status, n in sorted(contagem_status.items()))
+        mensagem = f"Resumo Cenário {cenario}: {sum(contagem_status.values())} contingências ({contagem})"
+        if linhas_criticas:
+            amostra = ", ".join(str(linha) for linha in linhas_criticas[:max_linhas])
+            restantes = len(linhas_criticas) - max_linhas
+            mensagem += f"; linhas com criticidade/ilhamento: {amostra}" + (f" (+{restantes})" if restantes > 0 else "")
+        else:
+            mensagem += "; nenhuma criticidade ou ilhamento detectado"
+        if self._detalhes_omitidos[cenario]:
+            mensagem += f"; {self._detalhes_omitidos[cenario]} mensagens de detalhe omitidas"
+        self.info(mensagem)
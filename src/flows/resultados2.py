@@ -1,25 +1,64 @@
 # Assuming the corrected `analise_impacto_flow`
-import pandapower as pp
-import pandapower.networks as pn
+# pandapower, pandas, networkx e SciPy (via os módulos de src/flows) são importados
+# dentro das funções que os usam: importar este módulo (orchestrator_flow, workers)
+# carrega só o Prefect e o NumPy. Ver benchmarks/bench_importacao.py.
 import random
-from pandapower.topology import create_nxgraph
-import networkx as nx
-import pandas as pd
 import numpy as np
 from prefect import flow, task
 from prefect.artifacts import create_markdown_artifact
 from prefect.context import get_run_context
-import io
+from prefect.exceptions import MissingContextError
 import sys
 import os
 import json
+import time
+from typing import List, Optional
 from sqlalchemy import create_engine, text # Para conexão com o banco de dados e execução de comandos SQL
 from datetime import datetime
 from pytz import timezone
 
+# Garante que o diretório raiz do projeto esteja no Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.flows.classificacao import (classificar_contingencia, classificar_contingencias, detalhe_violacao, violacao,
+                                     COLUNAS_VIOLACAO)
+from src.flows.instrumentacao import Instrumentacao, medir, iteracoes_fluxo
+from src.flows.margem_estabilidade import margens_carga, FATOR_MAXIMO, TOLERANCIA_FATOR
+from src.flows.memoizacao import MemoContingencias, TAMANHO_CACHE_ESTADOS, QUANTIZACAO_INJECOES
+from src.flows.perfilamento import perfilar
+from src.flows.registro import RegistroSimulacao, NIVEL_LOG_PADRAO, MAX_DETALHES_POR_CENARIO
+from src.flows.series_temporais import HORAS_POR_GRAVACAO
+
+# Limite de barras para o formato expandido (uma coluna por barra) da tabela de tensões.
+# O PostgreSQL aceita no máximo 1600 colunas por tabela; redes maiores gravam as
+# tensões nas colunas JSONB 'tensao_antes'/'tensao_depois'.
+MAX_BARRAS_FORMATO_EXPANDIDO = 790
+# Linhas de tensão lidas e analisadas por transação na análise de impacto incremental
+TAMANHO_LOTE_IMPACTO = 5000
+
+
+def _contexto_execucao():
+    """Contexto de execução do Prefect, ou None quando a task é chamada fora de um flow (ex.: benchmarks)."""
+    try:
+        return get_run_context()
+    except MissingContextError:
+        return None
+
+
+def usa_formato_expandido(indices_barras):
+    """Indica se as tensões de uma rede cabem no formato expandido (uma coluna por barra)."""
+    return len(indices_barras) <= MAX_BARRAS_FORMATO_EXPANDIDO
+
 
 def get_db_url():
-    """Retorna a URL de conexão do banco de dados, adaptando para o ambiente."""
+    """
+    Retorna a URL de conexão do banco de dados, adaptando para o ambiente.
+    DATABASE_URL, se definida, tem precedência (ex.: SQLite nos benchmarks).
+    """
+    if os.getenv('DATABASE_URL'):
+        return os.getenv('DATABASE_URL')
     db_user = os.getenv('DB_USER', 'prefect')
     db_password = os.getenv('DB_PASSWORD', 'prefect')
     db_host = os.getenv('DB_HOST', 'localhost')
@@ -29,59 +68,82 @@ def get_db_url():
     url = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
     return url
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
-
-#teste pois estava travando (lembrar de rodar o agent antes)
-print(f"DEBUG: pandapower version in worker: {pp.__version__}")
-
 
 
 
 @task
-def criar_rede_ieee30_slack_bar():
+def criar_rede_slack_bar(caso='case30', q_mvar_limite=50.0, barra_slack=None):
     """
-    Cria a rede IEEE 30 barras e configura a barra slack,
-    garantindo que os limites de reativos dos geradores estejam bem definidos.
+    Cria a rede indicada por `caso` (nome registrado em src/flows/redes.py ou arquivo
+    .json/.m/.mat) e configura a barra slack, garantindo que os limites de reativos
+    dos geradores estejam bem definidos.
     """
-    net = pn.case30()
+    import pandapower as pp
+    from src.flows.redes import carregar_rede, barra_slack_padrao
+
+    net = carregar_rede(caso)
+
+    if barra_slack is None:
+        barra_slack = barra_slack_padrao(net)
 
     if 'q_mvar_min' not in net.gen.columns:
         net.gen['q_mvar_min'] = 0.0
     if 'q_mvar_max' not in net.gen.columns:
         net.gen['q_mvar_max'] = 0.0
 
-    for idx in net.gen.index:
-        q_min = net.gen.at[idx, 'q_mvar_min']
-        q_max = net.gen.at[idx, 'q_mvar_max']
-
-        if pd.isna(q_min) or q_min == 0.0:
-            net.gen.at[idx, 'q_mvar_min'] = -50.0
-
-        if pd.isna(q_max) or q_max == 0.0:
-            net.gen.at[idx, 'q_mvar_max'] = 50.0
+    # Limites nulos ou ausentes são substituídos pelo limite padrão (operação vetorizada)
+    q_min = net.gen['q_mvar_min'].astype(float)
+    q_max = net.gen['q_mvar_max'].astype(float)
+    net.gen['q_mvar_min'] = q_min.mask(q_min.isna() | (q_min == 0.0), -q_mvar_limite)
+    net.gen['q_mvar_max'] = q_max.mask(q_max.isna() | (q_max == 0.0), q_mvar_limite)
 
     net.gen['slack'] = False
-    gen_idx_at_bus0 = net.gen[net.gen['bus'] == 0].index
+    gen_idx_at_slack = net.gen[net.gen['bus'] == barra_slack].index
 
-    if not gen_idx_at_bus0.empty:
-        net.gen.at[gen_idx_at_bus0[0], 'slack'] = True
+    # O gerador slack deve seguir a tensão da rede externa ligada à mesma barra (se houver)
+    ext_grid_na_barra = net.ext_grid[net.ext_grid['bus'] == barra_slack]
+    vm_slack = float(ext_grid_na_barra['vm_pu'].iloc[0]) if not ext_grid_na_barra.empty else 1.0
+
+    if not gen_idx_at_slack.empty:
+        net.gen.at[gen_idx_at_slack[0], 'slack'] = True
+        if not ext_grid_na_barra.empty:
+            net.gen.at[gen_idx_at_slack[0], 'vm_pu'] = vm_slack
     else:
-        pp.create_gen(net, bus=0, p_mw=0, vm_pu=1.0, slack=True, q_mvar_min=-50, q_mvar_max=50)
+        pp.create_gen(net, bus=barra_slack, p_mw=0, vm_pu=vm_slack, slack=True,
+                      q_mvar_min=-q_mvar_limite, q_mvar_max=q_mvar_limite)
 
     return net
 
 @task
-def gerar_dados_cenario(net, cenario_id=None):
+def criar_rede_ieee30_slack_bar(q_mvar_limite=50.0, barra_slack=0):
+    """
+    Cria a rede IEEE 30 barras e configura a barra slack,
+    garantindo que os limites de reativos dos geradores estejam bem definidos.
+    """
+    return criar_rede_slack_bar.fn('case30', q_mvar_limite=q_mvar_limite, barra_slack=barra_slack)
+
+@task
+def gerar_dados_cenario(net, cenario_id=None, inclinacao_carga=0.0):
     """
     Gera um conjunto de dados aleatórios para um cenário específico,
     introduzindo variações nas cargas e geradores da rede.
+
+    Com `inclinacao_carga` > 0 (amostragem por importância), as cargas ativas são
+    sorteadas com mais peso nos níveis altos (fator_inclinado) e o cenário recebe
+    'peso_amostragem' para corrigir as estimativas de probabilidade.
     """
     dados = {}
+    log_peso = 0.0
     for idx in net.load.index:
         p_original = net.load.at[idx, 'p_mw']
         q_original = net.load.at[idx, 'q_mvar']
-        dados[f'carga_p_mw_{idx}'] = p_original * random.uniform(0.95, 1.05)
+        if inclinacao_carga:
+            from src.flows.amostragem_adaptativa import fator_inclinado
+            fator_p, log_peso_carga = fator_inclinado(0.95, 1.05, inclinacao_carga)
+            log_peso += log_peso_carga
+            dados[f'carga_p_mw_{idx}'] = p_original * fator_p
+        else:
+            dados[f'carga_p_mw_{idx}'] = p_original * random.uniform(0.95, 1.05)
         dados[f'carga_q_mvar_{idx}'] = q_original * random.uniform(0.90, 1.10)
 
     for idx in net.gen.index:
@@ -107,6 +169,8 @@ def gerar_dados_cenario(net, cenario_id=None):
             q_original = net.shunt.at[idx, 'q_mvar']
             dados[f'shunt_q_mvar_{idx}'] = q_original * random.uniform(0.90, 1.10)
 
+    if inclinacao_carga:
+        dados['peso_amostragem'] = float(np.exp(log_peso))
     if cenario_id is not None:
         dados['cenario'] = cenario_id
     return dados
@@ -117,7 +181,7 @@ def aplicar_dados_ao_net(net, dados):
     Aplica os dados de um cenário específico (gerados por gerar_dados_cenario)
     à rede pandapower.
     """
-    net_copy = pp.from_json_string(pp.to_json(net))
+    net_copy = copiar_rede(net)
 
     for idx in net_copy.load.index:
         net_copy.load.at[idx, 'p_mw'] = dados[f'carga_p_mw_{idx}']
@@ -143,11 +207,12 @@ def rodar_fluxo_potencia(net):
     Executa o fluxo de potência usando pandapower.
     Retorna o objeto da rede com os resultados e um booleano de convergência.
     """
+    import pandapower as pp
     try:
         pp.runpp(net, numba=False, init='flat')
         return net, True
     except pp.LoadflowNotConverged:
-        print("Fluxo de potência NÃO convergiu.")
+        # A não convergência é registrada por quem chama (status da contingência/cenário)
         # Se não convergir, preenche os resultados de tensão com NaN para manter a estrutura
         for bus_idx in net.bus.index:
             if bus_idx not in net.res_bus.index: # Garante que o índice existe
@@ -155,36 +220,111 @@ def rodar_fluxo_potencia(net):
         return net, False
 
 @task
-def simular_desligamento_e_verificar_ilhamento(net_copy, linha):
+def preparar_rede_base(caso='case30', usar_cache=True, q_mvar_limite=50.0, barra_slack=None):
     """
-    Prepara uma rede para uma contingência de linha, desliga a linha
-    e verifica se houve ilhamento. Retorna a rede modificada e o status de ilhamento.
+    Retorna a rede base preparada e já resolvida, junto com o status de convergência.
+    A rede é lida do cache em disco quando disponível; caso contrário é criada,
+    resolvida e gravada no cache (apenas se o fluxo de potência convergir).
     """
-    net_contingencia_copy = pp.from_json_string(pp.to_json(net_copy)) # Garante que a contingência não afete o net_copy original
-    net_contingencia_copy.line.at[linha, 'in_service'] = False
-
-    ilhamento_detectado = False
-    graph = create_nxgraph(net_contingencia_copy, respect_switches=True)
-    slack_buses = net_contingencia_copy.gen[net_contingencia_copy.gen['slack']].bus.values
+    from src.flows.cache_rede import chave_cache_rede, carregar_rede_cache, salvar_rede_cache
+    from src.flows import redes
+
+    parametros = {'q_mvar_limite': q_mvar_limite, 'barra_slack': barra_slack}
+    # O módulo redes inteiro entra na chave: carregar_rede, barra_slack_padrao e REDES_REGISTRADAS também preparam a rede
+    chave = chave_cache_rede(redes.identificador_rede(caso), parametros, [criar_rede_slack_bar, rodar_fluxo_potencia, redes])
+
+    if usar_cache:
+        em_cache = carregar_rede_cache(chave)
+        if em_cache is not None:
+            print(f"Rede base carregada do cache ({chave[:12]}).")
+            return em_cache
+
+    net = criar_rede_slack_bar.fn(caso, **parametros)
+    net, convergencia = rodar_fluxo_potencia.fn(net)
+
+    if usar_cache and convergencia:
+        salvar_rede_cache(chave, net, convergencia)
+    return net, convergencia
+
+def copiar_rede(net):
+    """Cópia independente da rede (via JSON, como no restante do flow)."""
+    import pandapower as pp
+    return pp.from_json_string(pp.to_json(net))
+
+def verificar_ilhamento(net):
+    """Retorna True se algum componente conectado da rede ficou sem barra slack."""
+    import networkx as nx
+    from pandapower.topology import create_nxgraph
+
+    graph = create_nxgraph(net, respect_switches=True)
+    slack_buses = net.gen[net.gen['slack']].bus.values
     componentes = list(nx.connected_components(graph))
 
     for component in componentes:
         component_set = set(component)
         slack_present_in_component = any(bus in component_set for bus in slack_buses)
         if not slack_present_in_component:
-            ilhamento_detectado = True
-            break
+            return True
+    return False
 
+@task
+def simular_desligamento_e_verificar_ilhamento(net_copy, linha, instrumentacao=None, cenario=None, ilhamento_conhecido=None,
+                                               tipo='line'):
+    """
+    Prepara uma rede para uma contingência de linha, desliga a linha
+    e verifica se houve ilhamento. Retorna a rede modificada e o status de ilhamento.
+    Se `instrumentacao` for informada, a cópia e o teste de ilhamento são cronometrados.
+    Com `ilhamento_conhecido` (resultado memoizado), o teste de ilhamento não é refeito.
+    Com `tipo` ('trafo', 'gen', 'shunt'), desliga o elemento `linha` da tabela net[tipo].
+    """
+    with medir(instrumentacao, 'copia_rede', cenario):
+        net_contingencia_copy = copiar_rede(net_copy) # Garante que a contingência não afete o net_copy original
+        net_contingencia_copy[tipo].at[linha, 'in_service'] = False
+
+    if ilhamento_conhecido is not None:
+        return net_contingencia_copy, ilhamento_conhecido
+    with medir(instrumentacao, 'ilhamento', cenario):
+        ilhamento_detectado = verificar_ilhamento(net_contingencia_copy)
     return net_contingencia_copy, ilhamento_detectado
 
 
 ## Novas Tasks para Interagir com o PostgreSQL
 
+# Tipos do PostgreSQL trocados no DDL quando o banco é SQLite (execução local, ver execucao_local.py)
+TIPOS_SQLITE = {'SERIAL PRIMARY KEY': 'INTEGER PRIMARY KEY AUTOINCREMENT', 'JSONB': 'TEXT', 'BYTEA': 'BLOB'}
+
+def _ddl_dialeto(ddl, dialeto):
+    """Adapta o DDL escrito para o PostgreSQL ao `dialeto` do banco (só o SQLite precisa de ajustes)."""
+    if dialeto == 'sqlite':
+        for tipo_postgres, tipo_sqlite in TIPOS_SQLITE.items():
+            ddl = ddl.replace(tipo_postgres, tipo_sqlite)
+    return ddl
+
+def _adicionar_colunas(conn, tabela, colunas):
+    """
+    Acrescenta à tabela as colunas (nome, tipo) que faltarem. O SQLite não tem
+    ADD COLUMN IF NOT EXISTS: as colunas existentes são consultadas antes.
+    """
+    from sqlalchemy import inspect
+
+    if conn.dialect.name == 'sqlite':
+        existentes = {coluna['name'] for coluna in inspect(conn).get_columns(tabela)}
+        for nome, tipo in colunas:
+            if nome not in existentes:
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {nome} {_ddl_dialeto(tipo, 'sqlite')};"))
+        return
+    adicoes = ",\n".join(f"ADD COLUMN IF NOT EXISTS {nome} {tipo}" for nome, tipo in colunas)
+    conn.execute(text(f"ALTER TABLE {tabela} {adicoes};"))
+
 @task
-def criar_tabelas_postgres():
-    """Versão definitiva com todos os tratamentos de erro"""
+def criar_tabelas_postgres(indices_barras=range(30)):
+    """
+    Versão definitiva com todos os tratamentos de erro.
+    As colunas de tensão por barra são criadas de acordo com as barras da rede simulada.
+    Também cria as tabelas em um banco SQLite (DATABASE_URL='sqlite:///...'), com os tipos adaptados.
+    """
     import time
-    from sqlalchemy import create_engine, text
+    from sqlalchemy import create_engine, inspect, text
     from sqlalchemy.exc import OperationalError
 
     DB_URL = get_db_url()
@@ -204,11 +344,20 @@ def criar_tabelas_postgres():
                         CREATE TABLE IF NOT EXISTS resultados_simulacao (
                             id SERIAL PRIMARY KEY,
                             cenario INTEGER,
-                            linha_desligada INTEGER,
+                            linha_desligada INTEGER, -- Nulo nas contingências de outros elementos
+                            tipo_elemento TEXT, -- Tabela do elemento desligado: 'line', 'trafo', 'gen' ou 'shunt'
+                            elemento_desligado INTEGER, -- Índice do elemento desligado na sua tabela
                             status TEXT,
                             ilhamento BOOLEAN,
                             num_componentes_conectados INTEGER,
                             convergencia BOOLEAN,
+                            detalhe TEXT, -- Descrição do evento crítico (violação, ilhamento, não convergência)
+                            linhas_desligadas TEXT, -- Linhas das contingências múltiplas (ex.: '3,17', com linha_desligada nula); nulo nas N-1
+                            tipo_violacao TEXT, -- 'subtensao', 'sobretensao' ou 'sobrecarga'; nulo sem violação
+                            elemento_violacao INTEGER, -- Barra (tensão) ou linha (carregamento) da violação
+                            valor_violacao DOUBLE PRECISION, -- Tensão (pu) ou carregamento (%) medido
+                            limite_violacao DOUBLE PRECISION,
+                            excesso_violacao DOUBLE PRECISION, -- Quanto o valor ultrapassou o limite (pu ou %)
                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                             execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL
                         );""",
@@ -219,10 +368,9 @@ def criar_tabelas_postgres():
                             linha_desligada INTEGER,
                             from_bus INTEGER,
                             to_bus INTEGER,
-                            -- Geração dinâmica das colunas vm_pu_antes_bus_X
-                            """ + ",\n".join([f"vm_pu_antes_bus_{i} NUMERIC" for i in range(30)]) + """,
-                            -- Geração dinâmica das colunas vm_pu_depois_bus_X
-                            """ + ",\n".join([f"vm_pu_depois_bus_{i} NUMERIC" for i in range(30)]) + """,
+                            -- Tensões no formato JSONB (redes acima de MAX_BARRAS_FORMATO_EXPANDIDO)
+                            tensao_antes JSONB,
+                            tensao_depois JSONB,
                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                             execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL
                         );""",
@@ -232,6 +380,80 @@ def criar_tabelas_postgres():
                             cenario INTEGER,
                             linha_desligada INTEGER,
                             impacto_por_barra JSONB,
+                            tensao_id INTEGER, -- id da linha de tensao_barras_nao_criticos analisada (linhas pendentes)
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL
+                        );""",
+                    'impacto_agregado_linha_barra': """
+                        CREATE TABLE IF NOT EXISTS impacto_agregado_linha_barra (
+                            id SERIAL PRIMARY KEY,
+                            linha_desligada INTEGER,
+                            barra INTEGER,
+                            n_cenarios INTEGER, -- Cenários com |ΔV| da barra analisado nesta contingência
+                            soma_impacto DOUBLE PRECISION, -- Soma de |ΔV| (pu): média = soma_impacto / n_cenarios
+                            max_impacto DOUBLE PRECISION, -- Maior |ΔV| (pu) entre esses cenários
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+                            UNIQUE (execution_timestamp, linha_desligada, barra)
+                        );""",
+                    'metricas_execucao': """
+                        CREATE TABLE IF NOT EXISTS metricas_execucao (
+                            id SERIAL PRIMARY KEY,
+                            cenario INTEGER, -- NULL para as métricas da execução como um todo
+                            tipo TEXT, -- 'tempo' (segundos, sem o das etapas aninhadas) ou 'contador'
+                            nome TEXT,
+                            valor DOUBLE PRECISION,
+                            chamadas INTEGER,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL
+                        );""",
+                    'probabilidade_criticidade': """
+                        CREATE TABLE IF NOT EXISTS probabilidade_criticidade (
+                            id SERIAL PRIMARY KEY,
+                            linha INTEGER,
+                            probabilidade DOUBLE PRECISION, -- Probabilidade estimada de a contingência N-1 ser crítica
+                            ic_inferior DOUBLE PRECISION,
+                            ic_superior DOUBLE PRECISION,
+                            n_cenarios INTEGER, -- Cenários simulados até a parada da amostragem adaptativa
+                            n_efetivo DOUBLE PRECISION, -- Tamanho efetivo da amostra (< n_cenarios com amostragem por importância)
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL
+                        );""",
+                    'margem_estabilidade': """
+                        CREATE TABLE IF NOT EXISTS margem_estabilidade (
+                            id SERIAL PRIMARY KEY,
+                            linha_desligada INTEGER, -- NULL para a rede intacta
+                            fator_critico DOUBLE PRECISION, -- Maior fator de carga viável; NULL nas linhas que ilham a rede
+                            margem_percentual DOUBLE PRECISION, -- (fator_critico - 1) x 100; negativa se o ponto de operação já é inviável
+                            motivo TEXT, -- 'vmin', 'divergencia', 'fator_maximo' ou 'ilhamento'
+                            vm_min DOUBLE PRECISION, -- Menor tensão (pu) no fator crítico
+                            barra_vm_min INTEGER,
+                            n_fluxos INTEGER, -- Fluxos de potência resolvidos na busca
+                            ranking INTEGER, -- 1 = menor margem
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL
+                        );""",
+                    'sensibilidade_tensao': """
+                        CREATE TABLE IF NOT EXISTS sensibilidade_tensao (
+                            id SERIAL PRIMARY KEY,
+                            cenario INTEGER,
+                            barra INTEGER, -- Barra cuja tensão varia
+                            barra_injecao INTEGER, -- Barra onde a injeção varia
+                            dv_dp DOUBLE PRECISION, -- Variação de tensão (pu) por MW injetado
+                            dv_dq DOUBLE PRECISION, -- Variação de tensão (pu) por MVAr injetado
+                            vm_pu DOUBLE PRECISION, -- Tensão da barra no ponto de operação do cenário
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL
+                        );""",
+                    'perfis_execucao': """
+                        CREATE TABLE IF NOT EXISTS perfis_execucao (
+                            id SERIAL PRIMARY KEY,
+                            flow TEXT,
+                            modo TEXT, -- 'cprofile' (.prof) ou 'amostragem' (.folded)
+                            arquivo TEXT,
+                            duracao_s DOUBLE PRECISION,
+                            resumo TEXT,
+                            conteudo BYTEA,
                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                             execution_timestamp TIMESTAMP WITH TIME ZONE NOT NULL
                         );"""
@@ -239,16 +461,45 @@ def criar_tabelas_postgres():
 
                 for nome, schema in tabelas.items():
                     print(f"Criando/Verificando tabela: {nome}")
-                    conn.execute(text(schema))
+                    conn.execute(text(_ddl_dialeto(schema, conn.dialect.name)))
                     # Verificação pós-criação
-                    result = conn.execute(
-                        text("SELECT to_regclass(:tabela)"),
-                        {"tabela": nome}
-                    ).scalar()
+                    if conn.dialect.name == 'postgresql':
+                        result = conn.execute(
+                            text("SELECT to_regclass(:tabela)"),
+                            {"tabela": nome}
+                        ).scalar()
+                    else:
+                        result = inspect(conn).has_table(nome)
                     if not result:
                         raise RuntimeError(f"Tabela {nome} não foi criada")
                     print(f"✅ Tabela {nome} verificada")
 
+                # Geração dinâmica das colunas vm_pu_antes_bus_X / vm_pu_depois_bus_X
+                # conforme as barras da rede (tabelas antigas ganham as colunas que faltarem)
+                _adicionar_colunas(conn, 'resultados_simulacao', [
+                    ('detalhe', 'TEXT'), ('linhas_desligadas', 'TEXT'), ('tipo_violacao', 'TEXT'),
+                    ('elemento_violacao', 'INTEGER'), ('valor_violacao', 'DOUBLE PRECISION'),
+                    ('limite_violacao', 'DOUBLE PRECISION'), ('excesso_violacao', 'DOUBLE PRECISION'),
+                    ('tipo_elemento', 'TEXT'), ('elemento_desligado', 'INTEGER')])
+                _adicionar_colunas(conn, 'impacto_tensao_barras', [('tensao_id', 'INTEGER')])
+                # Cada linha de tensão é analisada uma única vez (análise de impacto incremental)
+                conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS impacto_tensao_barras_tensao_id "
+                                  "ON impacto_tensao_barras (tensao_id);"))
+                # Consultas "e se" leem as colunas de uma barra de injeção de um cenário (consultar_variacao_tensao)
+                conn.execute(text("CREATE INDEX IF NOT EXISTS sensibilidade_tensao_consulta "
+                                  "ON sensibilidade_tensao (execution_timestamp, cenario, barra_injecao);"))
+                # Consultas por execução e cenário do Dash e da API (src/flows/api_resultados.py)
+                conn.execute(text("CREATE INDEX IF NOT EXISTS resultados_simulacao_consulta "
+                                  "ON resultados_simulacao (execution_timestamp, cenario);"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS impacto_tensao_barras_consulta "
+                                  "ON impacto_tensao_barras (execution_timestamp, cenario, linha_desligada);"))
+                _adicionar_colunas(conn, 'tensao_barras_nao_criticos', [('tensao_antes', 'JSONB'), ('tensao_depois', 'JSONB')])
+                if usa_formato_expandido(indices_barras):
+                    _adicionar_colunas(conn, 'tensao_barras_nao_criticos',
+                                       [(f"vm_pu_antes_bus_{i}", 'NUMERIC') for i in indices_barras] +
+                                       [(f"vm_pu_depois_bus_{i}", 'NUMERIC') for i in indices_barras])
+                    print(f"✅ Colunas de tensão para {len(indices_barras)} barras verificadas")
+
                 conn.commit()
                 return True
 
@@ -269,6 +520,7 @@ def salvar_resultados_globais_postgres(resultados, execution_timestamp, table_na
     """
     Salva os resultados globais de todas as contingências no PostgreSQL.
     """
+    import pandas as pd
     if not resultados:
         print("Nenhum resultado global para salvar no PostgreSQL.")
         return
@@ -282,7 +534,7 @@ def salvar_resultados_globais_postgres(resultados, execution_timestamp, table_na
     try:
         df_resultados_finais.to_sql(table_name, engine, if_exists='append', index=False)
         print(f"\nResultados detalhados (todas as contingências) salvos na tabela '{table_name}' do PostgreSQL.")
-        run_context = get_run_context()
+        run_context = _contexto_execucao()
         if run_context:
             create_markdown_artifact(
                 f"Resultados da simulação salvos no PostgreSQL na tabela: `{table_name}`",
@@ -293,14 +545,235 @@ def salvar_resultados_globais_postgres(resultados, execution_timestamp, table_na
         print(f"Erro ao salvar resultados globais no PostgreSQL: {e}")
 
 @task
-def salvar_tensao_nao_criticos_postgres(tensao_data, execution_timestamp, table_name='tensao_barras_nao_criticos', num_barras=30):
+def salvar_metricas_postgres(instrumentacao, execution_timestamp, table_name='metricas_execucao'):
+    """
+    Salva as métricas da instrumentação (tempos e contadores por cenário e da execução)
+    no PostgreSQL e publica o resumo como artefato Markdown no Prefect.
+    """
+    df_metricas = instrumentacao.metricas()
+    df_metricas['execution_timestamp'] = execution_timestamp
+
+    run_context = _contexto_execucao()
+    if run_context:
+        create_markdown_artifact(
+            instrumentacao.tabela_markdown(),
+            key="metricas-execucao",
+            description="Tempo por etapa e contadores (fluxos de potência, iterações, status) da simulação."
+        )
+
+    DB_URL = get_db_url()
+    engine = create_engine(DB_URL)
+
+    try:
+        df_metricas.to_sql(table_name, engine, if_exists='append', index=False)
+        print(f"Métricas da execução salvas na tabela '{table_name}' do PostgreSQL.")
+    except Exception as e:
+        print(f"Erro ao salvar métricas no PostgreSQL: {e}")
+
+@task
+def notificar_novos_dados(tabela, execution_timestamp):
+    """
+    Avisa por NOTIFY (canal CANAL_NOVOS_DADOS) que a execução terminou de gravar na tabela,
+    para o Dash atualizar sem consultar o banco periodicamente. Sem efeito fora do PostgreSQL.
+    """
+    from src.flows.notificacoes import publicar_novos_dados, CANAL_NOVOS_DADOS
+
+    try:
+        if publicar_novos_dados(create_engine(get_db_url()), tabela, execution_timestamp):
+            print(f"📣 Notificação de novos dados em '{tabela}' enviada no canal '{CANAL_NOVOS_DADOS}'.")
+    except Exception as e:
+        print(f"Erro ao enviar a notificação de novos dados: {e}")
+
+@task
+def salvar_probabilidades_criticidade(amostragem, execution_timestamp, table_name='probabilidade_criticidade'):
     """
-    Salva os dados de tensão para contingências NÃO CRÍTICAS no PostgreSQL no formato expandido.
+    Salva as probabilidades de criticidade por linha estimadas pela amostragem adaptativa
+    (com o intervalo de confiança e o número de cenários necessários) e publica as linhas
+    mais críticas como artefato Markdown no Prefect.
     """
+    import pandas as pd
+    resumo = amostragem.resumo()
+    df_probabilidades = pd.DataFrame(amostragem.probabilidades())
+    df_probabilidades['n_cenarios'] = resumo['n_cenarios']
+    df_probabilidades['n_efetivo'] = resumo['n_efetivo']
+    df_probabilidades['execution_timestamp'] = execution_timestamp
+
+    run_context = _contexto_execucao()
+    if run_context:
+        linhas = ["# Amostragem adaptativa", "",
+                  f"Cenários necessários: {resumo['n_cenarios']} (tamanho efetivo {resumo['n_efetivo']:.1f}); "
+                  f"maior semiamplitude do IC de {resumo['confianca']:.0%}: {resumo['maior_semiamplitude']:.4f}"
+                  f"{'' if resumo['convergiu'] else ' (limite de cenários atingido antes da convergência)'}", "",
+                  "| Linha | Probabilidade | IC |", "|---:|---:|---|"]
+        for r in df_probabilidades.nlargest(20, 'probabilidade').itertuples():
+            linhas.append(f"| {r.linha} | {r.probabilidade:.3f} | [{r.ic_inferior:.3f}, {r.ic_superior:.3f}] |")
+        create_markdown_artifact("\n".join(linhas), key="probabilidade-criticidade",
+                                 description="Probabilidade de criticidade das contingências N-1 por linha.")
+
+    DB_URL = get_db_url()
+    engine = create_engine(DB_URL)
+
+    try:
+        df_probabilidades.to_sql(table_name, engine, if_exists='append', index=False)
+        print(f"Probabilidades de criticidade salvas na tabela '{table_name}' do PostgreSQL.")
+    except Exception as e:
+        print(f"Erro ao salvar probabilidades de criticidade no PostgreSQL: {e}")
+
+@task
+def salvar_sensibilidades_postgres(sensibilidades, execution_timestamp, table_name='sensibilidade_tensao'):
+    """
+    Salva as matrizes de sensibilidade de tensão (dV/dP, dV/dQ) de cada cenário
+    ({cenario: SensibilidadeTensao}) no formato longo, só com as entradas não nulas.
+    """
+    import pandas as pd
+    if not sensibilidades:
+        print("Nenhuma sensibilidade de tensão para salvar no PostgreSQL.")
+        return
+
+    df_sensibilidades = pd.concat([pd.DataFrame(sensibilidade.registros()).assign(cenario=cenario)
+                                   for cenario, sensibilidade in sensibilidades.items()], ignore_index=True)
+    df_sensibilidades['execution_timestamp'] = execution_timestamp
+
+    DB_URL = get_db_url()
+    engine = create_engine(DB_URL)
+
+    try:
+        df_sensibilidades.to_sql(table_name, engine, if_exists='append', index=False, chunksize=10000)
+        print(f"Sensibilidades de tensão de {len(sensibilidades)} cenários ({len(df_sensibilidades)} entradas) "
+              f"salvas na tabela '{table_name}' do PostgreSQL.")
+    except Exception as e:
+        print(f"Erro ao salvar sensibilidades de tensão no PostgreSQL: {e}")
+
+@task
+def salvar_margens_postgres(margens, execution_timestamp, table_name='margem_estabilidade'):
+    """
+    Salva as margens de carga por contingência (margem_estabilidade_flow), com o ranking
+    da menor para a maior margem, e publica as contingências mais severas como artefato.
+    """
+    import pandas as pd
+    df_margens = pd.DataFrame(margens)
+    df_margens['margem_percentual'] = (df_margens['fator_critico'] - 1) * 100
+    df_margens['ranking'] = df_margens['fator_critico'].where(df_margens['linha_desligada'].notna()).rank(method='min')
+    df_margens['execution_timestamp'] = execution_timestamp
+
+    run_context = _contexto_execucao()
+    if run_context:
+        linhas = ["# Margem de carga por contingência", "",
+                  "| Ranking | Linha | Fator crítico | Margem (%) | Motivo | Vmin (pu) | Barra |", "|---:|---:|---:|---:|---|---:|---:|"]
+        for r in df_margens.dropna(subset=['ranking']).nsmallest(20, 'ranking').itertuples():
+            linhas.append(f"| {int(r.ranking)} | {int(r.linha_desligada)} | {r.fator_critico:.3f} | {r.margem_percentual:.1f} | "
+                          f"{r.motivo} | {r.vm_min:.4f} | {int(r.barra_vm_min)} |")
+        create_markdown_artifact("\n".join(linhas), key="margem-estabilidade",
+                                 description="Fator de carga crítico (violação de vmin ou colapso) de cada contingência N-1.")
+
+    DB_URL = get_db_url()
+    engine = create_engine(DB_URL)
+
+    try:
+        df_margens.to_sql(table_name, engine, if_exists='append', index=False)
+        print(f"Margens de estabilidade salvas na tabela '{table_name}' do PostgreSQL.")
+    except Exception as e:
+        print(f"Erro ao salvar margens de estabilidade no PostgreSQL: {e}")
+
+@task
+def salvar_perfil_postgres(perfil, nome_flow, execution_timestamp, table_name='perfis_execucao'):
+    """
+    Salva o perfil de uma execução (arquivo .prof/.folded e resumo) no PostgreSQL,
+    para que possa ser baixado mesmo sem acesso ao disco do container, e publica
+    o resumo como artefato Markdown no Prefect.
+    """
+    import pandas as pd
+    with open(perfil['arquivo'], 'rb') as f:
+        conteudo = f.read()
+
+    run_context = _contexto_execucao()
+    if run_context:
+        create_markdown_artifact(
+            f"# Perfil ({perfil['modo']}) de `{nome_flow}`\n\n"
+            f"Arquivo: `{perfil['arquivo']}` ({len(conteudo) / 1024:.0f} KiB, {perfil['duracao_s']:.1f} s de execução)\n\n"
+            f"```\n{perfil['resumo']}\n```",
+            key="perfil-execucao",
+            description="Funções que mais consumiram tempo na execução perfilada."
+        )
+
+    df_perfil = pd.DataFrame([{
+        'flow': nome_flow,
+        'modo': perfil['modo'],
+        'arquivo': perfil['arquivo'],
+        'duracao_s': perfil['duracao_s'],
+        'resumo': perfil['resumo'],
+        'conteudo': conteudo,
+        'execution_timestamp': execution_timestamp,
+    }])
+
+    DB_URL = get_db_url()
+    engine = create_engine(DB_URL)
+
+    try:
+        df_perfil.to_sql(table_name, engine, if_exists='append', index=False)
+        print(f"Perfil da execução salvo em '{perfil['arquivo']}' e na tabela '{table_name}' do PostgreSQL.")
+    except Exception as e:
+        print(f"Erro ao salvar perfil no PostgreSQL (o arquivo continua em '{perfil['arquivo']}'): {e}")
+
+def _executar_perfilado(modo, nome_flow, funcao, **parametros):
+    """
+    Executa o corpo de um flow (funcao = flow.fn) sob o perfilador e salva o perfil.
+    Se o flow recebe `execution_timestamp`, ele é resolvido aqui uma vez e passado ao
+    corpo: o perfil (linha em perfis_execucao e nome do arquivo) usa o mesmo instante
+    dos resultados da execução.
+    """
+    execution_timestamp = parametros.get('execution_timestamp') or datetime.now(timezone('America/Sao_Paulo'))
+    if 'execution_timestamp' in parametros:
+        parametros['execution_timestamp'] = execution_timestamp
+    nome_arquivo = f"{nome_flow}_{execution_timestamp:%Y%m%d_%H%M%S_%f}"
+    with perfilar(modo, nome_arquivo) as perfil:
+        resultado = funcao(**parametros)
+    salvar_perfil_postgres(perfil, nome_flow, execution_timestamp)
+    return resultado
+
+@task
+def salvar_resultados_parquet(resultados, tensao_data, execution_timestamp, diretorio, indices_barras=range(30)):
+    """
+    Exporta os resultados da execução em Parquet particionado por execução e cenário
+    (tensões em float32), para análise sem acesso ao PostgreSQL.
+    Ver src/flows/exportacao_parquet.py para o layout e as funções de leitura.
+    """
+    from src.flows.exportacao_parquet import exportar_resultados_parquet
+
+    try:
+        run = exportar_resultados_parquet(diretorio, execution_timestamp, resultados, tensao_data, list(indices_barras))
+        print(f"Resultados exportados em Parquet em '{diretorio}' (run={run}).")
+        run_context = _contexto_execucao()
+        if run_context:
+            create_markdown_artifact(
+                f"Resultados exportados em Parquet: `{diretorio}` (partição `run={run}`)",
+                key="resultados-parquet",
+                description="Status das contingências e tensões (float32) particionados por execução e cenário."
+            )
+        return run
+    except Exception as e:
+        print(f"Erro ao exportar resultados em Parquet: {e}")
+
+def _valor_json(valor):
+    """Converte um valor de tensão para JSON (NaN vira null)."""
+    import pandas as pd
+    if valor is None or pd.isna(valor):
+        return None
+    return float(valor)
+
+@task
+def salvar_tensao_nao_criticos_postgres(tensao_data, execution_timestamp, table_name='tensao_barras_nao_criticos', indices_barras=range(30)):
+    """
+    Salva os dados de tensão para contingências NÃO CRÍTICAS no PostgreSQL no formato expandido
+    (uma coluna por barra) ou, para redes grandes, nas colunas JSONB 'tensao_antes'/'tensao_depois'.
+    """
+    import pandas as pd
     if not tensao_data:
         print("Nenhuma contingência não crítica foi encontrada para salvar dados de tensão no PostgreSQL.")
         return
 
+    formato_expandido = usa_formato_expandido(indices_barras)
+
     # Processa os dados para o formato expandido (flat)
     processed_data_flat = []
     for row in tensao_data:
@@ -315,9 +788,13 @@ def salvar_tensao_nao_criticos_postgres(tensao_data, execution_timestamp, table_
         tensao_antes_dict = row['tensao_antes']
         tensao_depois_dict = row['tensao_depois']
 
-        for i in range(num_barras): # Iterar sobre todas as possíveis barras
-            flat_row[f'vm_pu_antes_bus_{i}'] = tensao_antes_dict.get(i) # Usar .get(i) para valores numéricos
-            flat_row[f'vm_pu_depois_bus_{i}'] = tensao_depois_dict.get(i) # Usar .get(i) para valores numéricos
+        if formato_expandido:
+            for i in indices_barras: # Iterar sobre todas as barras da rede
+                flat_row[f'vm_pu_antes_bus_{i}'] = tensao_antes_dict.get(i) # Usar .get(i) para valores numéricos
+                flat_row[f'vm_pu_depois_bus_{i}'] = tensao_depois_dict.get(i) # Usar .get(i) para valores numéricos
+        else:
+            flat_row['tensao_antes'] = json.dumps({str(i): _valor_json(tensao_antes_dict.get(i)) for i in indices_barras})
+            flat_row['tensao_depois'] = json.dumps({str(i): _valor_json(tensao_depois_dict.get(i)) for i in indices_barras})
         processed_data_flat.append(flat_row)
 
     df_tensao_nao_criticos = pd.DataFrame(processed_data_flat)
@@ -335,7 +812,7 @@ def salvar_tensao_nao_criticos_postgres(tensao_data, execution_timestamp, table_
     try:
         df_tensao_nao_criticos.to_sql(table_name, engine, if_exists='append', index=False)
         print(f"Dados de tensão para contingências NÃO CRÍTICAS salvos no formato expandido na tabela '{table_name}' do PostgreSQL.")
-        run_context = get_run_context()
+        run_context = _contexto_execucao()
         if run_context:
             create_markdown_artifact(
                 f"Dados de tensão para cenários não críticos salvos no PostgreSQL na tabela: `{table_name}`",
@@ -348,83 +825,200 @@ def salvar_tensao_nao_criticos_postgres(tensao_data, execution_timestamp, table_
         # print(df_tensao_nao_criticos.head())
         # print(df_tensao_nao_criticos.dtypes)
 
+def extrair_tensoes_barras(df_tensao, num_barras=None):
+    """
+    Extrai das linhas da tabela 'tensao_barras_nao_criticos' as tensões antes e depois
+    de cada contingência, aceitando tanto o formato expandido (vm_pu_antes_bus_X)
+    quanto o formato JSONB (tensao_antes/tensao_depois).
+    Retorna (indices_barras, matriz_antes, matriz_depois), com uma linha por contingência.
+    """
+    import pandas as pd
+    cols_antes = [col for col in df_tensao.columns if col.startswith('vm_pu_antes_bus_')]
+    indices_barras = sorted(int(col.replace('vm_pu_antes_bus_', '')) for col in cols_antes)
+    if indices_barras and df_tensao[[f'vm_pu_antes_bus_{i}' for i in indices_barras]].notna().any().any():
+        if num_barras is not None:
+            indices_barras = [i for i in indices_barras if i < num_barras]
+        antes = df_tensao[[f'vm_pu_antes_bus_{i}' for i in indices_barras]].to_numpy(dtype=float)
+        depois = df_tensao[[f'vm_pu_depois_bus_{i}' for i in indices_barras]].to_numpy(dtype=float)
+        return indices_barras, antes, depois
+
+    if 'tensao_antes' not in df_tensao.columns or df_tensao.empty:
+        return [], np.empty((len(df_tensao), 0)), np.empty((len(df_tensao), 0))
+
+    def _carregar(valor):
+        return json.loads(valor) if isinstance(valor, str) else (valor or {})
+
+    tensoes_antes = df_tensao['tensao_antes'].apply(_carregar)
+    tensoes_depois = df_tensao['tensao_depois'].apply(_carregar)
+    indices_barras = sorted({int(i) for tensoes in tensoes_antes for i in tensoes})
+    if num_barras is not None:
+        indices_barras = [i for i in indices_barras if i < num_barras]
+    antes = pd.DataFrame(list(tensoes_antes)).reindex(columns=[str(i) for i in indices_barras]).to_numpy(dtype=float)
+    depois = pd.DataFrame(list(tensoes_depois)).reindex(columns=[str(i) for i in indices_barras]).to_numpy(dtype=float)
+    return indices_barras, antes, depois
+
+def _impactos(df_tensao, num_barras=None):
+    """Linhas de impacto |V_depois - V_antes| por barra de cada linha de tensão (ver salvar_impacto_postgres)."""
+    indices_barras, tensao_antes, tensao_depois = extrair_tensoes_barras(df_tensao, num_barras)
+    diferencas = np.abs(tensao_depois - tensao_antes) # NaN se faltar alguma das tensões
+
+    resultados_impacto = []
+    for pos, linha in enumerate(df_tensao[['cenario', 'linha_desligada', 'id', 'execution_timestamp']].itertuples(index=False)):
+        resultados_impacto.append({
+            'cenario': linha.cenario,
+            'linha_desligada': linha.linha_desligada,
+            'impacto_por_barra': {str(i): diferencas[pos, j] for j, i in enumerate(indices_barras)},
+            'tensao_id': linha.id,
+            'execution_timestamp': linha.execution_timestamp,
+        })
+    return resultados_impacto
+
 @task
-def analisar_impacto_tensao_postgres(table_name_input='tensao_barras_nao_criticos', num_barras=30, table_name_output='impacto_tensao_barras'):
+def analisar_impacto_tensao_postgres(table_name_input='tensao_barras_nao_criticos', num_barras=None, table_name_output='impacto_tensao_barras',
+                                     tamanho_lote=TAMANHO_LOTE_IMPACTO):
     """
     Analisa o impacto do desligamento de linhas nas tensões das barras e
     salva os resultados no PostgreSQL.
+    As barras analisadas são as presentes na tabela (ou as `num_barras` primeiras, se informado).
+
+    A análise é incremental: só as linhas de tensão cujo id ainda não aparece em 'tensao_id'
+    na tabela de saída são processadas, em lotes de `tamanho_lote` (cada lote lido e gravado
+    na mesma transação). Não se usa o maior 'tensao_id' como marca d'água: os ids SERIAL são
+    reservados antes do commit, e uma simulação concorrente pode confirmar ids menores depois
+    que um id maior já foi analisado. Chamar de novo não
+    duplica linhas, e a task pode ser chamada a cada lote de tensões gravado pela
+    simulação (parâmetro `lote_analise_impacto` de simulacao_contingencia_flow).
+    Retorna o número de linhas de tensão analisadas.
     """
+    import pandas as pd
     print(f"Iniciando análise de impacto de tensão a partir do PostgreSQL da tabela '{table_name_input}'...")
 
     DB_URL = get_db_url()
     engine = create_engine(DB_URL)
+    analisadas = 0
 
     try:
-        with engine.connect() as connection:
-            # Encontra o último execution_timestamp para garantir que você analise apenas a rodada mais recente
-            latest_execution_timestamp_query = text(f"SELECT MAX(execution_timestamp) FROM {table_name_input};")
-            latest_timestamp = connection.execute(latest_execution_timestamp_query).scalar()
-
-            if latest_timestamp:
-                print(f"Analisando dados da execução mais recente: {latest_timestamp}")
-                # A query agora filtra pelo execution_timestamp
-                columns_to_select = ['cenario', 'linha_desligada', 'from_bus', 'to_bus'] + \
-                                    [f'vm_pu_antes_bus_{i}' for i in range(num_barras)] + \
-                                    [f'vm_pu_depois_bus_{i}' for i in range(num_barras)]
-
-                query = text(f"SELECT {', '.join(columns_to_select)} FROM {table_name_input} WHERE execution_timestamp = :latest_ts;")
-                df_tensao = pd.read_sql(query, connection, params={'latest_ts': latest_timestamp})
-            else:
-                print(f"Nenhum dado encontrado na tabela '{table_name_input}' para análise de impacto.")
-                return pd.DataFrame() # Retorna um DataFrame vazio se não houver dados
-
-        print(f"Dados carregados com sucesso da tabela '{table_name_input}'.")
+        while True:
+            with engine.begin() as connection:
+                if engine.dialect.name == 'postgresql':
+                    # Análises simultâneas (ex.: fim de lote e flow de análise) processam uma de cada vez
+                    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:tabela))"), {'tabela': table_name_output})
+                # Anti-join pelo índice único em tensao_id: linhas de tensão ainda sem impacto gravado
+                query = text(f"SELECT t.* FROM {table_name_input} t WHERE NOT EXISTS "
+                             f"(SELECT 1 FROM {table_name_output} i WHERE i.tensao_id = t.id) ORDER BY t.id LIMIT :lote;")
+                df_tensao = pd.read_sql(query, connection, params={'lote': int(tamanho_lote)})
+                if df_tensao.empty:
+                    break
+                print(f"Analisando {len(df_tensao)} linhas de tensão (ids {df_tensao['id'].min()} a {df_tensao['id'].max()}).")
+                salvar_impacto_postgres(_impactos(df_tensao, num_barras), table_name_output, conexao=connection)
+            analisadas += len(df_tensao)
     except Exception as e:
-        print(f"Erro ao carregar dados de tensão do PostgreSQL para análise de impacto: {e}")
-        return pd.DataFrame()
-
-    resultados_impacto_novo_formato = []
+        print(f"Erro na análise de impacto de tensão a partir do PostgreSQL: {e}")
+        return analisadas
 
-    for index, row in df_tensao.iterrows(): # Iterar sobre o DataFrame diretamente
-        cenario_id = row['cenario']
-        linha_desligada = row['linha_desligada']
-
-        linha_resultado = {
-            'cenario': cenario_id,
-            'linha_desligada': linha_desligada,
-            'impacto_por_barra': {}
-        }
-
-        for i in range(num_barras):
-            tensao_antes = row[f'vm_pu_antes_bus_{i}'] # Acessa diretamente a coluna
-            tensao_depois = row[f'vm_pu_depois_bus_{i}'] # Acessa diretamente a coluna
-
-            if pd.isna(tensao_antes) or pd.isna(tensao_depois):
-                diferenca = np.nan
-            else:
-                diferenca = abs(tensao_depois - tensao_antes)
-
-            linha_resultado['impacto_por_barra'][str(i)] = diferenca
+    if analisadas:
+        print(f"\nAnálise de impacto concluída: {analisadas} linhas de tensão novas analisadas na tabela '{table_name_output}'.")
+        run_context = _contexto_execucao()
+        if run_context:
+            create_markdown_artifact(
+                f"Relatório de Impacto de Tensão salvo no PostgreSQL na tabela: `{table_name_output}` "
+                f"({analisadas} contingências novas)",
+                key="impacto-tensao-db",
+                description="Relatório do impacto de tensão nas barras no banco de dados."
+            )
+    else:
+        print(f"Nenhuma linha nova na tabela '{table_name_input}' para análise de impacto.")
+    return analisadas
 
-        resultados_impacto_novo_formato.append(linha_resultado)
+def _instante_banco(valor, dialeto):
+    """execution_timestamp como parâmetro de consulta, no formato em que o to_sql do pandas grava (no SQLite, texto sem fuso)."""
+    if dialeto == 'sqlite' and isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return valor.to_pydatetime() if hasattr(valor, 'to_pydatetime') else valor
 
-    df_impacto = pd.DataFrame(resultados_impacto_novo_formato)
+def agregar_impacto(resultados_impacto):
+    """
+    Agrega as linhas de impacto por execução, linha desligada e barra: número de cenários,
+    soma e máximo de |ΔV| (tensões ausentes não entram). Retorna um DataFrame no formato
+    da tabela impacto_agregado_linha_barra.
+    """
+    import pandas as pd
+    colunas = ['execution_timestamp', 'linha_desligada', 'barra', 'n_cenarios', 'soma_impacto', 'max_impacto']
+    if not resultados_impacto:
+        return pd.DataFrame(columns=colunas)
+    # Uma coluna por barra: o agrupamento é feito antes de passar para o formato longo
+    impactos = pd.DataFrame([r['impacto_por_barra'] for r in resultados_impacto], dtype=float)
+    impactos['execution_timestamp'] = [r['execution_timestamp'] for r in resultados_impacto]
+    impactos['linha_desligada'] = [r['linha_desligada'] for r in resultados_impacto]
+    chaves = ['execution_timestamp', 'linha_desligada']
+    grupos = impactos.groupby(chaves, sort=False)
+    # As três estatísticas têm as mesmas linhas e colunas: o formato longo de cada uma fica alinhado
+    longos = [largo.reset_index().melt(id_vars=chaves, var_name='barra', value_name=nome)
+              for nome, largo in (('n_cenarios', grupos.count()), ('soma_impacto', grupos.sum()), ('max_impacto', grupos.max()))]
+    agregado = longos[0].assign(soma_impacto=longos[1]['soma_impacto'].to_numpy(), max_impacto=longos[2]['max_impacto'].to_numpy())
+    agregado = agregado[agregado['n_cenarios'] > 0]
+    agregado['barra'] = agregado['barra'].astype(int)
+    return agregado[colunas]
+
+def atualizar_agregado_impacto(resultados_impacto, conexao, table_name='impacto_agregado_linha_barra'):
+    """
+    Soma as linhas de impacto recém-gravadas ao agregado linha x barra (média e máximo de
+    |ΔV| por execução), na mesma transação da gravação: o agregado acompanha a tabela de
+    impacto lote a lote, sem reler as linhas de tensão. Os pares (execução, linha, barra)
+    novos são inseridos e os existentes acumulam contagem, soma e máximo.
+    """
+    agregado = agregar_impacto(resultados_impacto)
+    if agregado.empty:
+        return
+    maior = 'GREATEST' if conexao.dialect.name == 'postgresql' else 'MAX' # MAX(a, b) escalar no SQLite
+    conexao.execute(text(f"""
+        INSERT INTO {table_name} (execution_timestamp, linha_desligada, barra, n_cenarios, soma_impacto, max_impacto)
+        VALUES (:execution_timestamp, :linha_desligada, :barra, :n_cenarios, :soma_impacto, :max_impacto)
+        ON CONFLICT (execution_timestamp, linha_desligada, barra) DO UPDATE SET
+            n_cenarios = {table_name}.n_cenarios + excluded.n_cenarios,
+            soma_impacto = {table_name}.soma_impacto + excluded.soma_impacto,
+            max_impacto = {maior}({table_name}.max_impacto, excluded.max_impacto);"""),
+        [{**registro, 'execution_timestamp': _instante_banco(registro['execution_timestamp'], conexao.dialect.name),
+          'linha_desligada': int(registro['linha_desligada']), 'barra': int(registro['barra']),
+          'n_cenarios': int(registro['n_cenarios'])} for registro in agregado.to_dict('records')])
+
+def salvar_impacto_postgres(resultados_impacto, table_name_output='impacto_tensao_barras', conexao=None):
+    """
+    Grava as linhas de impacto (cenario, linha_desligada, impacto_por_barra, execution_timestamp
+    e, se houver, tensao_id) na tabela de saída e as soma ao agregado linha x barra
+    (atualizar_agregado_impacto). Com `conexao`, grava dentro da transação de quem chamou
+    e deixa os erros propagarem (para a transação ser desfeita).
+    """
+    import pandas as pd
+    if not resultados_impacto:
+        print(f"Nenhuma contingência não crítica para gravar na tabela '{table_name_output}'.")
+        return
+    df_impacto = pd.DataFrame(resultados_impacto)
     
     # Conversão para JSON para a coluna 'impacto_por_barra'
     df_impacto['impacto_por_barra'] = df_impacto['impacto_por_barra'].apply(lambda x: json.dumps(x))
 
     # Reordenar colunas antes de salvar, se necessário, para corresponder ao DB
     # (cenario, linha_desligada, impacto_por_barra, created_at)
-    cols_order = ['cenario', 'linha_desligada', 'impacto_por_barra']
+    cols_order = ['cenario', 'linha_desligada', 'impacto_por_barra', 'execution_timestamp']
+    if 'tensao_id' in df_impacto.columns:
+        cols_order.append('tensao_id')
     df_impacto = df_impacto[cols_order]
 
+    if conexao is not None:
+        df_impacto.to_sql(table_name_output, conexao, if_exists='append', index=False)
+        atualizar_agregado_impacto(resultados_impacto, conexao)
+        return
+
     DB_URL = get_db_url()
     engine = create_engine(DB_URL)
 
     try:
-        df_impacto.to_sql(table_name_output, engine, if_exists='append', index=False)
+        with engine.begin() as connection:
+            df_impacto.to_sql(table_name_output, connection, if_exists='append', index=False)
+            atualizar_agregado_impacto(resultados_impacto, connection)
         print(f"\nAnálise de impacto concluída. Dados de impacto por barra salvos na tabela '{table_name_output}' do PostgreSQL.")
-        run_context = get_run_context()
+        run_context = _contexto_execucao()
         if run_context:
             create_markdown_artifact(
                 f"Relatório de Impacto de Tensão salvo no PostgreSQL na tabela: `{table_name_output}`",
@@ -434,40 +1028,239 @@ def analisar_impacto_tensao_postgres(table_name_input='tensao_barras_nao_critico
     except Exception as e:
         print(f"Erro ao salvar dados de impacto no PostgreSQL: {e}")
 
+@task
+def analisar_impacto_armazenamento(diretorio, table_name_output='impacto_tensao_barras'):
+    """
+    Análise de impacto a partir do armazenamento em memmap gravado pela simulação
+    (parâmetro `armazenamento_dir`): lê um cenário por vez, sem passar pela tabela
+    de tensões do PostgreSQL. As linhas de impacto de uma análise anterior do mesmo
+    armazenamento (mesmo execution_timestamp) são substituídas, não duplicadas.
+    As linhas de cada cenário são gravadas assim que calculadas, na mesma transação.
+    """
+    from src.flows.armazenamento_tensoes import ArmazenamentoTensoes
+
+    print(f"Iniciando análise de impacto de tensão a partir do armazenamento em '{diretorio}'...")
+    armazenamento = ArmazenamentoTensoes.abrir(diretorio)
+    barras = [str(i) for i in armazenamento.indices_barras]
+    execution_timestamp = armazenamento.execution_timestamp or datetime.now(timezone('America/Sao_Paulo'))
+
+    engine = create_engine(get_db_url())
+    n_linhas = 0
+    try:
+        with engine.begin() as connection:
+            instante = _instante_banco(execution_timestamp, connection.dialect.name)
+            connection.execute(text(f"DELETE FROM {table_name_output} WHERE execution_timestamp = :ts AND tensao_id IS NULL;"),
+                               {'ts': instante})
+            connection.execute(text("DELETE FROM impacto_agregado_linha_barra WHERE execution_timestamp = :ts;"),
+                               {'ts': instante})
+            # Gravação cenário a cenário: a memória não cresce com o número de cenários
+            for cenario_id in range(armazenamento.n_cenarios):
+                posicoes, diferencas = armazenamento.impacto(cenario_id)
+                resultados_impacto = [{
+                    'cenario': cenario_id,
+                    'linha_desligada': armazenamento.linhas[pos],
+                    'impacto_por_barra': dict(zip(barras, diferencas_linha)),
+                    'execution_timestamp': execution_timestamp,
+                } for pos, diferencas_linha in zip(posicoes, diferencas.astype(float))]
+                if resultados_impacto:
+                    salvar_impacto_postgres(resultados_impacto, table_name_output, conexao=connection)
+                n_linhas += len(resultados_impacto)
+        print(f"\nAnálise de impacto concluída. {n_linhas} linhas de impacto salvas na tabela '{table_name_output}'.")
+    except Exception as e:
+        print(f"Erro ao salvar dados de impacto no PostgreSQL: {e}")
+
+@task
+def reconstruir_agregado_impacto(table_name_input='impacto_tensao_barras', table_name_output='impacto_agregado_linha_barra',
+                                 tamanho_lote=TAMANHO_LOTE_IMPACTO):
+    """
+    Refaz o agregado linha x barra a partir de todas as linhas de impacto (ex.: impactos
+    gravados antes da criação do agregado), lendo `tamanho_lote` linhas por vez, em uma
+    única transação. Retorna o número de linhas de impacto agregadas.
+    """
+    engine = create_engine(get_db_url())
+    agregadas = 0
+    ultimo_id = 0
+    with engine.begin() as connection:
+        connection.execute(text(f"DELETE FROM {table_name_output};"))
+        while True:
+            linhas = connection.execute(text(f"SELECT id, linha_desligada, impacto_por_barra, execution_timestamp "
+                                             f"FROM {table_name_input} WHERE id > :ultimo ORDER BY id LIMIT :lote;"),
+                                        {'ultimo': ultimo_id, 'lote': int(tamanho_lote)}).mappings().all()
+            if not linhas:
+                break
+            atualizar_agregado_impacto([{
+                'linha_desligada': linha['linha_desligada'],
+                'impacto_por_barra': json.loads(linha['impacto_por_barra']) if isinstance(linha['impacto_por_barra'], str)
+                                     else linha['impacto_por_barra'],
+                'execution_timestamp': linha['execution_timestamp'],
+            } for linha in linhas], connection, table_name_output)
+            ultimo_id = linhas[-1]['id']
+            agregadas += len(linhas)
+    print(f"Agregado linha x barra refeito na tabela '{table_name_output}' a partir de {agregadas} linhas de impacto.")
+    return agregadas
+
 ## FLOW 1: Simulação de Contingências
 
 @flow(name="simulacao-contingencia-flow")
-def simulacao_contingencia_flow(n_cenarios: int = 1, vmax: float = 1.093, vmin: float = 0.94, line_loading_max: float = 120):
+def simulacao_contingencia_flow(n_cenarios: int = 1, vmax: float = 1.093, vmin: float = 0.94, line_loading_max: float = 120,
+                                usar_cache_rede: bool = True, caso: str = 'case30', solver: str = 'pandapower',
+                                extracao_leve: bool = False, profile: Optional[str] = None,
+                                nivel_log: str = NIVEL_LOG_PADRAO, max_detalhes_por_cenario: int = MAX_DETALHES_POR_CENARIO,
+                                diretorio_parquet: Optional[str] = None,
+                                armazenamento_dir: Optional[str] = None, ordem_contingencia: int = 1,
+                                max_combinacoes: Optional[int] = None, orcamento_severidade: Optional[int] = None,
+                                amostragem_adaptativa: bool = False, semiamplitude_ic: float = 0.02,
+                                max_cenarios: int = 1000, inclinacao_carga: float = 0.0, memoizacao: bool = True,
+                                tamanho_cache_estados: int = TAMANHO_CACHE_ESTADOS,
+                                quantizacao_injecoes: float = QUANTIZACAO_INJECOES,
+                                lote_analise_impacto: Optional[int] = None, sensibilidades: bool = True,
+                                tipos_contingencia: Optional[List[str]] = None, primeiro_cenario: int = 0,
+                                execution_timestamp: Optional[datetime] = None, gravar_resultados_banco: bool = True):
     """
-    FLOW: Orquestra a simulação de contingências N-1 na rede IEEE 30 barras,
-    salvando os resultados e os dados de tensão para posterior análise de impacto no PostgreSQL.
+    FLOW: Orquestra a simulação de contingências N-1 na rede indicada por `caso`
+    (IEEE 30 barras por padrão; ver src/flows/redes.py), salvando os resultados
+    e os dados de tensão para posterior análise de impacto no PostgreSQL.
+
+    `solver` define como os cenários e as contingências são resolvidos: 'pandapower'
+    (pp.runpp completo para cada cenário e desligamento) ou 'incremental' (cenários
+    resolvidos em lote por fluxo_potencia_lote e desligamentos por SolverContingencias,
+    que reaproveita a Ybus e a fatoração simbólica do cenário).
+
+    Com `extracao_leve`, o laço de contingências não monta as tabelas de resultados
+    do pandapower: tensões e carregamentos vão direto dos vetores do solver para
+    buffers NumPy pré-alocados (ver src/flows/extracao_resultados.py).
+
+    O tempo de cada etapa e os contadores (fluxos de potência, iterações, status das
+    contingências) são registrados por cenário (src/flows/instrumentacao.py) e salvos
+    na tabela 'metricas_execucao' e em um artefato do Prefect.
+
+    `profile` ('cprofile' ou 'amostragem') perfila a execução inteira e grava o
+    perfil em disco e na tabela 'perfis_execucao' (ver src/flows/perfilamento.py).
+
+    O log segue `nivel_log`: com INFO (padrão) é emitido um resumo por cenário; com
+    DEBUG também os eventos de cada contingência, limitados a `max_detalhes_por_cenario`
+    mensagens por cenário. A descrição de cada evento crítico fica sempre na coluna
+    'detalhe' de resultados_simulacao (ver src/flows/registro.py).
+
+    Com `diretorio_parquet` (ou a variável RESULTADOS_PARQUET_DIR), os resultados também
+    são exportados em Parquet particionado por execução e cenário (src/flows/exportacao_parquet.py).
+
+    Com `armazenamento_dir`, as tensões antes/depois de cada contingência são gravadas
+    em arquivos float32 mapeados em memória (src/flows/armazenamento_tensoes.py), junto
+    com a máscara de status. O fluxo pós-contingência escreve direto nesses arquivos e
+    as linhas de tensão enviadas ao banco/Parquet são visões sobre eles, em vez de um
+    dicionário por contingência. analise_impacto_flow(armazenamento_dir=...) lê o mesmo diretório.
+
+    Com `ordem_contingencia` = k > 1, depois das contingências N-1 cada cenário também
+    simula desligamentos simultâneos de 2 até k linhas (src/flows/contingencias_multiplas.py).
+    Combinações que contêm um conjunto de linhas que ilha a rede (índice topológico
+    calculado uma vez) são descartadas, as demais são resolvidas em ordem decrescente de
+    severidade estimada por fatores de distribuição lineares, no máximo `max_combinacoes`
+    por ordem, e o cenário para ao encontrar `orcamento_severidade` contingências múltiplas
+    críticas. Elas vão para resultados_simulacao com as linhas em 'linhas_desligadas'
+    (ex.: '3,17') e 'linha_desligada' nula; as tensões das não críticas não são gravadas para a análise de impacto.
+
+    Com `amostragem_adaptativa`, `n_cenarios` passa a ser o tamanho de cada lote: novos
+    lotes são simulados até que o intervalo de confiança de 95% da probabilidade de
+    criticidade N-1 de cada linha tenha semiamplitude de no máximo `semiamplitude_ic`,
+    ou até `max_cenarios` (src/flows/amostragem_adaptativa.py). As probabilidades e o
+    número de cenários necessários vão para a tabela 'probabilidade_criticidade'.
+    `inclinacao_carga` > 0 sorteia as cargas com mais peso nos níveis altos (amostragem
+    por importância); as probabilidades são corrigidas pelos pesos, mas as contagens
+    brutas de resultados_simulacao ficam enviesadas para os cenários carregados. Como o
+    peso é o produto sobre todas as cargas, use valores pequenos (ex.: 0.5) em redes grandes.
+
+    Com `memoizacao` (padrão), ilhamento e número de componentes de cada contingência
+    são calculados uma única vez na execução (dependem só da topologia) e o resultado do
+    fluxo pós-contingência é reaproveitado quando as injeções do cenário, arredondadas
+    para múltiplos de `quantizacao_injecoes`, repetem um estado já resolvido (cache LRU
+    de `tamanho_cache_estados` entradas; ver src/flows/memoizacao.py). As taxas de acerto
+    vão para o log e para metricas_execucao.
+
+    Com `lote_analise_impacto`, os cenários são processados em lotes desse tamanho (na
+    amostragem adaptativa, nos próprios lotes da amostragem) e, ao fim de cada lote, as
+    tensões são gravadas e a análise de impacto incremental (analisar_impacto_tensao_postgres)
+    processa as linhas novas, acompanhando a simulação em vez de rodar só depois dela.
+
+    Com `sensibilidades` (padrão), o Jacobiano convergido de cada cenário (antes das
+    contingências) é invertido para obter as matrizes de sensibilidade dV/dP e dV/dQ,
+    gravadas na tabela 'sensibilidade_tensao'. Com elas, consultar_variacao_tensao e o
+    painel do Dash estimam a variação das tensões para uma variação de injeção em uma
+    barra com um produto matriz-vetor, sem novo fluxo de potência
+    (src/flows/sensibilidade_tensao.py). Redes com mais de MAX_BARRAS_SENSIBILIDADE
+    barras não gravam as sensibilidades.
+
+    `tipos_contingencia` (padrão ['line']) escolhe as tabelas do pandapower cujos elementos
+    são desligados nas contingências simples: 'line', 'trafo', 'gen' (exceto o slack) e
+    'shunt'. Todos entram em uma única lista de contingências (listar_contingencias), com o
+    mesmo teste de ilhamento memoizado, a mesma classificação vetorizada e os mesmos buffers
+    e armazenamento; no solver incremental o transformador sai da Ybus como uma linha, o
+    shunt sai da diagonal e o gerador sai das injeções (sua barra passa a PQ se ficar sem
+    gerador). Em resultados_simulacao, 'tipo_elemento' e 'elemento_desligado' identificam o
+    elemento ('linha_desligada' fica nula fora das linhas). Só as contingências de linha
+    alimentam a análise de impacto e as contingências múltiplas.
+
+    `primeiro_cenario` e `execution_timestamp` permitem dividir uma execução entre
+    processos: cada um simula os cenários primeiro_cenario ... primeiro_cenario + n_cenarios - 1
+    com o mesmo execution_timestamp (a identificação da execução nas tabelas e no Parquet).
+    Com `gravar_resultados_banco` = False, resultados e tensões não vão para o banco, só
+    para `diretorio_parquet` / `armazenamento_dir` (ver src/flows/execucao_local.py).
     """
-    print(f"Iniciando simulação com {n_cenarios} cenários para IEEE 30 barras...")
-    print(f"DEBUG: Prefect API URL: {os.getenv('PREFECT_API_URL')}")
-    print(f"DEBUG: DB_HOST env var for flow: {os.getenv('DB_HOST', 'fallback_flow')}")
-
-    # Garante que as tabelas existem antes de começar a inserir dados
-    criar_tabelas_postgres()
+    parametros = {nome: valor for nome, valor in locals().items() if nome != 'profile'}
+    if profile:
+        return _executar_perfilado(profile, 'simulacao_contingencia', simulacao_contingencia_flow.fn, **parametros)
+
+    # Lida na execução (não na importação): vale a variável do ambiente em que o flow roda
+    diretorio_parquet = diretorio_parquet or os.getenv('RESULTADOS_PARQUET_DIR')
+    if solver not in ('pandapower', 'incremental'):
+        raise ValueError(f"Solver '{solver}' desconhecido. Use 'pandapower' ou 'incremental'.")
+    if ordem_contingencia < 1:
+        raise ValueError(f"ordem_contingencia deve ser pelo menos 1 (recebido {ordem_contingencia}).")
+    if lote_analise_impacto is not None and lote_analise_impacto < 1:
+        raise ValueError(f"lote_analise_impacto deve ser pelo menos 1 (recebido {lote_analise_impacto}).")
+    if primeiro_cenario and amostragem_adaptativa:
+        raise ValueError("A amostragem adaptativa numera os próprios cenários: não use primeiro_cenario com ela.")
+    if not gravar_resultados_banco and (lote_analise_impacto or not (diretorio_parquet or armazenamento_dir)):
+        raise ValueError("Sem gravar_resultados_banco, informe diretorio_parquet ou armazenamento_dir "
+                         "(e não use lote_analise_impacto, que lê as tensões do banco).")
+
+    import networkx as nx
+    from pandapower.topology import create_nxgraph
+    from src.flows.solver_contingencia import SolverContingencias, listar_contingencias
+    from src.flows.fluxo_lote import montar_matriz_cenarios, preparar_injecoes, fluxo_potencia_lote
+    from src.flows.extracao_resultados import criar_buffers_resultados, limpar_buffers_resultados, rodar_fluxo_potencia_leve
+
+    registro = RegistroSimulacao(nivel_log, max_detalhes_por_cenario)
+    if amostragem_adaptativa:
+        registro.info(f"Iniciando simulação adaptativa (lotes de {n_cenarios} cenários, até {max_cenarios}) para a rede {caso}...")
+    else:
+        registro.info(f"Iniciando simulação com {n_cenarios} cenários para a rede {caso}...")
+    registro.debug(f"Prefect API URL: {os.getenv('PREFECT_API_URL')}")
+    registro.debug(f"DB_HOST env var for flow: {os.getenv('DB_HOST', 'fallback_flow')}")
 
     tz = timezone('America/Sao_Paulo') # Ou 'UTC' se preferir tudo em UTC
-    current_flow_execution_time = datetime.now(tz)
-    print(f"DEBUG: Timestamp da execução do Flow: {current_flow_execution_time}")
+    current_flow_execution_time = execution_timestamp or datetime.now(tz)
+    registro.debug(f"Timestamp da execução do Flow: {current_flow_execution_time}")
+    instrumentacao = Instrumentacao()
 
-    # 1. Carrega a rede base
-    net_base = criar_rede_ieee30_slack_bar()
+    # 1. Carrega a rede base e 2. roda o fluxo de potência inicial (ou lê ambos do cache)
+    with instrumentacao.etapa('preparacao_rede_base'):
+        net_base_result, convergencia_base = preparar_rede_base(caso=caso, usar_cache=usar_cache_rede)
+    indices_barras = list(net_base_result.bus.index)
 
-    # 2. Roda o fluxo de potência inicial da rede base
-    net_base_result, convergencia_base = rodar_fluxo_potencia(net_base)
+    # Garante que as tabelas (e as colunas de tensão de cada barra) existem antes de começar a inserir dados
+    with instrumentacao.etapa('escrita_banco'):
+        criar_tabelas_postgres(indices_barras=indices_barras)
 
     if convergencia_base:
-        print("Rede base carregada:")
-        print(f" - Tensão mínima: {net_base_result.res_bus.vm_pu.min():.4f} pu")
-        print(f" - Tensão máxima: {net_base_result.res_bus.vm_pu.max():.4f} pu")
+        mensagem = (f"Rede base carregada ({len(indices_barras)} barras, {len(net_base_result.line)} linhas): "
+                    f"tensão mínima {net_base_result.res_bus.vm_pu.min():.4f} pu, "
+                    f"tensão máxima {net_base_result.res_bus.vm_pu.max():.4f} pu")
         if not net_base_result.res_line.empty:
-            print(f" - Carregamento máximo de linha: {net_base_result.res_line.loading_percent.max():.2f} %")
-        print("------")
+            mensagem += f", carregamento máximo de linha {net_base_result.res_line.loading_percent.max():.2f} %"
+        registro.info(mensagem)
     else:
-        print("A rede base não convergiu. A simulação não pode continuar.")
+        registro.error("A rede base não convergiu. A simulação não pode continuar.")
         return # Encerra o flow se a base não convergir
 
     resultados_globais = []
@@ -475,113 +1268,449 @@ def simulacao_contingencia_flow(n_cenarios: int = 1, vmax: float = 1.093, vmin:
     tensao_cenarios_nao_criticos_para_db = []
 
     linhas_para_testar = list(net_base_result.line.index)
-
-    for cenario_id in range(n_cenarios):
-        print(f"\nSimulando Cenário {cenario_id}...")
-        dados_cenario = gerar_dados_cenario(net_base_result, cenario_id)
-
-        # 3. Aplica dados de cenário a uma cópia da rede base
-        net_cenario_inicial = aplicar_dados_ao_net(net_base_result, dados_cenario)
-
-        # 4. Roda o fluxo de potência para o cenário ANTES de qualquer contingência
-        net_cenario_result, convergencia_inicial = rodar_fluxo_potencia(net_cenario_inicial)
-
-        if not convergencia_inicial:
-            print(f"Cenário {cenario_id}: Fluxo de potência inicial NÃO convergiu, ignorando contingências para este cenário.")
-            resultados_globais.append({
-                'cenario': cenario_id,
-                'linha_desligada': 'N/A',
-                'status': 'cenário inicial não convergiu',
-                'ilhamento': False,
-                'num_componentes_conectados': None,
-                'convergencia': False
-            })
-            continue
-
-        tensao_antes_contingencia = net_cenario_result.res_bus.vm_pu.to_dict()
-
-        linhas_criticas_cenario_resumo = []
-
-        for linha in linhas_para_testar:
-            # 5. Simula desligamento e verifica ilhamento
-            net_pos_desligamento, ilhamento_detectado = simular_desligamento_e_verificar_ilhamento(net_cenario_result, linha)
-
-            tensao_apos_contingencia = {bus: np.nan for bus in net_pos_desligamento.bus.index}
-            convergencia_pos_contingencia = False
-            status_contingencia = 'normal' # Default para 'normal'
-
-            if ilhamento_detectado:
-                print(f"Cenário {cenario_id}, linha {linha}: ⚠️ Ilhamento detectado")
-                linhas_criticas_cenario_resumo.append(linha)
-                status_contingencia = 'ilhamento'
+    # Contingências simples (tipo, elemento): as linhas primeiro, depois os demais tipos pedidos
+    contingencias = listar_contingencias(net_base_result, tipos_contingencia or ['line'])
+    if len(contingencias) > len(linhas_para_testar):
+        contagem_tipos = {}
+        for tipo, _ in contingencias:
+            contagem_tipos[tipo] = contagem_tipos.get(tipo, 0) + 1
+        registro.info(f"Contingências simples: {len(contingencias)} elementos "
+                      f"({', '.join(f'{tipo}: {n}' for tipo, n in contagem_tipos.items())})")
+    # Geradores e shunts não alteram a topologia: nunca ilham e mantêm os componentes da rede base
+    componentes_rede_base = nx.number_connected_components(create_nxgraph(net_base_result, respect_switches=True))
+    inicio_contingencias = time.perf_counter()
+
+    # Tensões, carregamentos e convergência de cada contingência do cenário (uma linha por contingência),
+    # alocados uma única vez e reaproveitados em todos os cenários. A classificação lê as matrizes inteiras;
+    # com extracao_leve o fluxo pós-contingência grava direto nelas
+    buffers = criar_buffers_resultados(len(contingencias), len(indices_barras), len(net_base_result.line))
+
+    armazenamento = None
+    if armazenamento_dir:
+        from src.flows.armazenamento_tensoes import ArmazenamentoTensoes
+        # Uma linha por id de cenário (ids abaixo de primeiro_cenario ficam como não simulados)
+        n_cenarios_armazenamento = max_cenarios if amostragem_adaptativa else primeiro_cenario + n_cenarios
+        armazenamento = ArmazenamentoTensoes(armazenamento_dir, n_cenarios_armazenamento,
+                                             [elemento for _, elemento in contingencias], indices_barras,
+                                             execution_timestamp=current_flow_execution_time,
+                                             tipos=[tipo for tipo, _ in contingencias])
+
+    if ordem_contingencia > 1:
+        from src.flows.contingencias_multiplas import IndiceIlhamento, SensibilidadeLinear, enumerar_contingencias
+        with instrumentacao.etapa('indice_ilhamento'):
+            indice_ilhamento = IndiceIlhamento(net_base_result)
+            sensibilidade = SensibilidadeLinear(net_base_result)
+        registro.info(f"Contingências até N-{ordem_contingencia}: {len(indice_ilhamento.minimos)} conjuntos mínimos "
+                      f"de ilhamento com até 2 linhas no índice topológico")
+        vm_multiplas = np.empty(len(indices_barras))
+        loading_multiplas = np.empty(len(net_base_result.line))
+
+    memo = MemoContingencias(tamanho_cache_estados, quantizacao_injecoes) if memoizacao else None
+
+    sensibilidades_cenarios = {}
+    if sensibilidades:
+        from src.flows.sensibilidade_tensao import SensibilidadeTensao, MAX_BARRAS_SENSIBILIDADE
+        if len(indices_barras) > MAX_BARRAS_SENSIBILIDADE:
+            registro.warning(f"Rede com {len(indices_barras)} barras (limite {MAX_BARRAS_SENSIBILIDADE}): "
+                             f"as sensibilidades de tensão não serão calculadas.")
+            sensibilidades = False
+
+    # Cenários em lotes: um único lote com n_cenarios ou, na amostragem adaptativa,
+    # lotes de n_cenarios até as probabilidades de criticidade convergirem
+    amostragem = None
+    fim_cenarios = primeiro_cenario + n_cenarios
+    lotes_cenarios = [range(primeiro_cenario, fim_cenarios)]
+    if lote_analise_impacto:
+        lotes_cenarios = [range(inicio, min(inicio + lote_analise_impacto, fim_cenarios))
+                          for inicio in range(primeiro_cenario, fim_cenarios, lote_analise_impacto)]
+    tensoes_gravadas = 0 # Linhas de tensao_cenarios_nao_criticos_para_db já gravadas no banco
+    if amostragem_adaptativa:
+        from src.flows.amostragem_adaptativa import AmostragemAdaptativa
+        amostragem = AmostragemAdaptativa(linhas_para_testar, semiamplitude=semiamplitude_ic, tamanho_lote=n_cenarios,
+                                          max_cenarios=max_cenarios)
+        lotes_cenarios = amostragem.lotes()
+
+    if solver == 'incremental':
+        solver_base = SolverContingencias(net_base_result)
+
+        def resolver_cenario_pandapower(cenario_id):
+            with instrumentacao.etapa('copia_rede', cenario_id):
+                net_cenario = aplicar_dados_ao_net(net_base_result, dados_por_cenario[cenario_id])
+            with instrumentacao.etapa('fluxo_cenario', cenario_id):
+                net_cenario, convergencia = rodar_fluxo_potencia(net_cenario)
+            instrumentacao.registrar_fluxo('runpp_cenario', convergencia, iteracoes_fluxo(net_cenario), cenario_id)
+            redes_fallback[cenario_id] = net_cenario
+            return net_cenario.res_bus.vm_pu, convergencia
+
+    for cenarios_lote in lotes_cenarios:
+        if solver == 'incremental':
+            # Os cenários (de cada lote) compartilham a topologia: todos são gerados antes e
+            # resolvidos juntos (Newton-Raphson vetorizado). Os que não convergirem são refeitos
+            # individualmente com o pandapower.
+            dados_por_cenario = {}
+            for cenario_id in cenarios_lote:
+                with instrumentacao.etapa('geracao_cenarios', cenario_id):
+                    dados_por_cenario[cenario_id] = gerar_dados_cenario(net_base_result, cenario_id, inclinacao_carga)
+            matriz_cenarios = montar_matriz_cenarios(dados_por_cenario.values())
+            redes_fallback = {}
+
+            with instrumentacao.etapa('fluxo_cenarios_lote'):
+                vm_cenarios, convergencia_cenarios, V_cenarios = fluxo_potencia_lote(
+                    net_base_result, matriz_cenarios, solver=solver_base, fallback=resolver_cenario_pandapower
+                )
+            instrumentacao.contar('fluxo_lote_cenarios', len(matriz_cenarios))
+            instrumentacao.contar('fluxo_lote_fallbacks', len(redes_fallback))
+
+        for cenario_id in cenarios_lote:
+            registro.debug(f"Simulando Cenário {cenario_id}...")
+            if solver == 'incremental':
+                dados_cenario = dados_por_cenario[cenario_id]
+                peso_cenario = dados_cenario.get('peso_amostragem', 1.0)
+                convergencia_inicial = bool(convergencia_cenarios.loc[cenario_id])
+                net_cenario_result = redes_fallback.get(cenario_id, net_base_result) # Topologia para o teste de ilhamento
             else:
-                # 6. Roda o fluxo de potência pós-contingência
-                net_final_contingencia, convergencia_pos = rodar_fluxo_potencia(net_pos_desligamento)
-                convergencia_pos_contingencia = convergencia_pos
-
-                if convergencia_pos_contingencia:
-                    # 7. Verifica criticidade (tensão e carregamento)
-                    vm_min = float(net_final_contingencia.res_bus.vm_pu.min())
-                    vm_max = float(net_final_contingencia.res_bus.vm_pu.max())
-                    loading_max = float(net_final_contingencia.res_line.loading_percent.max())
-
-                    if vm_min < vmin:
-                        print(f"Cenário {cenario_id}, linha {linha}: ⚠️ Tensão mínima ({vm_min:.4f} pu) abaixo do limite ({vmin:.4f} pu)")
-                        status_contingencia = 'crítica'
-                    elif vm_max > vmax:
-                        print(f"Cenário {cenario_id}, linha {linha}: ⚠️ Tensão máxima ({vm_max:.4f} pu) acima do limite ({vmax:.4f} pu)")
-                        status_contingencia = 'crítica'
-                    elif loading_max > line_loading_max:
-                        print(f"Cenário {cenario_id}, linha {linha}: ⚠️ Carregamento de linha ({loading_max:.2f} %) excedido ({line_loading_max:.2f} %)")
-                        status_contingencia = 'crítica'
-                    
+                with instrumentacao.etapa('geracao_cenarios', cenario_id):
+                    dados_cenario = gerar_dados_cenario(net_base_result, cenario_id, inclinacao_carga)
+                peso_cenario = dados_cenario.get('peso_amostragem', 1.0)
+
+                # 3. Aplica dados de cenário a uma cópia da rede base
+                with instrumentacao.etapa('copia_rede', cenario_id):
+                    net_cenario_inicial = aplicar_dados_ao_net(net_base_result, dados_cenario)
+
+                # 4. Roda o fluxo de potência para o cenário ANTES de qualquer contingência
+                with instrumentacao.etapa('fluxo_cenario', cenario_id):
+                    net_cenario_result, convergencia_inicial = rodar_fluxo_potencia(net_cenario_inicial)
+                instrumentacao.registrar_fluxo('runpp_cenario', convergencia_inicial, iteracoes_fluxo(net_cenario_result), cenario_id)
+
+            if not convergencia_inicial:
+                detalhe = "Fluxo de potência inicial não convergiu, contingências ignoradas"
+                registro.warning(f"Cenário {cenario_id}: {detalhe}.")
+                resultados_globais.append({
+                    'cenario': cenario_id,
+                    'linha_desligada': 'N/A',
+                    'status': 'cenário inicial não convergiu',
+                    'ilhamento': False,
+                    'num_componentes_conectados': None,
+                    'convergencia': False,
+                    'detalhe': detalhe
+                })
+                if amostragem is not None:
+                    amostragem.registrar(cenario_id, linhas_para_testar, peso_cenario) # Cenário inseguro: todas as linhas contam como críticas
+                continue
+
+            if solver == 'incremental':
+                tensao_antes_contingencia = vm_cenarios.loc[cenario_id].to_dict()
+                if cenario_id in redes_fallback:
+                    solver_cenario = SolverContingencias(redes_fallback[cenario_id])
+                else:
+                    _, dados_ybus, _ = preparar_injecoes(solver_base, net_base_result, matriz_cenarios.loc[[cenario_id]])
+                    solver_cenario = solver_base.para_cenario(V_cenarios[matriz_cenarios.index.get_loc(cenario_id)], dados_ybus[0],
+                                                              injecoes=dados_cenario)
+            else:
+                tensao_antes_contingencia = net_cenario_result.res_bus.vm_pu.to_dict()
+            if sensibilidades:
+                # Sensibilidades dV/dP e dV/dQ no ponto convergido do cenário, antes das contingências
+                with instrumentacao.etapa('sensibilidade', cenario_id):
+                    solver_sensibilidade = solver_cenario if solver == 'incremental' else SolverContingencias(net_cenario_result)
+                    sensibilidades_cenarios[cenario_id] = SensibilidadeTensao.do_solver(solver_sensibilidade)
+            if armazenamento is not None:
+                armazenamento.gravar_antes(cenario_id, [tensao_antes_contingencia[i] for i in indices_barras])
+                tensao_antes_contingencia = armazenamento.tensoes_antes(cenario_id)
+
+            linhas_criticas_cenario_resumo = []
+            contagem_status = {}
+            assinatura_cenario = memo.assinatura(dados_cenario) if memo is not None else None
+            limpar_buffers_resultados(buffers)
+            # Tensões pós-contingência do cenário (uma linha por contingência): com o armazenamento,
+            # direto no arquivo mapeado
+            vm_contingencias = armazenamento.depois[cenario_id] if armazenamento is not None else buffers['vm_pu']
+            ilhamento_contingencias = np.zeros(len(contingencias), dtype=bool)
+            num_componentes_contingencias = [None] * len(contingencias)
+
+            for pos_linha, (tipo, linha) in enumerate(contingencias):
+                # Chave da contingência na memoização: o índice, para as linhas, ou (tipo, índice)
+                chave = linha if tipo == 'line' else (tipo, linha)
+                # 5. Simula desligamento e verifica ilhamento (o resultado depende só da topologia)
+                if tipo in ('gen', 'shunt'):
+                    topologia = (False, componentes_rede_base)
+                else:
+                    topologia = memo.topologia([chave]) if memo is not None else None
+                estado = memo.estado(assinatura_cenario, [chave]) if memo is not None else None
+                if topologia is None or (estado is None and solver == 'pandapower'):
+                    net_pos_desligamento, ilhamento_detectado = simular_desligamento_e_verificar_ilhamento(
+                        net_cenario_result, linha, instrumentacao=instrumentacao, cenario=cenario_id,
+                        ilhamento_conhecido=topologia[0] if topologia is not None else None, tipo=tipo)
+                if topologia is None:
+                    with instrumentacao.etapa('ilhamento', cenario_id):
+                        num_componentes = len(list(nx.connected_components(create_nxgraph(net_pos_desligamento, respect_switches=True)))) if not ilhamento_detectado else None
+                    if memo is not None:
+                        memo.guardar_topologia([chave], ilhamento_detectado, num_componentes)
+                else:
+                    ilhamento_detectado, num_componentes = topologia
+                ilhamento_contingencias[pos_linha] = ilhamento_detectado
+                num_componentes_contingencias[pos_linha] = num_componentes
+                if ilhamento_detectado:
+                    continue
+
+                # 6. Roda o fluxo de potência pós-contingência (ou reaproveita o de um estado igual),
+                # gravando tensões e carregamentos nas matrizes do cenário
+                vm_pu_pos = vm_contingencias[pos_linha]
+                loading_percent_pos = buffers['loading_percent'][pos_linha]
+                if estado is not None:
+                    convergencia_pos, vm_pu_pos[:], loading_percent_pos[:] = estado
+                else:
+                    with instrumentacao.etapa('fluxo_contingencia', cenario_id):
+                        if extracao_leve:
+                            if solver == 'incremental':
+                                convergencia_pos = solver_cenario.resolver_desligamento_em(linha, vm_pu_pos, loading_percent_pos,
+                                                                                           tipo=tipo)
+                            else:
+                                convergencia_pos = rodar_fluxo_potencia_leve(net_pos_desligamento, net_cenario_result._options,
+                                                                             vm_pu_pos, loading_percent_pos)
+                        else:
+                            if solver == 'incremental':
+                                vm_resultado, loading_resultado, convergencia_pos = solver_cenario.resolver_desligamento(linha, tipo=tipo)
+                            else:
+                                net_final_contingencia, convergencia_pos = rodar_fluxo_potencia(net_pos_desligamento)
+                                vm_resultado = net_final_contingencia.res_bus.vm_pu
+                                loading_resultado = net_final_contingencia.res_line.loading_percent
+                            if convergencia_pos:
+                                vm_pu_pos[:] = np.asarray(vm_resultado, dtype=float)
+                                loading_percent_pos[:] = np.asarray(loading_resultado, dtype=float)
+                    iteracoes = solver_cenario.ultimas_iteracoes if solver == 'incremental' else iteracoes_fluxo(net_pos_desligamento)
+                    instrumentacao.registrar_fluxo('fluxo_contingencia', convergencia_pos, iteracoes, cenario_id)
+                    if memo is not None:
+                        memo.guardar_estado(assinatura_cenario, [chave], convergencia_pos, vm_pu_pos, loading_percent_pos)
+                buffers['convergencia'][pos_linha] = convergencia_pos
+
+            # 7. Verifica criticidade (tensão e carregamento) de todas as contingências do cenário de uma vez
+            with instrumentacao.etapa('classificacao', cenario_id):
+                classificacao = classificar_contingencias(vm_contingencias, buffers['loading_percent'], vmin, vmax,
+                                                          line_loading_max, barras=indices_barras, linhas=linhas_para_testar,
+                                                          validas=buffers['convergencia'])
+
+            for pos_linha, (tipo, linha) in enumerate(contingencias):
+                ilhamento_detectado = bool(ilhamento_contingencias[pos_linha])
+                convergencia_pos_contingencia = bool(buffers['convergencia'][pos_linha])
+                colunas_violacao = violacao(classificacao, pos_linha)
+                if ilhamento_detectado:
+                    status_contingencia, detalhe = 'ilhamento', "Ilhamento detectado"
+                elif not convergencia_pos_contingencia:
+                    status_contingencia, detalhe = 'crítica (não convergiu)', "Fluxo não convergiu"
+                elif classificacao['critica'][pos_linha]:
+                    status_contingencia = 'crítica'
+                    detalhe = detalhe_violacao(colunas_violacao['tipo_violacao'], colunas_violacao['valor_violacao'],
+                                               colunas_violacao['limite_violacao'])
+                elif tipo != 'line':
+                    status_contingencia, detalhe = 'normal', None # A análise de impacto é feita por linha desligada
+                else:
+                    status_contingencia, detalhe = 'normal', None
                     # Se não for crítica, coleta os dados de tensão para análise de impacto
-                    if status_contingencia == 'normal':
-                        tensao_apos_contingencia = net_final_contingencia.res_bus.vm_pu.to_dict()
-                        row_data = {
-                            'cenario': cenario_id,
-                            'linha_desligada': linha,
-                            'from_bus': net_base_result.line.at[linha, 'from_bus'],
-                            'to_bus': net_base_result.line.at[linha, 'to_bus'],
-                            'tensao_antes': tensao_antes_contingencia, # Passa o dicionário direto
-                            'tensao_depois': tensao_apos_contingencia # Passa o dicionário direto
-                        }
-                        tensao_cenarios_nao_criticos_para_db.append(row_data)
+                    if armazenamento is not None:
+                        tensao_apos_contingencia = armazenamento.tensoes_depois(cenario_id, pos_linha)
                     else:
-                        linhas_criticas_cenario_resumo.append(linha) # Adiciona a linha à lista de críticas se a contingência for crítica
-
-                else: # Não convergiu
-                    status_contingencia = 'crítica (não convergiu)'
-                    print(f"Cenário {cenario_id}, linha {linha}: ❌ Fluxo não convergiu")
-                    linhas_criticas_cenario_resumo.append(linha)
-
-            resultados_globais.append({
-                'cenario': cenario_id,
-                'linha_desligada': linha,
-                'status': status_contingencia,
-                'ilhamento': ilhamento_detectado,
-                'num_componentes_conectados': len(list(nx.connected_components(create_nxgraph(net_pos_desligamento, respect_switches=True)))) if not ilhamento_detectado else None,
-                'convergencia': convergencia_pos_contingencia
-            })
-
-        if linhas_criticas_cenario_resumo:
-            print(f"\n--- Resumo Cenário {cenario_id}: Linhas que causaram Criticidade/Ilhamento: {linhas_criticas_cenario_resumo} ---")
-        else:
-            print(f"\n--- Resumo Cenário {cenario_id}: Nenhuma criticidade ou ilhamento detectado. ---")
-
-    # 8. Salva os resultados globais no PostgreSQL
-    salvar_resultados_globais_postgres(resultados_globais, current_flow_execution_time)
-
-    # 9. Salva os dados de tensão para contingências NÃO CRÍTICAS no PostgreSQL
-    salvar_tensao_nao_criticos_postgres(tensao_cenarios_nao_criticos_para_db, current_flow_execution_time, num_barras=len(net_base_result.bus.index))
+                        tensao_apos_contingencia = dict(zip(indices_barras, vm_contingencias[pos_linha].tolist()))
+                    row_data = {
+                        'cenario': cenario_id,
+                        'linha_desligada': linha,
+                        'from_bus': net_base_result.line.at[linha, 'from_bus'],
+                        'to_bus': net_base_result.line.at[linha, 'to_bus'],
+                        'tensao_antes': tensao_antes_contingencia, # Passa o dicionário direto
+                        'tensao_depois': tensao_apos_contingencia # Passa o dicionário direto
+                    }
+                    tensao_cenarios_nao_criticos_para_db.append(row_data)
+
+                if status_contingencia != 'normal':
+                    # Os demais elementos entram no resumo como 'trafo 3', 'gen 1'... (a amostragem conta só as linhas)
+                    linhas_criticas_cenario_resumo.append(linha if tipo == 'line' else f"{tipo} {linha}")
+                    rotulo = f"linha {linha}" if tipo == 'line' else f"{tipo} {linha}"
+                    registro.detalhe(cenario_id, f"Cenário {cenario_id}, {rotulo}: {detalhe}")
+                instrumentacao.contar(f'status_{status_contingencia}', cenario=cenario_id)
+                contagem_status[status_contingencia] = contagem_status.get(status_contingencia, 0) + 1
+                if armazenamento is not None:
+                    armazenamento.marcar(cenario_id, pos_linha, status_contingencia)
+                resultados_globais.append({
+                    'cenario': cenario_id,
+                    'linha_desligada': linha if tipo == 'line' else None,
+                    'tipo_elemento': tipo,
+                    'elemento_desligado': linha,
+                    'status': status_contingencia,
+                    'ilhamento': ilhamento_detectado,
+                    'num_componentes_conectados': num_componentes_contingencias[pos_linha],
+                    'convergencia': convergencia_pos_contingencia,
+                    'detalhe': detalhe,
+                    **colunas_violacao
+                })
+
+            if ordem_contingencia > 1:
+                # 8. Contingências múltiplas (N-2 ... N-k), das mais severas para as menos severas
+                if solver == 'incremental':
+                    fluxos_mw = solver_cenario.fluxo_ativo_linhas_mw()
+                else:
+                    fluxos_mw = net_cenario_result.res_line.p_from_mw.reindex(net_cenario_result.line.index).fillna(0.0).values
+                    with instrumentacao.etapa('copia_rede', cenario_id):
+                        net_multiplas = copiar_rede(net_cenario_result)
+
+                estatisticas = {}
+                criticas_multiplas = 0
+                combinacoes = enumerar_contingencias(indice_ilhamento, sensibilidade, fluxos_mw, ordem_contingencia,
+                                                     max_combinacoes=max_combinacoes, estatisticas=estatisticas)
+                for linhas, severidade, ilhamento_detectado in combinacoes:
+                    if orcamento_severidade is not None and criticas_multiplas >= orcamento_severidade:
+                        instrumentacao.contar('nk_interrompido_orcamento', cenario=cenario_id)
+                        registro.debug(f"Cenário {cenario_id}: orçamento de {orcamento_severidade} contingências múltiplas críticas atingido.")
+                        break
+                    rotulo_linhas = ",".join(str(l) for l in linhas)
+                    convergencia_pos = False
+                    colunas_violacao = dict.fromkeys(COLUNAS_VIOLACAO)
+                    if ilhamento_detectado:
+                        status_contingencia, detalhe = 'ilhamento', "Ilhamento detectado (índice topológico)"
+                    else:
+                        estado = memo.estado(assinatura_cenario, linhas) if memo is not None else None
+                        if estado is not None:
+                            convergencia_pos, vm_multiplas[:], loading_multiplas[:] = estado
+                        else:
+                            with instrumentacao.etapa('fluxo_contingencia_multipla', cenario_id):
+                                if solver == 'incremental':
+                                    convergencia_pos = solver_cenario.resolver_desligamentos_em(linhas, vm_multiplas, loading_multiplas)
+                                    iteracoes = solver_cenario.ultimas_iteracoes
+                                else:
+                                    net_multiplas.line.loc[list(linhas), 'in_service'] = False
+                                    convergencia_pos = rodar_fluxo_potencia_leve(net_multiplas, net_cenario_result._options,
+                                                                                 vm_multiplas, loading_multiplas)
+                                    net_multiplas.line.loc[list(linhas), 'in_service'] = True
+                                    iteracoes = iteracoes_fluxo(net_multiplas)
+                            instrumentacao.registrar_fluxo('fluxo_contingencia_multipla', convergencia_pos, iteracoes, cenario_id)
+                            if memo is not None:
+                                memo.guardar_estado(assinatura_cenario, linhas, convergencia_pos, vm_multiplas, loading_multiplas)
+                        if convergencia_pos:
+                            # As combinações são resolvidas uma a uma (o orçamento pode interromper a enumeração)
+                            status_contingencia, detalhe, colunas_violacao = classificar_contingencia(
+                                vm_multiplas, loading_multiplas, vmin, vmax, line_loading_max,
+                                barras=indices_barras, linhas=linhas_para_testar)
+                        else:
+                            status_contingencia, detalhe = 'crítica (não convergiu)', "Fluxo não convergiu"
+
+                    if status_contingencia != 'normal':
+                        # O orçamento conta só as críticas encontradas com fluxo de potência (o ilhamento vem do índice)
+                        criticas_multiplas += not ilhamento_detectado
+                        if np.isfinite(severidade):
+                            detalhe += f" (carregamento estimado {severidade:.1f} %)"
+                        registro.detalhe(cenario_id, f"Cenário {cenario_id}, linhas {rotulo_linhas}: {detalhe}")
+                    chave_status = f"N-{len(linhas)} {status_contingencia}"
+                    instrumentacao.contar(f'status_n{len(linhas)}_{status_contingencia}', cenario=cenario_id)
+                    contagem_status[chave_status] = contagem_status.get(chave_status, 0) + 1
+                    resultados_globais.append({
+                        'cenario': cenario_id,
+                        # Nula: agrupar por linha_desligada não soma a N-k à N-1 da primeira linha
+                        'linha_desligada': None,
+                        'linhas_desligadas': rotulo_linhas,
+                        'tipo_elemento': 'line',
+                        'status': status_contingencia,
+                        'ilhamento': ilhamento_detectado,
+                        'num_componentes_conectados': None,
+                        'convergencia': convergencia_pos,
+                        'detalhe': detalhe,
+                        **colunas_violacao
+                    })
+                for nome, valor in estatisticas.items():
+                    instrumentacao.contar(f'nk_{nome}', valor, cenario=cenario_id)
+
+            registro.resumo_cenario(cenario_id, contagem_status, linhas_criticas_cenario_resumo)
+            if amostragem is not None:
+                amostragem.registrar(cenario_id, linhas_criticas_cenario_resumo, peso_cenario)
+
+        if lote_analise_impacto:
+            # Grava as tensões do lote e analisa o impacto em seguida, sem esperar o fim da simulação
+            with instrumentacao.etapa('escrita_banco'):
+                salvar_tensao_nao_criticos_postgres(tensao_cenarios_nao_criticos_para_db[tensoes_gravadas:],
+                                                    current_flow_execution_time, indices_barras=indices_barras)
+            tensoes_gravadas = len(tensao_cenarios_nao_criticos_para_db)
+            with instrumentacao.etapa('analise_impacto'):
+                analisar_impacto_tensao_postgres()
+            notificar_novos_dados('tensao_barras_nao_criticos', current_flow_execution_time)
+
+    if amostragem is not None:
+        resumo_amostragem = amostragem.resumo()
+        situacao = "convergiu" if resumo_amostragem['convergiu'] else f"limite de {max_cenarios} cenários atingido"
+        registro.info(f"Amostragem adaptativa: {resumo_amostragem['n_cenarios']} cenários necessários ({situacao}; "
+                      f"maior semiamplitude {resumo_amostragem['maior_semiamplitude']:.4f}, alvo {semiamplitude_ic:.4f})")
+        instrumentacao.contar('amostragem_cenarios', resumo_amostragem['n_cenarios'])
+
+    if memo is not None:
+        estatisticas_memo = memo.estatisticas()
+        for nome, valor in estatisticas_memo.items():
+            instrumentacao.contar(nome, valor)
+        registro.info(f"Memoização: topologia {estatisticas_memo['memo_topologia_taxa_acerto']:.1%} de acertos "
+                      f"({memo.topologias.acertos}/{memo.topologias.acertos + memo.topologias.falhas}), estados "
+                      f"{estatisticas_memo['memo_estados_taxa_acerto']:.1%} ({memo.estados.acertos}/"
+                      f"{memo.estados.acertos + memo.estados.falhas}, {memo.estados.descartes} descartados)")
+
+    duracao_contingencias = time.perf_counter() - inicio_contingencias
+    if armazenamento is not None:
+        armazenamento.flush()
+        registro.info(f"Tensões gravadas no armazenamento em memmap: {armazenamento_dir}")
+    n_contingencias = len([r for r in resultados_globais if r['linha_desligada'] != 'N/A'])
+    if duracao_contingencias > 0:
+        registro.info(f"Vazão: {n_contingencias / duracao_contingencias:.2f} contingências/s "
+              f"({n_contingencias} contingências, {len(indices_barras)} barras, {duracao_contingencias:.1f} s)")
+
+    if gravar_resultados_banco:
+        # 9. Salva os resultados globais no PostgreSQL
+        with instrumentacao.etapa('escrita_banco'):
+            salvar_resultados_globais_postgres(resultados_globais, current_flow_execution_time)
+
+        # 10. Salva os dados de tensão para contingências NÃO CRÍTICAS no PostgreSQL (as ainda não gravadas por lote)
+        with instrumentacao.etapa('escrita_banco'):
+            salvar_tensao_nao_criticos_postgres(tensao_cenarios_nao_criticos_para_db[tensoes_gravadas:], current_flow_execution_time,
+                                                indices_barras=indices_barras)
+    if diretorio_parquet:
+        with instrumentacao.etapa('exportacao_parquet'):
+            salvar_resultados_parquet(resultados_globais, tensao_cenarios_nao_criticos_para_db, current_flow_execution_time,
+                                      diretorio_parquet, indices_barras=indices_barras)
+    instrumentacao.contar('linhas_gravadas_resultados', len(resultados_globais))
+    instrumentacao.contar('linhas_gravadas_tensao', len(tensao_cenarios_nao_criticos_para_db))
+
+    if sensibilidades_cenarios:
+        with instrumentacao.etapa('escrita_banco'):
+            salvar_sensibilidades_postgres(sensibilidades_cenarios, current_flow_execution_time)
+
+    if amostragem is not None:
+        salvar_probabilidades_criticidade(amostragem, current_flow_execution_time)
+
+    # 11. Publica a instrumentação da execução (artefato e tabela de métricas)
+    salvar_metricas_postgres(instrumentacao, current_flow_execution_time)
+
+    # 12. Avisa o Dash de que há dados novos (depois de todas as gravações)
+    notificar_novos_dados('tensao_barras_nao_criticos', current_flow_execution_time)
 
 ## FLOW 2: Análise de Impacto (Separado)
 
 @flow(name="analise-impacto-ieee30", log_prints=True)
-def analise_impacto_flow(num_barras: int = 30):
+def analise_impacto_flow(num_barras: Optional[int] = None, profile: Optional[str] = None,
+                         armazenamento_dir: Optional[str] = None, reconstruir_agregado: bool = False):
     """
     FLOW: Orquestra a análise de impacto de tensão a partir do PostgreSQL.
+    Por padrão analisa todas as barras presentes na tabela de tensões.
+    `profile` ('cprofile' ou 'amostragem') perfila a análise, como em simulacao_contingencia_flow.
+    Com `armazenamento_dir`, as tensões são lidas do armazenamento em memmap gravado pela simulação.
+    A partir do PostgreSQL, só as linhas de tensão ainda não analisadas são processadas
+    (as ainda sem impacto_tensao_barras.tensao_id): rodar o flow de novo não duplica resultados.
+    O agregado linha x barra do mapa de calor do Dash é atualizado junto com cada lote; com
+    `reconstruir_agregado`, ele é refeito antes a partir de todos os impactos já gravados.
     """
+    if profile:
+        return _executar_perfilado(profile, 'analise_impacto', analise_impacto_flow.fn, num_barras=num_barras,
+                                   armazenamento_dir=armazenamento_dir, reconstruir_agregado=reconstruir_agregado)
+
+    if reconstruir_agregado:
+        reconstruir_agregado_impacto()
+
+    if armazenamento_dir:
+        analisar_impacto_armazenamento(armazenamento_dir)
+        print("Análise de impacto de tensão concluída.")
+        return
+
     print(f"Iniciando análise de impacto de tensão a partir do PostgreSQL...")
 
     # A task analisar_impacto_tensao_postgres é responsável por carregar os dados
@@ -591,26 +1720,249 @@ def analise_impacto_flow(num_barras: int = 30):
     print("Análise de impacto de tensão concluída.")
 
 
-## Execução Principal do Script
+## FLOW 3: Margem de Estabilidade de Tensão
 
+@flow(name="margem-estabilidade-flow")
+def margem_estabilidade_flow(caso: str = 'case30', vmin: float = 0.94, fator_maximo: float = FATOR_MAXIMO,
+                             tolerancia: float = TOLERANCIA_FATOR, n_processos: Optional[int] = None,
+                             usar_cache_rede: bool = True, nivel_log: str = NIVEL_LOG_PADRAO):
+    """
+    FLOW: Para a rede intacta e cada contingência N-1, busca o fator de carga (cargas e
+    despacho escalados juntos a partir do ponto de operação da rede base) em que alguma
+    tensão fica abaixo de `vmin` ou o fluxo deixa de convergir, com continuação e
+    bisseção até `tolerancia` (src/flows/margem_estabilidade.py). As contingências são
+    distribuídas em um pool de `n_processos` processos e o resultado, com o ranking da
+    menor para a maior margem, vai para a tabela 'margem_estabilidade'.
+
+    Como no solver 'incremental', as injeções são de potência constante e sem limites
+    de reativos dos geradores. Linhas que ilham a rede não têm margem (motivo 'ilhamento').
+    """
+    from src.flows.solver_contingencia import SolverContingencias
+    from src.flows.contingencias_multiplas import IndiceIlhamento
 
-n_cenarios_simulacao = 1
+    registro = RegistroSimulacao(nivel_log)
+    current_flow_execution_time = datetime.now(timezone('America/Sao_Paulo'))
+    instrumentacao = Instrumentacao()
 
-if __name__ == "__main__":
-    DB_URL = get_db_url() # Obtenha a URL dinamicamente para o teste local
-    engine = create_engine(DB_URL)
-    try:
-        with engine.connect() as conn:
-            print("✅ PostgreSQL connection successful!")
-    except Exception as e:
-        print(f"❌ PostgreSQL connection failed: {e}")
-    
-    n_cenarios_simulacao = 1
+    with instrumentacao.etapa('preparacao_rede_base'):
+        net_base_result, convergencia_base = preparar_rede_base(caso=caso, usar_cache=usar_cache_rede)
+    if not convergencia_base:
+        registro.error("A rede base não convergiu. A busca de margens não pode continuar.")
+        return
+    with instrumentacao.etapa('escrita_banco'):
+        criar_tabelas_postgres(indices_barras=list(net_base_result.bus.index))
+
+    with instrumentacao.etapa('indice_ilhamento'):
+        indice_ilhamento = IndiceIlhamento(net_base_result, ordem_maxima=1)
+        solver = SolverContingencias(net_base_result)
+    linhas_ilhamento = [l for l in net_base_result.line.index if indice_ilhamento.ilha_sozinha(l)]
+    contingencias = [[]] + [[l] for l in net_base_result.line.index if l not in linhas_ilhamento]
+    registro.info(f"Buscando a margem de carga da rede {caso} intacta e de {len(contingencias) - 1} contingências N-1 "
+                  f"({len(linhas_ilhamento)} linhas que ilham a rede ignoradas)...")
+
+    with instrumentacao.etapa('busca_margem'):
+        resultados = margens_carga(solver, contingencias, vmin, n_processos=n_processos,
+                                   fator_maximo=fator_maximo, tolerancia=tolerancia)
+    instrumentacao.contar('fluxos_margem', sum(r['n_fluxos'] for r in resultados))
+
+    margens = [{'linha_desligada': r['linhas'][0] if r['linhas'] else None,
+                **{chave: r[chave] for chave in ('fator_critico', 'motivo', 'vm_min', 'barra_vm_min', 'n_fluxos')}}
+               for r in resultados]
+    margens += [{'linha_desligada': linha, 'fator_critico': None, 'motivo': 'ilhamento', 'vm_min': None,
+                 'barra_vm_min': None, 'n_fluxos': 0} for linha in linhas_ilhamento]
+
+    intacta = margens[0]
+    registro.info(f"Rede intacta: fator crítico {intacta['fator_critico']:.3f} ({intacta['motivo']}); "
+                  f"{sum(r['n_fluxos'] for r in resultados) / len(resultados):.1f} fluxos por contingência em média")
+    menores = sorted((m for m in margens[1:] if m['fator_critico'] is not None), key=lambda m: m['fator_critico'])[:5]
+    registro.info("Menores margens: " + ", ".join(f"linha {m['linha_desligada']} ({m['fator_critico']:.3f}, {m['motivo']})"
+                                                  for m in menores))
+
+    with instrumentacao.etapa('escrita_banco'):
+        salvar_margens_postgres(margens, current_flow_execution_time)
+    salvar_metricas_postgres(instrumentacao, current_flow_execution_time)
+    return margens
+
+
+## FLOW 4: Série Temporal Quase Estática
+
+@flow(name="serie-temporal-flow")
+def serie_temporal_flow(arquivo_perfis: str, vmax: float = 1.093, vmin: float = 0.94, line_loading_max: float = 120,
+                        caso: str = 'case30', usar_cache_rede: bool = True, max_horas: Optional[int] = None,
+                        horas_por_gravacao: int = HORAS_POR_GRAVACAO, nivel_log: str = NIVEL_LOG_PADRAO):
+    """
+    FLOW: Varredura N-1 hora a hora sobre perfis de carga e geração (ex.: 8760 horas de
+    um ano) lidos de `arquivo_perfis` (CSV ou Parquet; formato em matriz_perfis), em vez
+    dos cenários aleatórios de gerar_dados_cenario.
+
+    O arquivo é lido em blocos e cada hora é resolvida partindo da solução da hora
+    anterior sobre a Ybus e a estrutura do Jacobiano da rede base (SerieTemporal, em
+    src/flows/series_temporais.py); horas que não convergem são refeitas com o
+    pandapower. O índice de ilhamento e o número de componentes de cada desligamento
+    são calculados uma única vez, e as contingências de cada hora partem da solução da
+    hora. Os resultados vão para resultados_simulacao (cenario = número da hora) a cada
+    `horas_por_gravacao` horas, então a memória não cresce com o tamanho da série;
+    `max_horas` limita as horas simuladas.
+    """
+    from src.flows.solver_contingencia import SolverContingencias
+    from src.flows.contingencias_multiplas import IndiceIlhamento
+    from src.flows.extracao_resultados import criar_buffers_resultados, limpar_buffers_resultados
+    from src.flows.series_temporais import SerieTemporal, ler_perfis, matriz_perfis
+
+    if horas_por_gravacao < 1:
+        raise ValueError(f"horas_por_gravacao deve ser pelo menos 1 (recebido {horas_por_gravacao}).")
+
+    registro = RegistroSimulacao(nivel_log)
+    current_flow_execution_time = datetime.now(timezone('America/Sao_Paulo'))
+    instrumentacao = Instrumentacao()
+
+    with instrumentacao.etapa('preparacao_rede_base'):
+        net_base_result, convergencia_base = preparar_rede_base(caso=caso, usar_cache=usar_cache_rede)
+    if not convergencia_base:
+        registro.error("A rede base não convergiu. A série temporal não pode continuar.")
+        return
+    indices_barras = list(net_base_result.bus.index)
+    with instrumentacao.etapa('escrita_banco'):
+        criar_tabelas_postgres(indices_barras=indices_barras)
+
+    # Topologia: a mesma em todas as horas
+    linhas_para_testar = list(net_base_result.line.index)
+    with instrumentacao.etapa('indice_ilhamento'):
+        indice_ilhamento = IndiceIlhamento(net_base_result, ordem_maxima=1)
+        ilhamento_contingencias = np.array([indice_ilhamento.ilha_sozinha(linha) for linha in linhas_para_testar], dtype=bool)
+        num_componentes_contingencias = [None if ilha else indice_ilhamento.num_componentes([linha])
+                                         for linha, ilha in zip(linhas_para_testar, ilhamento_contingencias)]
+        solver_base = SolverContingencias(net_base_result)
+    serie = SerieTemporal(net_base_result, solver_base)
+    buffers = criar_buffers_resultados(len(linhas_para_testar), len(indices_barras), len(linhas_para_testar))
+    registro.info(f"Iniciando série temporal de {arquivo_perfis} na rede {caso} ({len(linhas_para_testar)} contingências por hora, "
+                  f"{int(ilhamento_contingencias.sum())} com ilhamento)...")
+
+    resultados_pendentes = []
+    horas_criticas_por_linha = dict.fromkeys(linhas_para_testar, 0)
+    contagem_status = {}
+    horas = horas_gravadas = horas_nao_convergidas = 0
+    inicio_serie = time.perf_counter()
+
+    def gravar_resultados():
+        nonlocal resultados_pendentes, horas_gravadas
+        with instrumentacao.etapa('escrita_banco'):
+            salvar_resultados_globais_postgres(resultados_pendentes, current_flow_execution_time)
+        instrumentacao.contar('linhas_gravadas_resultados', len(resultados_pendentes))
+        resultados_pendentes = []
+        horas_gravadas = horas
+        registro.info(f"Série temporal: {horas} horas simuladas ({horas / (time.perf_counter() - inicio_serie):.1f} horas/s)")
+
+    for bloco in ler_perfis(arquivo_perfis):
+        if max_horas is not None and horas >= max_horas:
+            break
+        with instrumentacao.etapa('leitura_perfis'):
+            matriz = matriz_perfis(net_base_result, bloco, primeira_hora=horas)
+            if max_horas is not None:
+                matriz = matriz.iloc[:max_horas - horas]
+        horas_bloco = serie.resolver_horas(matriz)
+        while True:
+            with instrumentacao.etapa('fluxo_cenario'):
+                hora, solver_hora, iteracoes = next(horas_bloco, (None, None, None))
+            if hora is None:
+                break
+            horas += 1
+            instrumentacao.registrar_fluxo('fluxo_hora', solver_hora is not None, iteracoes)
+            if solver_hora is None:
+                # Sem convergência a partir da hora anterior: refaz a hora com o pandapower (partida 'flat')
+                with instrumentacao.etapa('fluxo_cenario'):
+                    net_hora, convergencia_hora = rodar_fluxo_potencia.fn(aplicar_dados_ao_net.fn(net_base_result, matriz.loc[hora].to_dict()))
+                instrumentacao.registrar_fluxo('runpp_hora', convergencia_hora, iteracoes_fluxo(net_hora))
+                if convergencia_hora:
+                    solver_hora = SolverContingencias(net_hora)
+                    serie.reiniciar(solver_hora.V0)
+            if solver_hora is None:
+                horas_nao_convergidas += 1
+                registro.warning(f"Hora {hora}: fluxo de potência inicial não convergiu, contingências ignoradas.")
+                resultados_pendentes.append({
+                    'cenario': hora,
+                    'linha_desligada': None,
+                    'status': 'cenário inicial não convergiu',
+                    'ilhamento': False,
+                    'num_componentes_conectados': None,
+                    'convergencia': False,
+                    'detalhe': "Fluxo de potência inicial não convergiu, contingências ignoradas"
+                })
+            else:
+                # Contingências N-1 da hora, partindo da solução da hora
+                limpar_buffers_resultados(buffers)
+                with instrumentacao.etapa('fluxo_contingencia'):
+                    for pos_linha, linha in enumerate(linhas_para_testar):
+                        if ilhamento_contingencias[pos_linha]:
+                            continue
+                        convergencia_pos = solver_hora.resolver_desligamento_em(linha, buffers['vm_pu'][pos_linha],
+                                                                                 buffers['loading_percent'][pos_linha])
+                        buffers['convergencia'][pos_linha] = convergencia_pos
+                        instrumentacao.registrar_fluxo('fluxo_contingencia', convergencia_pos, solver_hora.ultimas_iteracoes)
+                with instrumentacao.etapa('classificacao'):
+                    classificacao = classificar_contingencias(buffers['vm_pu'], buffers['loading_percent'], vmin, vmax,
+                                                              line_loading_max, barras=indices_barras, linhas=linhas_para_testar,
+                                                              validas=buffers['convergencia'])
+
+                for pos_linha, linha in enumerate(linhas_para_testar):
+                    colunas_violacao = violacao(classificacao, pos_linha)
+                    if ilhamento_contingencias[pos_linha]:
+                        status_contingencia, detalhe = 'ilhamento', "Ilhamento detectado (índice topológico)"
+                    elif not buffers['convergencia'][pos_linha]:
+                        status_contingencia, detalhe = 'crítica (não convergiu)', "Fluxo não convergiu"
+                    elif classificacao['critica'][pos_linha]:
+                        status_contingencia = 'crítica'
+                        detalhe = detalhe_violacao(colunas_violacao['tipo_violacao'], colunas_violacao['valor_violacao'],
+                                                   colunas_violacao['limite_violacao'])
+                    else:
+                        status_contingencia, detalhe = 'normal', None
+                    if status_contingencia != 'normal':
+                        horas_criticas_por_linha[linha] += 1
+                        registro.detalhe(hora, f"Hora {hora}, linha {linha}: {detalhe}")
+                    contagem_status[status_contingencia] = contagem_status.get(status_contingencia, 0) + 1
+                    resultados_pendentes.append({
+                        'cenario': hora,
+                        'linha_desligada': linha,
+                        'tipo_elemento': 'line',
+                        'elemento_desligado': linha,
+                        'status': status_contingencia,
+                        'ilhamento': bool(ilhamento_contingencias[pos_linha]),
+                        'num_componentes_conectados': num_componentes_contingencias[pos_linha],
+                        'convergencia': bool(buffers['convergencia'][pos_linha]),
+                        'detalhe': detalhe,
+                        **colunas_violacao
+                    })
+
+            if horas - horas_gravadas >= horas_por_gravacao:
+                gravar_resultados()
+
+    if resultados_pendentes:
+        gravar_resultados()
+    for status, n in contagem_status.items():
+        instrumentacao.contar(f'status_{status}', n)
+    instrumentacao.contar('serie_horas', horas)
+    instrumentacao.contar('serie_horas_nao_convergidas', horas_nao_convergidas)
+
+    duracao = time.perf_counter() - inicio_serie
+    registro.info(f"Série temporal concluída: {horas} horas em {duracao:.1f} s ({horas_nao_convergidas} sem convergência); "
+                  + ", ".join(f"{status}: {n}" for status, n in sorted(contagem_status.items())))
+    mais_criticas = sorted(((n, linha) for linha, n in horas_criticas_por_linha.items() if n), reverse=True)[:20]
+    run_context = _contexto_execucao()
+    if run_context and mais_criticas:
+        linhas = ["# Horas com contingência crítica por linha", "", f"{horas} horas simuladas de `{arquivo_perfis}`.", "",
+                  "| Linha | Horas críticas | % das horas |", "|---:|---:|---:|"]
+        linhas += [f"| {linha} | {n} | {n / horas * 100:.1f} |" for n, linha in mais_criticas]
+        create_markdown_artifact("\n".join(linhas), key="serie-temporal",
+                                 description="Linhas cuja contingência N-1 foi crítica (ou ilhou a rede) no maior número de horas.")
+
+    salvar_metricas_postgres(instrumentacao, current_flow_execution_time)
+    return {'horas': horas, 'horas_nao_convergidas': horas_nao_convergidas, 'contagem_status': contagem_status}
 
-    print(f"--- Executando o Flow de Simulação de Contingências ---")
-    simulacao_contingencia_flow(n_cenarios=n_cenarios_simulacao)
 
-    print(f"\n--- Executando o Flow de Análise de Impacto ---")
-    analise_impacto_flow(num_barras=30)
+## Execução Principal do Script
 
-    print("\nProcesso completo (simulação e análise) concluído e dados salvos no PostgreSQL.")
\ No newline at end of file
+if __name__ == "__main__":
+    # Mesmo pipeline da linha de comando (src/flows/execucao_local.py), no PostgreSQL de get_db_url()
+    # e no Prefect configurado; demais opções como na CLI (ex.: --params params.json --workers 4)
+    from src.flows.execucao_local import main
+    sys.exit(main(['--armazenamento', 'postgres'] + sys.argv[1:]))
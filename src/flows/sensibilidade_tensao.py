@@ -0,0 +1,146 @@
+# SciPy é importado dentro de do_solver: o Dash importa este módulo só para consultar_variacao_tensao
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# As matrizes são densas (barras x barras por cenário): redes maiores não têm as sensibilidades gravadas
+MAX_BARRAS_SENSIBILIDADE = 500
+# Entradas com |dV| abaixo deste valor (pu por MW ou MVAr) não são gravadas
+LIMIAR_SENSIBILIDADE = 1e-9
+
+
+class SensibilidadeTensao:
+    """
+    Matrizes de sensibilidade de tensão de um ponto de operação convergido:
+    dv_dp[i, k] e dv_dq[i, k] são a variação do módulo da tensão (pu) na barra
+    barras[i] por MW e por MVAr a mais injetados na barra barras[k] (geração
+    positiva: um aumento de carga é uma injeção negativa).
+
+    São blocos da inversa do Jacobiano do Newton-Raphson no ponto convergido, então
+    uma consulta "e se a injeção na barra k variar de X" é um produto matriz-vetor em
+    vez de um novo fluxo de potência. As barras PV e a slack mantêm a tensão (linhas
+    nulas); a injeção ativa na slack e a reativa nas barras PV são absorvidas pelos
+    geradores (colunas nulas). A linearização vale para variações pequenas e, como no
+    rodar_fluxo_potencia, não considera os limites de reativos dos geradores.
+    """
+
+    def __init__(self, barras, dv_dp, dv_dq, vm_pu=None):
+        self.barras = [int(b) for b in barras]
+        self.posicoes = {barra: pos for pos, barra in enumerate(self.barras)}
+        self.dv_dp = np.asarray(dv_dp, dtype=float)
+        self.dv_dq = np.asarray(dv_dq, dtype=float)
+        self.vm_pu = np.full(len(self.barras), np.nan) if vm_pu is None else np.asarray(vm_pu, dtype=float)
+
+    @classmethod
+    def do_solver(cls, solver):
+        """
+        Calcula as matrizes no ponto resolvido de um SolverContingencias (caso base ou
+        cenário, ver para_cenario), com o Jacobiano na mesma estrutura e ordenação de
+        colunas usadas nas contingências.
+        """
+        from scipy.sparse.linalg import splu
+
+        J = solver._jacobiano(solver.Ybus.data, solver.V0)
+        # Linhas: [dVa (pv + pq), dVm (pq)]; colunas: [P (pv + pq), Q (pq)] em pu
+        inversa = splu(J, permc_spec='NATURAL').solve(np.eye(solver.dim_j))[solver.perm_c]
+        dvm = inversa[solver.n_pvpq:]
+
+        n_internas = solver.Ybus.shape[0]
+        dv_dp = np.zeros((n_internas, n_internas))
+        dv_dq = np.zeros((n_internas, n_internas))
+        dv_dp[np.ix_(solver.pq, solver.pvpq)] = dvm[:, :solver.n_pvpq]
+        dv_dq[np.ix_(solver.pq, solver.pq)] = dvm[:, solver.n_pvpq:]
+
+        validas = solver.pos_barras >= 0
+        pos = solver.pos_barras[validas]
+        return cls(np.asarray(solver.indices_barras)[validas],
+                   dv_dp[np.ix_(pos, pos)] / solver.base_mva, dv_dq[np.ix_(pos, pos)] / solver.base_mva,
+                   np.abs(solver.V0[pos]))
+
+    def _vetor(self, variacoes):
+        vetor = np.zeros(len(self.barras))
+        for barra, valor in (variacoes or {}).items():
+            if int(barra) not in self.posicoes:
+                raise ValueError(f"Barra {barra} sem sensibilidades neste ponto de operação.")
+            vetor[self.posicoes[int(barra)]] += valor
+        return vetor
+
+    def variacao_tensao(self, delta_p_mw=None, delta_q_mvar=None):
+        """
+        Variação de tensão (pu, na ordem de `barras`) para as variações de injeção
+        {barra: MW} e {barra: MVAr}: dv_dp @ ΔP + dv_dq @ ΔQ.
+        """
+        return self.dv_dp @ self._vetor(delta_p_mw) + self.dv_dq @ self._vetor(delta_q_mvar)
+
+    def registros(self, limiar=LIMIAR_SENSIBILIDADE):
+        """
+        Entradas com |dV| acima de `limiar` no formato longo da tabela sensibilidade_tensao
+        (dict de vetores: barra, barra_injecao, dv_dp, dv_dq e vm_pu da barra).
+        """
+        i, k = np.nonzero((np.abs(self.dv_dp) > limiar) | (np.abs(self.dv_dq) > limiar))
+        barras = np.asarray(self.barras)
+        return {'barra': barras[i], 'barra_injecao': barras[k], 'dv_dp': self.dv_dp[i, k],
+                'dv_dq': self.dv_dq[i, k], 'vm_pu': self.vm_pu[i]}
+
+    @classmethod
+    def de_registros(cls, df):
+        """Reconstrói as matrizes de um cenário a partir das linhas de sensibilidade_tensao (entradas ausentes são nulas)."""
+        barras = np.union1d(df['barra'].to_numpy(dtype=np.int64), df['barra_injecao'].to_numpy(dtype=np.int64))
+        i = np.searchsorted(barras, df['barra'].to_numpy(dtype=np.int64))
+        k = np.searchsorted(barras, df['barra_injecao'].to_numpy(dtype=np.int64))
+        dv_dp = np.zeros((len(barras), len(barras)))
+        dv_dq = np.zeros((len(barras), len(barras)))
+        vm_pu = np.full(len(barras), np.nan)
+        dv_dp[i, k] = df['dv_dp'].to_numpy(dtype=float)
+        dv_dq[i, k] = df['dv_dq'].to_numpy(dtype=float)
+        vm_pu[i] = df['vm_pu'].to_numpy(dtype=float)
+        return cls(barras, dv_dp, dv_dq, vm_pu)
+
+
+def _execucao_e_cenario(conexao, table_name, execution_timestamp, cenario):
+    """Completa a execução (a última) e o cenário (o primeiro dela) da consulta, quando omitidos."""
+    if execution_timestamp is None:
+        execution_timestamp = conexao.execute(text(f"SELECT MAX(execution_timestamp) FROM {table_name}")).scalar()
+    if cenario is None and execution_timestamp is not None:
+        cenario = conexao.execute(text(f"SELECT MIN(cenario) FROM {table_name} WHERE execution_timestamp = :execucao"),
+                                  {'execucao': execution_timestamp}).scalar()
+    return execution_timestamp, cenario
+
+
+def consultar_variacao_tensao(engine, delta_p_mw=None, delta_q_mvar=None, cenario=None, execution_timestamp=None,
+                              table_name='sensibilidade_tensao'):
+    """
+    Responde "o que acontece com as tensões se a injeção nas barras variar" com as
+    sensibilidades gravadas pela simulação, sem fluxo de potência: só as colunas das
+    barras de `delta_p_mw` / `delta_q_mvar` ({barra: MW}, {barra: MVAr}) são lidas do
+    banco. Sem `execution_timestamp`, usa a última execução; sem `cenario`, o primeiro.
+
+    Retorna um DataFrame com barra, vm_pu (no cenário), delta_vm_pu e vm_pu_estimada,
+    da maior para a menor variação, ou vazio se não houver sensibilidades gravadas.
+    Barras sem linhas (PV e slack) mantêm a tensão.
+    """
+    barras_injecao = sorted({int(b) for b in {**(delta_p_mw or {}), **(delta_q_mvar or {})}})
+    colunas = ['barra', 'vm_pu', 'delta_vm_pu', 'vm_pu_estimada']
+    if not barras_injecao:
+        return pd.DataFrame(columns=colunas)
+
+    with engine.connect() as conexao:
+        execution_timestamp, cenario = _execucao_e_cenario(conexao, table_name, execution_timestamp, cenario)
+        if cenario is None:
+            return pd.DataFrame(columns=colunas)
+        df = pd.read_sql(text(f"SELECT barra, barra_injecao, dv_dp, dv_dq, vm_pu FROM {table_name} "
+                              f"WHERE execution_timestamp = :execucao AND cenario = :cenario "
+                              f"AND barra_injecao IN ({', '.join(str(b) for b in barras_injecao)})"),
+                         conexao, params={'execucao': execution_timestamp, 'cenario': int(cenario)})
+    if df.empty:
+        return pd.DataFrame(columns=colunas)
+
+    sensibilidade = SensibilidadeTensao.de_registros(df)
+    delta_p_mw = {b: v for b, v in (delta_p_mw or {}).items() if int(b) in sensibilidade.posicoes}
+    delta_q_mvar = {b: v for b, v in (delta_q_mvar or {}).items() if int(b) in sensibilidade.posicoes}
+    delta_vm = sensibilidade.variacao_tensao(delta_p_mw, delta_q_mvar)
+
+    resultado = pd.DataFrame({'barra': sensibilidade.barras, 'vm_pu': sensibilidade.vm_pu, 'delta_vm_pu': delta_vm})
+    resultado = resultado[resultado['barra'].isin(df['barra'])] # Só as barras cuja tensão varia
+    resultado['vm_pu_estimada'] = resultado['vm_pu'] + resultado['delta_vm_pu']
+    return resultado.reindex(resultado['delta_vm_pu'].abs().sort_values(ascending=False).index).reset_index(drop=True)
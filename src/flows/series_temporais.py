@@ -0,0 +1,111 @@
+# pandas e o fluxo_lote (pandapower, SciPy) são importados dentro das funções: resultados2
+# importa as constantes deste módulo no carregamento (ver benchmarks/bench_importacao.py).
+import numpy as np
+
+# Horas lidas do arquivo de perfis por vez (a memória não depende do tamanho do arquivo)
+TAMANHO_BLOCO_PERFIS = 168
+# Horas acumuladas antes de cada gravação dos resultados no banco
+HORAS_POR_GRAVACAO = 168
+# Colunas opcionais do arquivo de perfis com os fatores aplicados aos valores nominais da rede
+COLUNA_FATOR_CARGA = 'fator_carga'
+COLUNA_FATOR_GERACAO = 'fator_geracao'
+
+
+def ler_perfis(caminho, tamanho_bloco=TAMANHO_BLOCO_PERFIS):
+    """
+    Lê o arquivo de perfis (CSV ou Parquet, uma linha por hora) em blocos de
+    `tamanho_bloco` linhas, sem carregá-lo inteiro. Gera um DataFrame por bloco.
+    """
+    import pandas as pd
+    if str(caminho).endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(caminho, chunksize=tamanho_bloco)
+
+
+def matriz_perfis(net, bloco, primeira_hora=0):
+    """
+    Converte um bloco do arquivo de perfis na matriz de cenários (mesmas colunas de
+    gerar_dados_cenario, ver montar_matriz_cenarios), com uma linha por hora indexada
+    pelo número da hora (posição da linha no arquivo, a partir de `primeira_hora`).
+
+    Colunas do arquivo com os nomes de gerar_dados_cenario (ex.: 'carga_p_mw_3',
+    'gen_p_mw_1', 'gen_vm_pu_1') dão o valor absoluto do elemento na hora. As demais
+    cargas e gerações ficam nos valores nominais da rede multiplicados por 'fator_carga'
+    e 'fator_geracao' (1 quando ausentes); a carga reativa acompanha o fator de carga
+    (fator de potência constante). Outras colunas (ex.: data e hora) são ignoradas.
+    """
+    import pandas as pd
+    n = len(bloco)
+    fator_carga = bloco[COLUNA_FATOR_CARGA].to_numpy(dtype=float) if COLUNA_FATOR_CARGA in bloco.columns else np.ones(n)
+    fator_geracao = bloco[COLUNA_FATOR_GERACAO].to_numpy(dtype=float) if COLUNA_FATOR_GERACAO in bloco.columns else np.ones(n)
+    colunas = {}
+
+    def coluna(nome, nominal, fator=1.0):
+        colunas[nome] = bloco[nome].to_numpy(dtype=float) if nome in bloco.columns else np.full(n, float(nominal)) * fator
+
+    for idx in net.load.index:
+        coluna(f'carga_p_mw_{idx}', net.load.at[idx, 'p_mw'], fator_carga)
+        coluna(f'carga_q_mvar_{idx}', net.load.at[idx, 'q_mvar'], fator_carga)
+    for idx in net.gen.index:
+        coluna(f'gen_p_mw_{idx}', net.gen.at[idx, 'p_mw'], fator_geracao)
+        coluna(f'gen_vm_pu_{idx}', net.gen.at[idx, 'vm_pu'])
+        coluna(f'gen_q_mvar_min_{idx}', net.gen.at[idx, 'q_mvar_min'])
+        coluna(f'gen_q_mvar_max_{idx}', net.gen.at[idx, 'q_mvar_max'])
+        colunas[f'gen_slack_{idx}'] = np.full(n, bool(net.gen.at[idx, 'slack']))
+    for idx in net.shunt.index:
+        coluna(f'shunt_q_mvar_{idx}', net.shunt.at[idx, 'q_mvar'])
+
+    return pd.DataFrame(colunas, index=pd.RangeIndex(primeira_hora, primeira_hora + n, name='cenario'))
+
+
+class SerieTemporal:
+    """
+    Fluxo de potência quase estático das horas de uma série, em sequência, sobre a
+    topologia da rede base: a Ybus, a estrutura do Jacobiano e a ordenação de colunas
+    são as do SolverContingencias da rede base, e cada hora parte da solução da hora
+    anterior (partida a quente), com |V| das barras PV e slack nas referências da hora.
+    Entre horas vizinhas as injeções variam pouco e o Newton-Raphson converge em
+    poucas iterações.
+
+    Uso:
+        serie = SerieTemporal(net_base, solver_base)
+        for hora, solver_hora, iteracoes in serie.resolver_horas(matriz):
+            if solver_hora is not None:
+                solver_hora.resolver_desligamento_em(...)
+    """
+
+    def __init__(self, net_base, solver_base):
+        self.net_base = net_base
+        self.solver_base = solver_base
+        self.V_anterior = solver_base.V0
+        # Barras internas com |V| fixado pelos geradores (PV e slack)
+        self._fixas = np.setdiff1d(np.arange(solver_base.Ybus.shape[0]), solver_base.pq)
+
+    def resolver_horas(self, matriz):
+        """
+        Resolve em sequência as horas de um bloco (matriz_perfis), com as injeções de
+        todas as horas do bloco preparadas de uma vez. Gera (hora, solver da hora,
+        iterações), com o solver pronto para as contingências (para_cenario), ou
+        (hora, None, iterações) se o fluxo não convergir; nesse caso a hora seguinte
+        parte da última solução convergida (ou da informada em reiniciar()).
+        """
+        from src.flows.fluxo_lote import preparar_injecoes
+        Sbus, dados_ybus, V0 = preparar_injecoes(self.solver_base, self.net_base, matriz)
+        vm_fixas = np.abs(V0[:, self._fixas])
+        for pos, hora in enumerate(matriz.index):
+            vm = np.abs(self.V_anterior)
+            vm[self._fixas] = vm_fixas[pos]
+            V_inicio = vm * np.exp(1j * np.angle(self.V_anterior))
+            V, convergiu, iteracoes = self.solver_base._newton_raphson(dados_ybus[pos], V_inicio, Sbus[pos])
+            if not convergiu:
+                yield hora, None, iteracoes
+                continue
+            self.V_anterior = V
+            yield hora, self.solver_base.para_cenario(V, dados_ybus[pos]), iteracoes
+
+    def reiniciar(self, V):
+        """Usa `V` (barras internas) como ponto de partida da próxima hora, ex.: após resolver uma hora pelo pandapower."""
+        self.V_anterior = np.asarray(V, dtype=complex)
@@ -0,0 +1,556 @@
+import copy
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csc_matrix, csr_matrix
+from scipy.sparse.linalg import splu
+from pandapower.pypower.idx_brch import F_BUS, T_BUS
+from pandapower.pypower.idx_bus import QD
+
+# Tabelas do pandapower cujos elementos podem ser desligados nas contingências simples
+TIPOS_CONTINGENCIA = ('line', 'trafo', 'gen', 'shunt')
+# Atributos do solver que dependem da classificação das barras (PV/PQ) e formam a estrutura do Jacobiano
+_ATRIBUTOS_ESTRUTURA = ('pv', 'pq', 'pvpq', 'n_pvpq', '_m11', '_m12', '_m21', '_m22', '_linhas_j', '_colunas_j',
+                        'dim_j', 'perm_c', '_ordem_csc', '_indices_csc', '_indptr_csc')
+
+
+def posicoes_ramos_ppci(net, tabela):
+    """
+    Posição de cada elemento de net[tabela] ('line' ou 'trafo', na ordem da tabela)
+    entre os ramos internos (ppci) do último fluxo de potência. Elementos fora de
+    serviço ficam com -1.
+    """
+    interno = net._ppc['internal']
+    inicio, _ = net._pd2ppc_lookups['branch'].get(tabela, (0, 0))
+    ramo_em_servico = np.asarray(interno['branch_is'], dtype=bool)
+    pos_ppci_ramos = np.cumsum(ramo_em_servico) - 1
+    pos_ppc = inicio + np.arange(len(net[tabela]))
+    return np.where(ramo_em_servico[pos_ppc], pos_ppci_ramos[pos_ppc], -1)
+
+
+def posicoes_linhas_ppci(net):
+    """Posição de cada linha de net.line entre os ramos internos (ver posicoes_ramos_ppci)."""
+    return posicoes_ramos_ppci(net, 'line')
+
+
+def _barras_internas(net, tabela, n_barras_internas):
+    """Barra interna (ppci) de cada elemento de uma tabela com coluna 'bus'; -1 fora de serviço."""
+    pos = net._pd2ppc_lookups['bus'][tabela['bus'].values]
+    return np.where((pos < n_barras_internas) & tabela['in_service'].values.astype(bool), pos, -1)
+
+
+def listar_contingencias(net, tipos=('line',)):
+    """
+    Lista única das contingências simples da rede: (tipo, índice em net[tipo]) para os
+    `tipos` de TIPOS_CONTINGENCIA, nessa ordem (as linhas primeiro). Entram todas as
+    linhas, como na varredura N-1 original, e os transformadores, geradores e shunts em
+    serviço; os geradores slack ficam de fora (a rede perderia a referência).
+    """
+    desconhecidos = sorted(set(tipos) - set(TIPOS_CONTINGENCIA))
+    if desconhecidos:
+        raise ValueError(f"Tipos de contingência desconhecidos: {desconhecidos}. Use {list(TIPOS_CONTINGENCIA)}.")
+    contingencias = []
+    for tipo in TIPOS_CONTINGENCIA:
+        if tipo not in tipos:
+            continue
+        tabela = net[tipo]
+        if tipo == 'line':
+            selecionados = tabela.index
+        else:
+            em_servico = tabela['in_service'].astype(bool)
+            if tipo == 'gen':
+                em_servico &= ~tabela['slack'].astype(bool)
+            selecionados = tabela.index[em_servico.values]
+        contingencias += [(tipo, int(idx)) for idx in selecionados]
+    return contingencias
+
+
+class SolverContingencias:
+    """
+    Resolve contingências de linha (N-1) de um mesmo cenário reaproveitando a
+    matriz Ybus do caso base montada pelo pandapower (net._ppc['internal']).
+
+    Cada desligamento é aplicado como uma atualização de posto baixo da Ybus
+    (subtração das entradas Yff, Yft, Ytf, Ytt do ramo), mantendo a mesma estrutura
+    esparsa. Por isso o Jacobiano de todas as contingências tem a mesma estrutura:
+    ela é montada uma única vez, junto com a ordenação de colunas (COLAMD) da
+    fatoração LU, e a cada iteração só os valores são recalculados. O Newton-Raphson
+    parte da solução do caso base, o que reduz o número de iterações em relação ao
+    início 'flat'.
+
+    Além das linhas, transformadores, geradores e shunts podem ser desligados
+    (resolver_desligamento_em com `tipo`, ver TIPOS_CONTINGENCIA).
+
+    A rede deve ter sido resolvida com pp.runpp antes da criação do solver e as
+    injeções são consideradas de potência constante (sem limites de reativos),
+    como no rodar_fluxo_potencia. Contingências que ilham a rede devem ser
+    descartadas antes (simular_desligamento_e_verificar_ilhamento): nelas o
+    Jacobiano fica singular e o solver informa não convergência.
+    """
+
+    def __init__(self, net, tolerancia=1e-8, max_iteracoes=10):
+        if not net.get('converged', False) or net.get('_ppc') is None:
+            raise ValueError("A rede precisa ter um fluxo de potência convergido (pp.runpp) antes de criar o solver.")
+
+        interno = net._ppc['internal']
+        self.tolerancia = tolerancia
+        self.max_iteracoes = max_iteracoes
+        self.ultimas_iteracoes = None # Iterações do último resolver_desligamento
+
+        Ybus = interno['Ybus'].tocsr()
+        Ybus.sum_duplicates()
+        self.Ybus = Ybus
+        self.Yf = interno['Yf'].tocsr()
+        self.Yt = interno['Yt'].tocsr()
+        self.V0 = np.asarray(interno['V'], dtype=complex)
+        self.pv = np.asarray(interno['pv'], dtype=np.int64)
+        self.pq = np.asarray(interno['pq'], dtype=np.int64)
+        self.pvpq = np.r_[self.pv, self.pq]
+        self.n_pvpq = len(self.pvpq)
+        base_mva = net._ppc['baseMVA']
+        self.base_mva = base_mva
+
+        # Injeções especificadas: no ponto convergido do caso base as injeções calculadas
+        # coincidem com as especificadas nas barras PV (P) e PQ (P e Q).
+        self.Sbus = self.V0 * np.conj(self.Ybus @ self.V0)
+
+        # Mapeamento barra pandapower -> barra interna (ppci). Barras fora de serviço ficam com -1.
+        n_barras_internas = self.Ybus.shape[0]
+        self.indices_barras = net.bus.index
+        pos_ppc = net._pd2ppc_lookups['bus'][net.bus.index.values]
+        self.pos_barras = np.where(pos_ppc < n_barras_internas, pos_ppc, -1)
+
+        # Mapeamento linha pandapower -> ramo interno (ppci). Linhas fora de serviço ficam com -1.
+        self.indices_linhas = net.line.index
+        self.pos_linhas = posicoes_linhas_ppci(net)
+
+        # Corrente base (kA) nas extremidades e capacidade de cada linha, como em res_line.loading_percent
+        vn_from = net.bus.loc[net.line['from_bus'].values, 'vn_kv'].values
+        vn_to = net.bus.loc[net.line['to_bus'].values, 'vn_kv'].values
+        self.i_base_from_ka = base_mva / (np.sqrt(3) * vn_from)
+        self.i_base_to_ka = base_mva / (np.sqrt(3) * vn_to)
+        self.i_max_ka = (net.line['max_i_ka'] * net.line['df'] * net.line['parallel']).values.astype(float)
+
+        # Elementos das contingências além das linhas. Os valores de geradores, shunts e cargas
+        # são os da rede base e passam aos do cenário em para_cenario(..., injecoes=...)
+        self.indices_trafos = net.trafo.index
+        self.pos_trafos = posicoes_ramos_ppci(net, 'trafo')
+        self.indices_geradores = net.gen.index
+        self._barras_geradores = _barras_internas(net, net.gen, n_barras_internas)
+        self._p_geradores = net.gen['p_mw'].values.astype(float)
+        self._escala_geradores = net.gen['scaling'].values.astype(float)
+        shunt = net.shunt
+        self.indices_shunts = shunt.index
+        self._barras_shunts = _barras_internas(net, shunt, n_barras_internas)
+        self._p_shunts = shunt['p_mw'].values.astype(float)
+        self._q_shunts = shunt['q_mvar'].values.astype(float)
+        vn_barra_shunt = net.bus.loc[shunt['bus'].values, 'vn_kv'].values
+        vn_shunt = shunt['vn_kv'].fillna(pd.Series(vn_barra_shunt, index=shunt.index)).values
+        # Admitância (pu) por MVA nominal de cada shunt, como no pandapower: step x (vn_barra / vn_shunt)²
+        self._fator_shunts = shunt['step'].values * (vn_barra_shunt / vn_shunt) ** 2 / base_mva
+        self.indices_cargas = net.load.index
+        self._barras_cargas = _barras_internas(net, net.load, n_barras_internas)
+        self._q_cargas = net.load['q_mvar'].values.astype(float)
+        self._escala_cargas = net.load['scaling'].values.astype(float)
+        # Injeção reativa especificada (pu) de cada barra sem os geradores: a de uma barra PV que
+        # perde o único gerador e passa a PQ
+        self._q_sem_geradores = -np.asarray(interno['bus'][:, QD].real, dtype=float) / base_mva
+        # Estruturas do Jacobiano com uma barra PV tratada como PQ, por barra (compartilhadas entre cenários)
+        self._estruturas_pq = {}
+
+        # Barras (internas) de cada ramo e posições, no vetor de dados da Ybus (CSR),
+        # das entradas que a atualização de posto baixo altera a cada desligamento.
+        ramos = interno['branch']
+        self._ramos_f = ramos[:, F_BUS].real.astype(np.int64)
+        self._ramos_t = ramos[:, T_BUS].real.astype(np.int64)
+        self._pos_ff = self._posicoes(self._ramos_f, self._ramos_f)
+        self._pos_ft = self._posicoes(self._ramos_f, self._ramos_t)
+        self._pos_tf = self._posicoes(self._ramos_t, self._ramos_f)
+        self._pos_tt = self._posicoes(self._ramos_t, self._ramos_t)
+
+        # Estrutura do Jacobiano e ordenação de colunas calculadas uma única vez
+        self._preparar_estrutura_jacobiano()
+
+    def _posicoes(self, linhas, colunas):
+        """Retorna a posição de cada entrada (linha, coluna) no vetor de dados da Ybus (CSR)."""
+        posicoes = np.full(len(linhas), -1, dtype=np.int64)
+        for k, (i, j) in enumerate(zip(linhas, colunas)):
+            if i < 0 or j < 0:
+                continue
+            inicio, fim = self.Ybus.indptr[i], self.Ybus.indptr[i + 1]
+            achou = np.nonzero(self.Ybus.indices[inicio:fim] == j)[0]
+            if len(achou):
+                posicoes[k] = inicio + achou[0]
+        return posicoes
+
+    def _preparar_estrutura_jacobiano(self):
+        """
+        Mapeia cada entrada da Ybus para as entradas do Jacobiano polar
+        [[dP/dVa, dP/dVm], [dQ/dVa, dQ/dVm]] e calcula, no caso base, a ordenação
+        de colunas COLAMD usada em todas as fatorações seguintes.
+        """
+        n = self.Ybus.shape[0]
+        self._linhas_y = np.repeat(np.arange(n), np.diff(self.Ybus.indptr))
+        self._colunas_y = self.Ybus.indices
+        # Soma por linha das entradas da Ybus (Ibus = Ybus @ V para vários valores de Ybus de uma vez)
+        self._soma_linhas = csr_matrix((np.ones(len(self._linhas_y)), (self._linhas_y, np.arange(len(self._linhas_y)))),
+                                       shape=(n, len(self._linhas_y)))
+        self._pos_diag = self._posicoes(np.arange(n), np.arange(n))
+        if np.any(self._pos_diag < 0):
+            raise ValueError("A Ybus do caso base não possui todos os termos diagonais.")
+
+        pos_pvpq = np.full(n, -1)
+        pos_pvpq[self.pvpq] = np.arange(self.n_pvpq)
+        pos_pq = np.full(n, -1)
+        pos_pq[self.pq] = np.arange(len(self.pq))
+        lin_pvpq, col_pvpq = pos_pvpq[self._linhas_y], pos_pvpq[self._colunas_y]
+        lin_pq, col_pq = pos_pq[self._linhas_y], pos_pq[self._colunas_y]
+
+        # Entradas da Ybus que compõem cada bloco do Jacobiano
+        self._m11 = np.nonzero((lin_pvpq >= 0) & (col_pvpq >= 0))[0]
+        self._m12 = np.nonzero((lin_pvpq >= 0) & (col_pq >= 0))[0]
+        self._m21 = np.nonzero((lin_pq >= 0) & (col_pvpq >= 0))[0]
+        self._m22 = np.nonzero((lin_pq >= 0) & (col_pq >= 0))[0]
+        self._linhas_j = np.r_[lin_pvpq[self._m11], lin_pvpq[self._m12],
+                               self.n_pvpq + lin_pq[self._m21], self.n_pvpq + lin_pq[self._m22]]
+        self._colunas_j = np.r_[col_pvpq[self._m11], self.n_pvpq + col_pq[self._m12],
+                                col_pvpq[self._m21], self.n_pvpq + col_pq[self._m22]]
+        self.dim_j = self.n_pvpq + len(self.pq)
+
+        # Ordenação de colunas (fatoração simbólica) obtida no Jacobiano do caso base.
+        # A coluna c do Jacobiano passa a ocupar a posição perm_c[c].
+        self.perm_c = np.arange(self.dim_j)
+        self._definir_ordem_csc()
+        J_base = self._jacobiano(self.Ybus.data, self.V0)
+        self.perm_c = splu(J_base, permc_spec='COLAMD').perm_c
+        self._definir_ordem_csc()
+
+    def _definir_ordem_csc(self):
+        colunas = self.perm_c[self._colunas_j]
+        self._ordem_csc = np.lexsort((self._linhas_j, colunas))
+        self._indices_csc = self._linhas_j[self._ordem_csc]
+        self._indptr_csc = np.r_[0, np.cumsum(np.bincount(colunas, minlength=self.dim_j))]
+
+    def _ybus(self, dados):
+        """Monta a Ybus com os valores `dados` sobre a estrutura esparsa do caso base."""
+        return csr_matrix((dados, self.Ybus.indices, self.Ybus.indptr), shape=self.Ybus.shape)
+
+    def _correntes(self, dados_ybus, V):
+        """Ibus = Ybus @ V; aceita um cenário (vetores) ou vários (uma linha por cenário)."""
+        produtos = dados_ybus * V[..., self._colunas_y]
+        return (self._soma_linhas @ produtos.T).T
+
+    def _valores_jacobiano(self, dados_ybus, V):
+        """
+        Calcula os valores do Jacobiano, já na ordem da estrutura CSC, direto sobre a
+        estrutura da Ybus e com as mesmas expressões de dSbus_dV do pandapower.
+        Aceita um cenário (vetores) ou vários (uma linha por cenário).
+        """
+        Ibus = self._correntes(dados_ybus, V)
+        Vn = V / np.abs(V)
+        V_lin = V[..., self._linhas_y]
+        dS_dVa = -1j * V_lin * np.conj(dados_ybus * V[..., self._colunas_y])
+        dS_dVm = V_lin * np.conj(dados_ybus * Vn[..., self._colunas_y])
+        dS_dVa[..., self._pos_diag] += 1j * V * np.conj(Ibus)
+        dS_dVm[..., self._pos_diag] += np.conj(Ibus) * Vn
+
+        valores = np.concatenate([dS_dVa[..., self._m11].real, dS_dVm[..., self._m12].real,
+                                  dS_dVa[..., self._m21].imag, dS_dVm[..., self._m22].imag], axis=-1)
+        return valores[..., self._ordem_csc]
+
+    def _jacobiano(self, dados_ybus, V):
+        """Monta o Jacobiano de um cenário com as colunas já na ordem perm_c."""
+        return csc_matrix((self._valores_jacobiano(dados_ybus, V), self._indices_csc, self._indptr_csc),
+                          shape=(self.dim_j, self.dim_j))
+
+    def _jacobiano_bloco(self, dados_ybus, V):
+        """
+        Monta o Jacobiano bloco-diagonal de vários cenários (um bloco por cenário),
+        todos com a mesma estrutura, para resolvê-los com uma única fatoração LU.
+        """
+        n_cenarios = V.shape[0]
+        nnz = len(self._indices_csc)
+        valores = self._valores_jacobiano(dados_ybus, V)
+        deslocamentos = np.arange(n_cenarios)[:, None]
+        indices = (self._indices_csc[None, :] + self.dim_j * deslocamentos).ravel()
+        indptr = np.r_[(self._indptr_csc[:-1][None, :] + nnz * deslocamentos).ravel(), n_cenarios * nnz]
+        dim = n_cenarios * self.dim_j
+        return csc_matrix((valores.ravel(), indices, indptr), shape=(dim, dim))
+
+    def newton_raphson_lote(self, dados_ybus, V0, Sbus):
+        """
+        Newton-Raphson vetorizado para vários cenários com a mesma topologia
+        (uma linha de `dados_ybus`, `V0` e `Sbus` por cenário). A cada iteração os
+        cenários ainda não convergidos são resolvidos juntos em um único sistema
+        bloco-diagonal. Retorna (V, convergiu) com uma linha/posição por cenário.
+        """
+        V = np.array(V0, dtype=complex)
+        Va = np.angle(V)
+        Vm = np.abs(V)
+        n_cenarios = V.shape[0]
+        convergiu = np.zeros(n_cenarios, dtype=bool)
+        falhou = np.zeros(n_cenarios, dtype=bool)
+
+        for iteracao in range(self.max_iteracoes + 1):
+            mis = V * np.conj(self._correntes(dados_ybus, V)) - Sbus
+            F = np.concatenate([mis[:, self.pvpq].real, mis[:, self.pq].imag], axis=1)
+            finito = np.all(np.isfinite(F), axis=1)
+            falhou |= ~finito & ~convergiu
+            convergiu |= finito & (np.max(np.abs(F), axis=1, initial=0.0) < self.tolerancia)
+            ativos = np.nonzero(~convergiu & ~falhou)[0]
+            if len(ativos) == 0 or iteracao == self.max_iteracoes:
+                break
+
+            try:
+                lu = splu(self._jacobiano_bloco(dados_ybus[ativos], V[ativos]), permc_spec='NATURAL')
+                dx = lu.solve(-F[ativos].ravel()).reshape(len(ativos), self.dim_j)[:, self.perm_c]
+            except RuntimeError:
+                # Algum bloco singular: resolve os cenários um a um para isolar os que falharam
+                dx = np.zeros((len(ativos), self.dim_j))
+                for k, c in enumerate(ativos):
+                    try:
+                        dx[k] = splu(self._jacobiano(dados_ybus[c], V[c]), permc_spec='NATURAL').solve(-F[c])[self.perm_c]
+                    except RuntimeError:
+                        falhou[c] = True
+
+            Va[ativos[:, None], self.pvpq[None, :]] += dx[:, :self.n_pvpq]
+            Vm[ativos[:, None], self.pq[None, :]] += dx[:, self.n_pvpq:]
+            V[ativos] = Vm[ativos] * np.exp(1j * Va[ativos])
+
+        return V, convergiu & ~falhou
+
+    def para_cenario(self, V, dados_ybus=None, injecoes=None):
+        """
+        Retorna um solver para outro cenário com a mesma topologia, já resolvido
+        (tensões `V` nas barras internas e, se houver, outros valores da Ybus, como
+        variações de shunts). Estruturas e ordenação de colunas são compartilhadas.
+        `injecoes` (dados do cenário, como em gerar_dados_cenario) atualiza os valores
+        de geradores, shunts e cargas usados nas contingências desses elementos.
+        """
+        solver = copy.copy(self)
+        if dados_ybus is not None:
+            solver.Ybus = self._ybus(np.asarray(dados_ybus, dtype=complex))
+        solver.V0 = np.asarray(V, dtype=complex)
+        solver.Sbus = solver.V0 * np.conj(solver.Ybus @ solver.V0)
+        if injecoes is not None:
+            solver._atualizar_elementos(injecoes)
+        return solver
+
+    def _atualizar_elementos(self, injecoes):
+        """Passa aos valores do cenário (colunas de gerar_dados_cenario, quando presentes) os geradores, shunts e cargas."""
+        def valores(prefixo, indices, atuais):
+            return np.array([float(injecoes.get(f'{prefixo}{idx}', atual)) for idx, atual in zip(indices, atuais)])
+
+        self._p_geradores = valores('gen_p_mw_', self.indices_geradores, self._p_geradores)
+        self._q_shunts = valores('shunt_q_mvar_', self.indices_shunts, self._q_shunts)
+        q_cargas = valores('carga_q_mvar_', self.indices_cargas, self._q_cargas)
+        validas = self._barras_cargas >= 0
+        variacao = np.bincount(self._barras_cargas[validas], ((q_cargas - self._q_cargas) * self._escala_cargas)[validas],
+                               minlength=len(self._q_sem_geradores))
+        self._q_sem_geradores = self._q_sem_geradores - variacao / self.base_mva
+        self._q_cargas = q_cargas
+
+    def _com_barra_pq(self, barra):
+        """
+        Cópia do solver com a barra PV `barra` tratada como PQ. A estrutura do Jacobiano
+        (e a ordenação de colunas) dessa classificação é montada na primeira vez e
+        reaproveitada nos demais cenários.
+        """
+        estrutura = self._estruturas_pq.get(barra)
+        if estrutura is None:
+            derivado = copy.copy(self)
+            derivado.pv = self.pv[self.pv != barra]
+            derivado.pq = np.r_[self.pq, barra]
+            derivado.pvpq = np.r_[derivado.pv, derivado.pq]
+            derivado._preparar_estrutura_jacobiano()
+            estrutura = {nome: getattr(derivado, nome) for nome in _ATRIBUTOS_ESTRUTURA}
+            self._estruturas_pq[barra] = estrutura
+        solver = copy.copy(self)
+        solver.__dict__.update(estrutura)
+        return solver
+
+    def _desligamento_elemento(self, tipo, elemento):
+        """
+        Aplica o desligamento de um transformador, shunt ou gerador. Retorna (solver,
+        dados_ybus, Sbus, ramos): o solver (com outra classificação de barras, se um
+        gerador deixa de controlar a tensão), os valores da Ybus, as injeções
+        especificadas e os ramos internos desligados.
+        """
+        if tipo not in TIPOS_CONTINGENCIA or tipo == 'line':
+            raise ValueError(f"Tipo de contingência '{tipo}' desconhecido. Use um de {list(TIPOS_CONTINGENCIA)}.")
+        solver, dados_ybus, Sbus, ramos = self, self.Ybus.data, self.Sbus, []
+        if tipo == 'trafo':
+            ramo = self.pos_trafos[self.indices_trafos.get_loc(elemento)]
+            if ramo >= 0:
+                dados_ybus, ramos = self._dados_ybus_sem_ramo(ramo), [ramo]
+        elif tipo == 'shunt':
+            pos = self.indices_shunts.get_loc(elemento)
+            barra = self._barras_shunts[pos]
+            if barra >= 0:
+                dados_ybus = self.Ybus.data.copy()
+                dados_ybus[self._pos_diag[barra]] -= (self._p_shunts[pos] - 1j * self._q_shunts[pos]) * self._fator_shunts[pos]
+        else:
+            pos = self.indices_geradores.get_loc(elemento)
+            barra = self._barras_geradores[pos]
+            if barra >= 0:
+                Sbus = self.Sbus.copy()
+                Sbus[barra] -= self._p_geradores[pos] * self._escala_geradores[pos] / self.base_mva
+                outros_geradores = np.count_nonzero(self._barras_geradores == barra) > 1
+                if np.any(self.pv == barra) and not outros_geradores:
+                    # Sem gerador, a barra deixa de ter a tensão controlada: passa a PQ com as demais injeções
+                    solver = self._com_barra_pq(barra)
+                    Sbus[barra] = Sbus[barra].real + 1j * self._q_sem_geradores[barra]
+        return solver, dados_ybus, Sbus, ramos
+
+    def _dados_ybus_sem_ramo(self, ramo, dados=None):
+        """Aplica o desligamento do ramo aos valores da Ybus (atualização de posto baixo)."""
+        dados = self.Ybus.data.copy() if dados is None else dados
+        inicio_f, fim_f = self.Yf.indptr[ramo], self.Yf.indptr[ramo + 1]
+        inicio_t, fim_t = self.Yt.indptr[ramo], self.Yt.indptr[ramo + 1]
+        termos_f = dict(zip(self.Yf.indices[inicio_f:fim_f], self.Yf.data[inicio_f:fim_f]))
+        termos_t = dict(zip(self.Yt.indices[inicio_t:fim_t], self.Yt.data[inicio_t:fim_t]))
+        f, t = self._ramos_f[ramo], self._ramos_t[ramo]
+
+        dados[self._pos_ff[ramo]] -= termos_f.get(f, 0)
+        dados[self._pos_tt[ramo]] -= termos_t.get(t, 0)
+        if f != t:
+            dados[self._pos_ft[ramo]] -= termos_f.get(t, 0)
+            dados[self._pos_tf[ramo]] -= termos_t.get(f, 0)
+        return dados
+
+    def _newton_raphson(self, dados_ybus, V0, Sbus=None):
+        """
+        Newton-Raphson com a estrutura e a ordenação do caso base (injeções `Sbus`,
+        as do cenário se omitidas). Retorna (V, convergiu, iteracoes).
+        """
+        Ybus = self._ybus(dados_ybus)
+        Sbus = self.Sbus if Sbus is None else Sbus
+        V = V0.copy()
+        Va = np.angle(V)
+        Vm = np.abs(V)
+
+        for iteracao in range(self.max_iteracoes + 1):
+            mis = V * np.conj(Ybus @ V) - Sbus
+            F = np.r_[mis[self.pvpq].real, mis[self.pq].imag]
+            if not np.all(np.isfinite(F)):
+                return V, False, iteracao
+            if np.max(np.abs(F), initial=0.0) < self.tolerancia:
+                return V, True, iteracao
+            if iteracao == self.max_iteracoes:
+                break
+
+            J = self._jacobiano(dados_ybus, V)
+            try:
+                lu = splu(J, permc_spec='NATURAL')
+            except RuntimeError:  # Jacobiano singular
+                return V, False, iteracao
+            dx = lu.solve(-F)[self.perm_c]
+
+            Va[self.pvpq] += dx[:self.n_pvpq]
+            Vm[self.pq] += dx[self.n_pvpq:]
+            V = Vm * np.exp(1j * Va)
+
+        return V, False, self.max_iteracoes
+
+    def resolver_desligamento(self, linha, tipo='line'):
+        """
+        Resolve o fluxo de potência com a linha `linha` (índice de net.line) desligada
+        ou, com `tipo`, o elemento de índice `linha` em net[tipo] (ver resolver_desligamento_em).
+        Retorna (vm_pu por barra, loading_percent por linha, convergencia), com as
+        tensões e carregamentos como pd.Series indexadas como net.bus e net.line.
+        """
+        vm_pu = np.empty(len(self.pos_barras))
+        loading = np.empty(len(self.pos_linhas))
+        convergiu = self.resolver_desligamento_em(linha, vm_pu, loading, tipo=tipo)
+        return (pd.Series(vm_pu, index=self.indices_barras, name='vm_pu'),
+                pd.Series(loading, index=self.indices_linhas, name='loading_percent'),
+                convergiu)
+
+    def resolver_desligamento_em(self, linha, vm_saida, loading_saida, tipo='line'):
+        """
+        Como resolver_desligamento, mas grava as tensões (ordem de net.bus) e os
+        carregamentos (ordem de net.line) direto nos vetores pré-alocados
+        `vm_saida` e `loading_saida`. Retorna True se o fluxo convergiu.
+
+        Com `tipo` ('trafo', 'gen' ou 'shunt'), desliga o elemento de índice `linha`
+        em net[tipo]: o transformador sai da Ybus como uma linha, o shunt sai da
+        diagonal da Ybus e o gerador sai das injeções (se era o único gerador da
+        barra, ela passa a PQ). A estrutura esparsa da Ybus é sempre a do caso base.
+        """
+        if tipo == 'line':
+            return self.resolver_desligamentos_em([linha], vm_saida, loading_saida)
+        solver, dados_ybus, Sbus, ramos = self._desligamento_elemento(tipo, linha)
+        V, convergiu, self.ultimas_iteracoes = solver._newton_raphson(dados_ybus, self.V0, Sbus)
+        if not convergiu:
+            vm_saida.fill(np.nan)
+            loading_saida.fill(np.nan)
+            return False
+
+        self._tensoes_barras(V, vm_saida)
+        self._carregamento_linhas(V, ramos, loading_saida)
+        return True
+
+    def resolver_desligamentos_em(self, linhas, vm_saida, loading_saida):
+        """
+        Como resolver_desligamento_em, com todas as linhas de `linhas` desligadas ao
+        mesmo tempo (contingências N-k): as atualizações de posto baixo de cada ramo
+        são acumuladas sobre os mesmos valores da Ybus.
+        """
+        dados_ybus, ramos = self.dados_ybus_sem_linhas(linhas)
+        V, convergiu, self.ultimas_iteracoes = self._newton_raphson(dados_ybus, self.V0)
+        if not convergiu:
+            vm_saida.fill(np.nan)
+            loading_saida.fill(np.nan)
+            return False
+
+        self._tensoes_barras(V, vm_saida)
+        self._carregamento_linhas(V, ramos, loading_saida)
+        return True
+
+    def dados_ybus_sem_linhas(self, linhas):
+        """
+        Valores da Ybus com as linhas (índices de net.line) desligadas, sobre a estrutura
+        do caso base, e os ramos internos correspondentes. Retorna (dados_ybus, ramos).
+        """
+        ramos = [r for r in (self.pos_linhas[self.indices_linhas.get_loc(linha)] for linha in linhas) if r >= 0]
+        dados_ybus = self.Ybus.data
+        if ramos:
+            dados_ybus = dados_ybus.copy()
+            for ramo in ramos:
+                self._dados_ybus_sem_ramo(ramo, dados_ybus)
+        return dados_ybus, ramos
+
+    def resolver_fator_carga(self, dados_ybus, fator, V0=None):
+        """
+        Resolve o fluxo de potência com as injeções do cenário multiplicadas por `fator`
+        (cargas e despacho dos geradores escalados juntos; a slack cobre as perdas),
+        partindo de `V0` (a solução do cenário, se omitido). Retorna (V, convergiu).
+        """
+        V, convergiu, self.ultimas_iteracoes = self._newton_raphson(dados_ybus, self.V0 if V0 is None else V0,
+                                                                    self.Sbus * fator)
+        return V, convergiu
+
+    def fluxo_ativo_linhas_mw(self):
+        """Potência ativa (MW) no terminal 'from' de cada linha (ordem de net.line) no ponto resolvido do cenário."""
+        Pf = (self.V0[self._ramos_f] * np.conj(self.Yf @ self.V0)).real * self.base_mva
+        fluxos = np.zeros(len(self.pos_linhas))
+        validas = self.pos_linhas >= 0
+        fluxos[validas] = Pf[self.pos_linhas[validas]]
+        return fluxos
+
+    def _tensoes_barras(self, V, saida):
+        saida.fill(np.nan)
+        validas = self.pos_barras >= 0
+        saida[validas] = np.abs(V[self.pos_barras[validas]])
+
+    def _carregamento_linhas(self, V, ramos_desligados, saida):
+        If = np.abs(self.Yf @ V)
+        It = np.abs(self.Yt @ V)
+        If[ramos_desligados] = 0.0
+        It[ramos_desligados] = 0.0
+
+        saida.fill(0.0)
+        validas = self.pos_linhas >= 0
+        i_ka = np.maximum(If[self.pos_linhas[validas]] * self.i_base_from_ka[validas],
+                          It[self.pos_linhas[validas]] * self.i_base_to_ka[validas])
+        saida[validas] = i_ka / self.i_max_ka[validas] * 100
@@ -1,16 +1,43 @@
+import numpy as np
 import pandas as pd
+import plotly.graph_objects as go
 from dash import Dash, dcc, html, dash_table
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import os
 from sqlalchemy import create_engine, text
 import webbrowser
 import time
 import sys
 import threading
+from functools import lru_cache
+
+# Garante que o diretório raiz do projeto esteja no Python path (o script roda como subprocesso/container)
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.flows.api_resultados import criar_api
+from src.flows.notificacoes import OuvinteNotificacoes
+from src.flows.sensibilidade_tensao import consultar_variacao_tensao
+
+# O navegador verifica a cada INTERVALO_VERIFICACAO_MS se há dados novos, o que só lê a versão
+# em memória: o banco é consultado apenas quando chega um NOTIFY da simulação.
+INTERVALO_VERIFICACAO_MS = 2 * 1000
+# Sem o ouvinte (banco sem LISTEN/NOTIFY ou conexão caída), o cache é recarregado a cada
+# INTERVALO_CONSULTA_S segundos, como na consulta periódica anterior.
+INTERVALO_CONSULTA_S = 60
+# Casas decimais de |ΔV| (pu) enviadas ao navegador no mapa de calor linha x barra
+CASAS_DECIMAIS_MAPA = 5
 
 # Função para obter a URL de conexão do banco de dados ---
 def get_db_url():
-    """Retorna a URL de conexão do banco de dados, adaptando para o ambiente."""
+    """
+    Retorna a URL de conexão do banco de dados, adaptando para o ambiente.
+    DATABASE_URL, se definida, tem precedência (ex.: SQLite da execução local).
+    """
+    if os.getenv('DATABASE_URL'):
+        return os.getenv('DATABASE_URL')
     db_user = os.getenv('DB_USER', 'prefect')
     db_password = os.getenv('DB_PASSWORD', 'prefect')
     db_host = os.getenv('DB_HOST', 'localhost')
@@ -40,8 +67,98 @@ def load_all_data_from_postgres():
         print(f"ERRO: ao carregar todos os dados do PostgreSQL para visualização Dash: {e}")
         return pd.DataFrame()
 
+@lru_cache(maxsize=8)
+def figura_mapa_impacto(metrica, escopo, versao):
+    """
+    Mapa de calor linha desligada x barra da média ou do máximo de |ΔV| (pu), lido do
+    agregado impacto_agregado_linha_barra (mantido pela análise de impacto), da última
+    execução ou de todas. A figura tem só a matriz agregada (alguns KB) e fica em cache
+    até a versão dos dados mudar.
+    """
+    filtro = ("WHERE execution_timestamp = (SELECT MAX(execution_timestamp) FROM impacto_agregado_linha_barra) "
+              if escopo == 'ultima' else "")
+    query = (f"SELECT linha_desligada, barra, SUM(n_cenarios) AS n_cenarios, SUM(soma_impacto) AS soma_impacto, "
+             f"MAX(max_impacto) AS max_impacto FROM impacto_agregado_linha_barra {filtro}"
+             f"GROUP BY linha_desligada, barra")
+    try:
+        with create_engine(get_db_url()).connect() as connection:
+            df = pd.read_sql(text(query), connection)
+    except Exception as e:
+        print(f"ERRO: ao carregar o agregado de impacto linha x barra: {e}")
+        return None
+    if df.empty:
+        return None
+
+    df['valor'] = df['soma_impacto'] / df['n_cenarios'] if metrica == 'media' else df['max_impacto']
+    matriz = df.pivot(index='linha_desligada', columns='barra', values='valor').sort_index().sort_index(axis=1)
+    nome = 'Média de |ΔV|' if metrica == 'media' else 'Máximo de |ΔV|'
+    figura = go.Figure(go.Heatmap(
+        z=np.round(matriz.to_numpy(dtype=float), CASAS_DECIMAIS_MAPA),
+        x=[str(b) for b in matriz.columns], y=[str(l) for l in matriz.index],
+        colorscale='Reds', colorbar={'title': 'pu'},
+        hovertemplate='Linha %{y}<br>Barra %{x}<br>' + nome + ': %{z:.5f} pu<extra></extra>',
+    ))
+    figura.update_layout(
+        title=f"{nome} por Linha Desligada e Barra ({'última execução' if escopo == 'ultima' else 'todas as execuções'})",
+        xaxis={'title': 'Barra', 'type': 'category'}, yaxis={'title': 'Linha desligada', 'type': 'category'},
+        height=max(400, 18 * len(matriz.index) + 150),
+    )
+    return figura
+
+class EstadoDados:
+    """
+    Cache dos dados de tensão compartilhado pelos callbacks. O ouvinte de notificações
+    invalida o cache e incrementa `versao` quando a simulação grava uma nova execução;
+    cada navegador guarda a versão que está exibindo e só atualiza quando ela muda.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._df = None
+        self._versao_em = time.monotonic()
+        self.versao = 0
+        self.ouvinte = None
+
+    def invalidar(self, payload=None):
+        with self._lock:
+            self._df = None
+            self.versao += 1
+            self._versao_em = time.monotonic()
+        print(f"DEBUG: Novos dados ({payload}); cache invalidado, versão {self.versao}.")
+
+    def verificar(self):
+        """
+        Versão atual dos dados (sem acesso ao banco enquanto o ouvinte estiver conectado).
+        Também usada pelo cache da API (src/flows/api_resultados.py), que pode ter respostas
+        em cache mesmo sem os dados do Dash carregados.
+        """
+        sem_ouvinte = self.ouvinte is None or not self.ouvinte.conectado
+        if sem_ouvinte and time.monotonic() - self._versao_em >= INTERVALO_CONSULTA_S:
+            self.invalidar('consulta periódica')
+        return self.versao
+
+    def dados(self):
+        """Dados em cache, carregados do PostgreSQL na primeira chamada após cada invalidação."""
+        with self._lock:
+            if self._df is None:
+                self._df = load_all_data_from_postgres()
+            return self._df
+
+
+estado_dados = EstadoDados()
+
+
+def iniciar_ouvinte_notificacoes():
+    """Inicia (uma vez) a thread que recebe os NOTIFY da simulação e invalida o cache."""
+    if estado_dados.ouvinte is None:
+        estado_dados.ouvinte = OuvinteNotificacoes(create_engine(get_db_url()), ao_notificar=estado_dados.invalidar)
+        estado_dados.ouvinte.iniciar()
+    return estado_dados.ouvinte
+
 # Criação da Aplicação Dash
 app = Dash(__name__)
+# API JSON de consulta dos resultados (/api/...) no mesmo servidor Flask, com o cache invalidado junto com o do Dash
+app.server.register_blueprint(criar_api(get_db_url(), versao_dados=estado_dados.verificar))
 
 app.layout = html.Div([
     html.H1("Análise das 10 Barras Mais Impactadas Pós-Desligamento de Linhas (IEEE 30 Barras)"),
@@ -58,14 +175,53 @@ app.layout = html.Div([
 
     html.Hr(),
 
+    # Simulação rápida: variação de injeção em uma barra estimada pelas sensibilidades do cenário
+    html.Div([
+        html.H2("Simulação Rápida: Variação de Injeção em uma Barra"),
+        html.Div([
+            html.Label("Barra:"),
+            dcc.Dropdown(id='dropdown-barra-injecao', options=[], value=None),
+        ], style={'width': '30%', 'display': 'inline-block', 'padding': '10px', 'verticalAlign': 'top'}),
+        html.Div([
+            html.Label("Variação de P injetada (MW):"),
+            dcc.Input(id='input-delta-p', type='number', value=0, step=0.1),
+        ], style={'display': 'inline-block', 'padding': '10px', 'verticalAlign': 'top'}),
+        html.Div([
+            html.Label("Variação de Q injetada (MVAr):"),
+            dcc.Input(id='input-delta-q', type='number', value=0, step=0.1),
+        ], style={'display': 'inline-block', 'padding': '10px', 'verticalAlign': 'top'}),
+        html.Div(id='output-sensibilidade'),
+    ], style={'marginBottom': '30px', 'padding': '15px', 'border': '1px solid #eee', 'borderRadius': '5px'}),
+
+    html.Hr(),
+
+    # Mapa de calor linha x barra do agregado de impacto (média/máximo de |ΔV|)
+    html.Div([
+        html.H2("Impacto de Tensão por Linha Desligada e Barra"),
+        dcc.RadioItems(
+            id='radio-metrica-mapa',
+            options=[{'label': 'Média de |ΔV|', 'value': 'media'}, {'label': 'Máximo de |ΔV|', 'value': 'maximo'}],
+            value='media', inline=True
+        ),
+        dcc.RadioItems(
+            id='radio-escopo-mapa',
+            options=[{'label': 'Última execução', 'value': 'ultima'}, {'label': 'Todas as execuções', 'value': 'todas'}],
+            value='ultima', inline=True
+        ),
+        html.Div(id='output-mapa-impacto'),
+    ], style={'marginBottom': '30px', 'padding': '15px', 'border': '1px solid #eee', 'borderRadius': '5px'}),
+
+    html.Hr(),
+
     html.Div(id='output-tables-container'),
     
-    # Componente para disparar atualizações periódicas
+    # Verificação periódica (em memória) da versão dos dados; ver EstadoDados
     dcc.Interval(
         id='interval-component',
-        interval=60 * 1000,  # Atualiza a cada 60 segundos (60000 ms)
+        interval=INTERVALO_VERIFICACAO_MS,
         n_intervals=0
     ),
+    dcc.Store(id='versao-dados'), # Versão dos dados exibida neste navegador
     html.Div(id='last-updated-time', style={'fontSize': 'small', 'color': 'gray', 'textAlign': 'right', 'marginRight': '10px'})
 ])
 
@@ -76,24 +232,31 @@ app.layout = html.Div([
     Output('dropdown-cenario', 'options'),
     Output('dropdown-cenario', 'value'),
     Output('last-updated-time', 'children'),
+    Output('versao-dados', 'data'),
     Input('interval-component', 'n_intervals'),
-    State('dropdown-cenario', 'value') # Pega o valor atual do dropdown para tentar manter a seleção
+    State('dropdown-cenario', 'value'), # Pega o valor atual do dropdown para tentar manter a seleção
+    State('versao-dados', 'data')
 )
-def update_dropdown_and_data_status(n_intervals, current_scenario_value):
-    print(f"DEBUG: Callback update_dropdown_and_data_status acionado. n_intervals: {n_intervals}")
-    df_all_data = load_all_data_from_postgres() # Carrega todos os dados
+def update_dropdown_and_data_status(n_intervals, current_scenario_value, versao_exibida):
+    versao = estado_dados.verificar()
+    if versao == versao_exibida:
+        raise PreventUpdate # Nenhum dado novo desde a última atualização deste navegador
+
+    print(f"DEBUG: Callback update_dropdown_and_data_status acionado. n_intervals: {n_intervals}, versão: {versao}")
+    df_all_data = estado_dados.dados()
 
-    if df_all_data.empty or 'cenario' not in df_all_data.columns or 'created_at' not in df_all_data.columns:
-        return [], None, "Nenhum dado disponível para visualização."
+    if df_all_data.empty or 'cenario' not in df_all_data.columns or 'execution_timestamp' not in df_all_data.columns:
+        return [], None, "Nenhum dado disponível para visualização.", versao
 
-    # Encontra o timestamp da última execução de simulação
-    latest_timestamp = df_all_data['created_at'].max()
+    # Encontra o timestamp da última execução de simulação (execution_timestamp é o mesmo em
+    # todos os lotes gravados pela execução; created_at muda a cada lote)
+    latest_timestamp = df_all_data['execution_timestamp'].max()
     
     # Filtra o DataFrame para incluir APENAS os dados da última execução
-    df_latest_run = df_all_data[df_all_data['created_at'] == latest_timestamp].copy()
+    df_latest_run = df_all_data[df_all_data['execution_timestamp'] == latest_timestamp].copy()
     
     if df_latest_run.empty:
-        return [], None, "Nenhum dado válido da última execução de simulação."
+        return [], None, "Nenhum dado válido da última execução de simulação.", versao
 
     # Gera as opções do dropdown com base nos cenários da última execução
     cenario_options = [{'label': f'Cenário {i}', 'value': i} for i in sorted(df_latest_run['cenario'].unique())]
@@ -105,26 +268,110 @@ def update_dropdown_and_data_status(n_intervals, current_scenario_value):
         selected_value = cenario_options[0]['value'] if cenario_options else None
             
     last_update_time_str = latest_timestamp.strftime('%Y-%m-%d %H:%M:%S')
-    return cenario_options, selected_value, f"Dados da última simulação (atualizado em: {last_update_time_str})"
+    return cenario_options, selected_value, f"Dados da última simulação (atualizado em: {last_update_time_str})", versao
+
+
+# Callback para listar as barras da rede (colunas de tensão da última execução) no painel de simulação rápida
+@app.callback(
+    Output('dropdown-barra-injecao', 'options'),
+    Input('versao-dados', 'data')
+)
+def update_barras_injecao(versao_dados):
+    df_all_data = estado_dados.dados()
+    cols_vm_pu_antes = [col for col in df_all_data.columns if col.startswith('vm_pu_antes_bus_')]
+    return [{'label': f'Barra {bus_id}', 'value': bus_id}
+            for bus_id in sorted(int(col.replace('vm_pu_antes_bus_', '')) for col in cols_vm_pu_antes)]
+
+
+# Callback da simulação rápida: tensões estimadas com as sensibilidades dV/dP e dV/dQ gravadas pela simulação
+@app.callback(
+    Output('output-sensibilidade', 'children'),
+    Input('dropdown-barra-injecao', 'value'),
+    Input('input-delta-p', 'value'),
+    Input('input-delta-q', 'value'),
+    Input('dropdown-cenario', 'value'),
+    Input('versao-dados', 'data')
+)
+def update_sensibilidade(barra, delta_p, delta_q, selected_cenario, versao_dados):
+    if barra is None or selected_cenario is None:
+        return html.Div("Selecione um cenário e a barra onde a injeção varia.")
+    delta_p, delta_q = delta_p or 0.0, delta_q or 0.0
+    if not delta_p and not delta_q:
+        return html.Div("Informe a variação de potência ativa e/ou reativa injetada na barra (carga: valores negativos).")
+
+    try:
+        df_variacao = consultar_variacao_tensao(create_engine(get_db_url()), {barra: delta_p}, {barra: delta_q},
+                                                cenario=selected_cenario)
+    except Exception as e:
+        print(f"ERRO: ao consultar as sensibilidades de tensão: {e}")
+        return html.Div("Não foi possível consultar as sensibilidades de tensão.")
+    if df_variacao.empty:
+        return html.Div(f"Sem sensibilidades para a Barra {barra} no Cenário {selected_cenario} "
+                        f"(barra slack ou execução sem sensibilidades).")
+
+    df_table = pd.DataFrame({
+        'Barra': [f'Barra {b}' for b in df_variacao['barra']],
+        'Tensao_Cenario_pu': df_variacao['vm_pu'],
+        'Variacao_Estimada_pu': df_variacao['delta_vm_pu'],
+        'Tensao_Estimada_pu': df_variacao['vm_pu_estimada'],
+    })
+    formato = dash_table.Format.Format(precision=4, scheme=dash_table.Format.Scheme.fixed)
+    return html.Div([
+        html.H3(f"Barras Mais Afetadas por {delta_p:+.2f} MW / {delta_q:+.2f} MVAr na Barra {barra} (Cenário {selected_cenario})"),
+        dash_table.DataTable(
+            id='table-sensibilidade',
+            columns=[
+                {"name": "Barra", "id": "Barra"},
+                {"name": "Tensão no Cenário (p.u.)", "id": "Tensao_Cenario_pu", "type": "numeric", "format": formato},
+                {"name": "Variação Estimada (p.u.)", "id": "Variacao_Estimada_pu", "type": "numeric", "format": dash_table.Format.Format(precision=5, scheme=dash_table.Format.Scheme.fixed)},
+                {"name": "Tensão Estimada (p.u.)", "id": "Tensao_Estimada_pu", "type": "numeric", "format": formato},
+            ],
+            data=df_table.to_dict('records'),
+            page_size=10,
+            style_table={'overflowX': 'auto', 'marginBottom': '20px', 'border': '1px solid #ddd'},
+            style_cell={'height': 'auto', 'minWidth': '120px', 'width': '120px', 'maxWidth': '180px',
+                        'whiteSpace': 'normal', 'textAlign': 'left'},
+            style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'},
+            sort_action="native"
+        ),
+        html.P("Estimativa linear (sensibilidades do Jacobiano do cenário, sem novo fluxo de potência); "
+               "barras PV e a slack mantêm a tensão.", style={'fontSize': 'small', 'color': 'gray'})
+    ])
+
+
+# Callback do mapa de calor linha x barra (figura em cache por métrica, escopo e versão dos dados)
+@app.callback(
+    Output('output-mapa-impacto', 'children'),
+    Input('radio-metrica-mapa', 'value'),
+    Input('radio-escopo-mapa', 'value'),
+    Input('versao-dados', 'data')
+)
+def update_mapa_impacto(metrica, escopo, versao_dados):
+    figura = figura_mapa_impacto(metrica, escopo, versao_dados)
+    if figura is None:
+        return html.Div("Nenhum impacto agregado disponível (rode a análise de impacto).")
+    return dcc.Graph(id='graph-mapa-impacto', figure=figura)
 
 
 # Callback para atualizar as tabelas com base na seleção do cenário (da última execução)
 @app.callback(
     Output('output-tables-container', 'children'),
-    Input('dropdown-cenario', 'value')
+    Input('dropdown-cenario', 'value'),
+    Input('versao-dados', 'data') # Redesenha também quando chega uma nova execução com o mesmo cenário selecionado
 )
-def update_output_tables(selected_cenario):
+def update_output_tables(selected_cenario, versao_dados):
     print(f"DEBUG: Callback update_output_tables acionado. Cenário selecionado: {selected_cenario}")
-    df_all_data = load_all_data_from_postgres() # Carrega todos os dados novamente para garantir que é a versão mais recente
+    df_all_data = estado_dados.dados() # Mesmo cache do dropdown, invalidado a cada nova execução
     
-    if selected_cenario is None or df_all_data.empty or 'created_at' not in df_all_data.columns:
+    if selected_cenario is None or df_all_data.empty or 'execution_timestamp' not in df_all_data.columns:
         return html.Div("Por favor, selecione um cenário para exibir as tabelas ou os dados não foram carregados.")
 
-    # Encontra o timestamp da última execução de simulação
-    latest_timestamp = df_all_data['created_at'].max()
+    # Encontra o timestamp da última execução de simulação (execution_timestamp é o mesmo em
+    # todos os lotes gravados pela execução; created_at muda a cada lote)
+    latest_timestamp = df_all_data['execution_timestamp'].max()
     
     # Filtra o DataFrame para incluir APENAS os dados da última execução
-    df_latest_run = df_all_data[df_all_data['created_at'] == latest_timestamp].copy()
+    df_latest_run = df_all_data[df_all_data['execution_timestamp'] == latest_timestamp].copy()
 
     if df_latest_run.empty:
         return html.Div("Nenhum dado válido da última execução de simulação para o cenário selecionado.")
@@ -213,6 +460,7 @@ def run_dash_server_as_subprocess():
     def run_server():
         app.run_server(debug=False, host='0.0.0.0', port=8050)
 
+    iniciar_ouvinte_notificacoes()
     server_thread = threading.Thread(target=run_server)
     server_thread.daemon = True
     server_thread.start()
@@ -225,4 +473,7 @@ if __name__ == '__main__':
     # ele inicia o servidor Dash e abre o navegador.
     print(f"Iniciando a aplicação Dash na URL: http://127.0.0.1:8050/")
     webbrowser.open_new_tab("http://127.0.0.1:8050/")
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Só no processo que serve a aplicação (o processo pai do reloader do modo debug apenas o reinicia)
+        iniciar_ouvinte_notificacoes()
     app.run_server(debug=True, host='0.0.0.0', port=8050)
\ No newline at end of file